@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+import uuid
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import extract, func
+
+from simple_models import db, Employee
+
+# 缓存有效期（秒）。通过页面新增/编辑员工时会更新共享的版本文件，
+# 所有工作进程在下次读取时即失效；有效期只兜底绕过页面的写入
+# （generate_data.py、直接改库等），即这类写入最多 300 秒后可见。
+ARCHIVE_STATS_TTL = 300
+
+ACTIVE_STATUS = '在职'
+
+# 入职趋势展示的月份数
+HIRE_TREND_MONTHS = 12
+
+_cache = {'stats': None, 'stamp': None, 'expires_at': 0, 'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def _last_months(count, today=None):
+    today = today or date.today()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(months))
+
+
+def _compute_stats():
+    """一次分组聚合查询得出全部档案统计"""
+    hire_year = extract('year', Employee.hire_date)
+    hire_month = extract('month', Employee.hire_date)
+    rows = db.session.query(
+        Employee.department,
+        Employee.status,
+        hire_year,
+        hire_month,
+        func.count(Employee.id)
+    ).group_by(Employee.department, Employee.status, hire_year, hire_month).all()
+
+    total = 0
+    by_status = {}
+    by_department = {}
+    hires_by_month = {}
+
+    for department, status, year, month, count in rows:
+        total += count
+        by_status[status] = by_status.get(status, 0) + count
+
+        dept = by_department.setdefault(department, {'total': 0, 'active': 0})
+        dept['total'] += count
+        if status == ACTIVE_STATUS:
+            dept['active'] += count
+
+        if year and month:
+            key = (int(year), int(month))
+            hires_by_month[key] = hires_by_month.get(key, 0) + count
+
+    return {
+        'total_employees': total,
+        'active_employees': by_status.get(ACTIVE_STATUS, 0),
+        'department_count': len(by_department),
+        'by_status': by_status,
+        'by_department': sorted(by_department.items(), key=lambda item: item[1]['total'], reverse=True),
+        'hires_by_month': [
+            (f'{year}-{month:02d}', hires_by_month.get((year, month), 0))
+            for year, month in _last_months(HIRE_TREND_MONTHS)
+        ],
+    }
+
+
+def _stamp_path():
+    """各工作进程共享的版本文件，默认在实例目录下"""
+    return current_app.config.get('ARCHIVE_STATS_STAMP_FILE') or \
+        os.path.join(current_app.instance_path, 'archive_stats.stamp')
+
+
+def _read_stamp():
+    try:
+        with open(_stamp_path(), encoding='ascii') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _is_fresh(now, stamp):
+    return _cache['stats'] is not None and now < _cache['expires_at'] and _cache['stamp'] == stamp
+
+
+def get_archive_stats():
+    """获取档案统计（带缓存）"""
+    now = time.monotonic()
+    stamp = _read_stamp()
+    if _is_fresh(now, stamp):
+        _cache['hits'] += 1
+        return _cache['stats']
+
+    with _lock:
+        if _is_fresh(now, stamp):
+            _cache['hits'] += 1
+            return _cache['stats']
+        _cache['misses'] += 1
+        # 先读版本再计算：计算期间其他进程的失效会让下次读取重新计算
+        stats = _compute_stats()
+        _cache['stats'] = stats
+        _cache['stamp'] = stamp
+        _cache['expires_at'] = time.monotonic() + ARCHIVE_STATS_TTL
+        return stats
+
+
+def invalidate_archive_stats():
+    """员工数据变更后调用，使所有工作进程的统计缓存失效"""
+    with _lock:
+        _cache['stats'] = None
+        _cache['expires_at'] = 0
+
+    path = _stamp_path()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='ascii') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 写不了版本文件时其他进程仍有有效期兜底
+        current_app.logger.warning('无法更新档案统计版本文件 %s', path, exc_info=True)
+
+
+def cache_stats():
+    """本进程累计的 (命中, 未命中) 次数"""
+    return _cache['hits'], _cache['misses']
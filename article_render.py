@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+def render_article_content(content):
+    """把文章正文渲染为 HTML（与原模板 replace('\\n', '<br>') | safe 一致）"""
+    return (content or '').replace('\n', '<br>')
+
+
+def article_version(article):
+    """文章内容版本标识：文章 id + 最后修改时间"""
+    modified = article.update_time or article.publish_time
+    stamp = modified.strftime('%Y%m%d%H%M%S%f') if modified else '0'
+    return f'{article.id}-{stamp}'
+
+
+class RenderedContentCache:
+    """文章正文渲染结果缓存
+
+    以（文章 id, update_time）为键，内存中按 LRU 淘汰；配置了
+    ARTICLE_RENDER_CACHE_DIR 时同时落盘，进程重启后无需重新渲染。
+    文章编辑后 update_time 变化，旧版本自然失效。
+    """
+
+    def __init__(self, app=None, render=render_article_content):
+        self.render = render
+        self.max_entries = 256
+        self.disk_dir = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_entries = app.config.setdefault('ARTICLE_RENDER_CACHE_SIZE', 256)
+        self.disk_dir = app.config.setdefault('ARTICLE_RENDER_CACHE_DIR', None)
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, article):
+        """取文章正文的渲染结果，未命中时渲染一次并缓存"""
+        key = article_version(article)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return Markup(html)
+
+        html = self._load(key)
+        if html is None:
+            html = self.render(article.content)
+            self._store(article.id, key, html)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return Markup(html)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.html')
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _store(self, article_id, key, html):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+            # 清理同一文章的旧版本
+            prefix = f'{article_id}-'
+            for name in os.listdir(self.disk_dir):
+                if name.startswith(prefix) and name.endswith('.html') and name != f'{key}.html':
+                    os.remove(os.path.join(self.disk_dir, name))
+        except OSError:
+            # 落盘只是优化，失败时仅保留内存缓存
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
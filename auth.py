@@ -8,11 +8,11 @@ def permission_required(permission):
         def decorated_function(*args, **kwargs):
             if not current_user.is_authenticated:
                 flash('请先登录', 'error')
-                return redirect(url_for('login'))
+                return redirect(url_for('auth.login'))
             
             if not current_user.has_permission(permission):
                 flash('您没有权限访问此页面', 'error')
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             
             return f(*args, **kwargs)
         return decorated_function
@@ -24,11 +24,11 @@ def role_required(role_name):
         def decorated_function(*args, **kwargs):
             if not current_user.is_authenticated:
                 flash('请先登录', 'error')
-                return redirect(url_for('login'))
+                return redirect(url_for('auth.login'))
             
             if not current_user.has_role(role_name):
                 flash('您没有权限访问此页面', 'error')
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             
             return f(*args, **kwargs)
         return decorated_function
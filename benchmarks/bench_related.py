@@ -0,0 +1,149 @@
+"""相关文章（TF-IDF）离线计算耗时：完整重建与增量更新
+
+在临时 SQLite 数据库中生成若干主题的合成文章（每篇正文由所属主题词和
+通用词混合而成），先完整重建模型与相关文章表，再修改少量文章并增量
+更新。除耗时外还统计“相关文章与本文同主题”的比例，用于检查结果质量。
+
+用法：python benchmarks/bench_related.py [--articles 100000] [--topics 500] [--edits 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from simple_models import db, User, KnowledgeArticle, KnowledgeRelatedArticle
+import kb_related
+
+# 用 3000 个汉字拼合成词，接近常用字规模（字集过大时跨词二元组几乎各不相同，词表会虚高）
+CJK_FIRST, CJK_LAST = 0x4e00, 0x4e00 + 2999
+
+
+def create_app(tmp_dir):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['KB_RELATED_MODEL_PATH'] = os.path.join(tmp_dir, 'kb_related_model.npz')
+    db.init_app(app)
+    return app
+
+
+def make_words(rnd, count):
+    return [''.join(chr(rnd.randint(CJK_FIRST, CJK_LAST)) for _ in range(rnd.randint(2, 4)))
+            for _ in range(count)]
+
+
+def make_article(rnd, topic, topic_words, common_words, topic_tags):
+    words = topic_words[topic]
+    content = ''.join(rnd.choice(words) if rnd.random() < 0.4 else rnd.choice(common_words)
+                      for _ in range(120))
+    return {
+        'title': ''.join(rnd.sample(words, 3)),
+        'content': content,
+        'tags': ','.join(rnd.sample(topic_tags[topic], 2)),
+    }
+
+
+def seed(app, articles, topics, rnd):
+    topic_words = [make_words(rnd, 30) for _ in range(topics)]
+    topic_tags = [make_words(rnd, 4) for _ in range(topics)]
+    common_words = make_words(rnd, 2000)
+    article_topics = {}
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', department='技术部', status='active', is_active=True)
+        user.set_password('bench123')
+        db.session.add(user)
+        db.session.commit()
+        now = datetime(2024, 1, 1)
+        rows = []
+        for article_id in range(1, articles + 1):
+            topic = rnd.randrange(topics)
+            article_topics[article_id] = topic
+            rows.append(dict(make_article(rnd, topic, topic_words, common_words, topic_tags),
+                             id=article_id, author_id=user.id, is_published=True, view_count=0,
+                             publish_time=now, update_time=now))
+            if len(rows) == 10000:
+                db.session.execute(KnowledgeArticle.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.session.execute(KnowledgeArticle.__table__.insert(), rows)
+        db.session.commit()
+    return article_topics, topic_words, common_words, topic_tags
+
+
+def topic_precision(app, article_topics):
+    with app.app_context():
+        pairs = db.session.query(KnowledgeRelatedArticle.article_id, KnowledgeRelatedArticle.related_id).all()
+        covered = db.session.query(db.func.count(db.distinct(KnowledgeRelatedArticle.article_id))).scalar()
+    same = sum(article_topics[a] == article_topics[b] for a, b in pairs)
+    return same / len(pairs) if pairs else 0.0, covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=100000)
+    parser.add_argument('--topics', type=int, default=500)
+    parser.add_argument('--edits', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    tmp_dir = tempfile.mkdtemp()
+    app = create_app(tmp_dir)
+
+    started = time.perf_counter()
+    article_topics, topic_words, common_words, topic_tags = seed(app, args.articles, args.topics, rnd)
+    print(f'生成 {args.articles} 篇文章（{args.topics} 个主题）：{time.perf_counter() - started:.1f}s')
+
+    with app.app_context():
+        started = time.perf_counter()
+        count = kb_related.rebuild_related()
+        elapsed = time.perf_counter() - started
+    precision, covered = topic_precision(app, article_topics)
+    model = kb_related.TfidfModel.load(app.config['KB_RELATED_MODEL_PATH'])
+    print(f'完整重建：{elapsed:.1f}s，{count} 篇，词表 {len(model.terms)}，'
+          f'矩阵非零元 {model.matrix.nnz}，有相关文章 {covered} 篇，同主题比例 {precision:.1%}')
+
+    # 把部分文章改写到另一个主题，再删除几篇、新增几篇
+    with app.app_context():
+        edited_at = datetime(2024, 1, 2)
+        for article_id in rnd.sample(range(1, args.articles + 1), args.edits):
+            topic = rnd.randrange(args.topics)
+            article_topics[article_id] = topic
+            article = db.session.get(KnowledgeArticle, article_id)
+            for key, value in make_article(rnd, topic, topic_words, common_words, topic_tags).items():
+                setattr(article, key, value)
+            article.update_time = edited_at
+        for article_id in rnd.sample(range(1, args.articles + 1), 3):
+            article = db.session.get(KnowledgeArticle, article_id)
+            kb_related.remove_related(article_id)
+            db.session.delete(article)
+            article_topics.pop(article_id, None)
+        for offset in range(1, 4):
+            topic = rnd.randrange(args.topics)
+            article_topics[args.articles + offset] = topic
+            db.session.add(KnowledgeArticle(id=args.articles + offset, author_id=1, is_published=True,
+                                            **make_article(rnd, topic, topic_words, common_words, topic_tags)))
+        db.session.commit()
+
+        started = time.perf_counter()
+        count = kb_related.update_related()
+        elapsed = time.perf_counter() - started
+    precision, covered = topic_precision(app, article_topics)
+    print(f'增量更新（改 {args.edits}、删 3、增 3）：{elapsed:.2f}s，重算 {count} 篇，同主题比例 {precision:.1%}')
+
+    with app.app_context():
+        started = time.perf_counter()
+        count = kb_related.update_related()
+        print(f'无变更时增量更新：{time.perf_counter() - started:.2f}s，重算 {count} 篇')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""SQLite 读写混合并发吞吐：默认日志模式与 db_config 调优配置对比
+
+多个读进程反复执行知识库列表页式的查询，多个写进程模拟浏览量写回、
+最后登录时间更新和消息插入等短事务。两种配置各跑相同时长，
+统计读写吞吐、读延迟分位数和 database is locked 错误数。
+
+用法：python benchmarks/bench_sqlite_concurrency.py [--readers 8] [--writers 2] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from simple_models import db
+from db_config import SQLITE_PRAGMAS, engine_options, install_sqlite_pragmas
+
+PROFILES = {
+    # 与改动前相同：回滚日志（DELETE）、synchronous=FULL，仅有驱动默认的 5 秒锁等待
+    'default': None,
+    'tuned': SQLITE_PRAGMAS,
+}
+
+READ_SQL = text(
+    'SELECT id, title, view_count, publish_time FROM knowledge_articles '
+    'WHERE category_id = :category_id AND is_published = 1 '
+    'ORDER BY publish_time DESC LIMIT 20'
+)
+WRITE_SQL = [
+    text('UPDATE knowledge_articles SET view_count = view_count + 1 WHERE id = :article_id'),
+    text('UPDATE users SET last_login = :now WHERE id = :user_id'),
+    text("INSERT INTO messages (title, content, created_at, message_type, is_read, category, sender_id, recipient_id) "
+         "VALUES ('bench', 'bench', :now, 'system', 0, 'personal', :user_id, :user_id)"),
+]
+
+
+def make_engine(path, profile):
+    uri = f'sqlite:///{path}'
+    if profile == 'default':
+        engine = create_engine(uri)
+    else:
+        engine = create_engine(uri, **engine_options(uri))
+        install_sqlite_pragmas(engine, PROFILES[profile])
+    return engine
+
+
+def seed(path, articles, users, categories):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    now = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['users'].insert(), [
+            {'id': i, 'username': f'user{i}', 'password_hash': 'x', 'department': '技术部',
+             'status': 'active', 'is_active': True, 'created_at': now}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(db.metadata.tables['knowledge_categories'].insert(), [
+            {'id': i, 'name': f'分类{i}', 'created_at': now} for i in range(1, categories + 1)
+        ])
+        conn.execute(db.metadata.tables['knowledge_articles'].insert(), [
+            {'id': i, 'title': f'文章{i}', 'content': '正文' * 200, 'category_id': i % categories + 1,
+             'author_id': 1, 'is_published': True, 'view_count': 0, 'publish_time': now, 'update_time': now}
+            for i in range(1, articles + 1)
+        ])
+    engine.dispose()
+
+
+def reader(path, profile, deadline, categories, queue):
+    engine = make_engine(path, profile)
+    rnd = random.Random(os.getpid())
+    latencies, errors = [], 0
+    with engine.connect() as conn:
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.execute(READ_SQL, {'category_id': rnd.randint(1, categories)}).fetchall()
+                conn.rollback()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                conn.rollback()
+                errors += 1
+    queue.put(('read', latencies, errors))
+
+
+def writer(path, profile, deadline, articles, users, queue):
+    engine = make_engine(path, profile)
+    rnd = random.Random(os.getpid())
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(rnd.choice(WRITE_SQL), {'article_id': rnd.randint(1, articles),
+                                                     'user_id': rnd.randint(1, users), 'now': datetime.utcnow()})
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    queue.put(('write', latencies, errors))
+
+
+def run_profile(profile, args):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(path, args.articles, args.users, args.categories)
+    # 先建立一次连接，让 journal_mode 在压测开始前生效
+    make_engine(path, profile).connect().close()
+
+    queue = multiprocessing.Queue()
+    deadline = time.time() + 1 + args.seconds
+    processes = [multiprocessing.Process(target=reader, args=(path, profile, deadline, args.categories, queue))
+                 for _ in range(args.readers)]
+    processes += [multiprocessing.Process(target=writer,
+                                          args=(path, profile, deadline, args.articles, args.users, queue))
+                  for _ in range(args.writers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for kind in ('read', 'write'):
+        latencies = sorted(l for k, items, _ in results if k == kind for l in items)
+        errors = sum(e for k, _, e in results if k == kind)
+        summary[kind] = {
+            'ops': len(latencies) / args.seconds,
+            'p50': statistics.median(latencies) * 1000 if latencies else 0.0,
+            'p99': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+            'errors': errors,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--articles', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'{args.readers} 个读进程、{args.writers} 个写进程，每种配置 {args.seconds:g}s')
+    for profile in PROFILES:
+        summary = run_profile(profile, args)
+        read, write = summary['read'], summary['write']
+        print(f"{profile:>8}：读 {read['ops']:8.0f}/s（p50 {read['p50']:.2f}ms，p99 {read['p99']:.2f}ms，"
+              f"失败 {read['errors']}）  写 {write['ops']:6.0f}/s（p50 {write['p50']:.2f}ms，"
+              f"p99 {write['p99']:.2f}ms，失败 {write['errors']}）")
+
+
+if __name__ == '__main__':
+    main()
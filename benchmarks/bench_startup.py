@@ -0,0 +1,203 @@
+"""启动耗时与预派生内存对比
+
+每种方式都在独立的子进程中运行，数据库是临时目录下新初始化的 SQLite：
+
+- cold：冷启动的 Web 进程，从解释器启动、导入、create_app() 到第一个响应，
+  再以已登录身份打开首页（与不带 --preload 的 worker 启动过程相同）；
+- cli：命令行脚本的启动，create_app(views=False) 后执行一条查询；
+- prefork：主进程创建应用并调用 prefork.prepare_for_fork() 后 fork 出
+  若干 worker（与 gunicorn --preload 相同），计时从 fork 开始；
+- prefork-plain：同上，但 fork 前不预热、不 gc.freeze()，用于对照。
+
+每个 worker 在打开几个常用页面并做一次完整的垃圾回收后报告内存：
+USS 为本进程独占的内存，PSS 把共享页按共享进程数均摊。预派生的 worker
+独占内存越少，同样内存能开的 worker 越多。
+
+用法：python benchmarks/bench_startup.py [--runs 5] [--workers 4]
+"""
+import time
+
+STARTED = time.time()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ('cold', 'cli', 'prefork', 'prefork-plain')
+
+# 登录后依次打开的页面，让 worker 进入接近稳定运行时的内存状态
+WARM_PAGES = ('/knowledge', '/supplies', '/notifications', '/messages', '/employees', '/requests')
+
+
+def memory_usage():
+    """(USS, PSS)，单位 MB；不支持 smaps_rollup 的系统返回 (None, None)"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {line.split(':')[0]: int(line.split()[1]) for line in f if line.endswith('kB\n')}
+    except OSError:
+        return None, None
+    return (fields['Private_Clean'] + fields['Private_Dirty']) / 1024, fields['Pss'] / 1024
+
+
+def serve_first_requests(app, started):
+    """第一个响应（登录页）与已登录首页的耗时，随后打开常用页面并测内存"""
+    import gc
+    from simple_models import User
+
+    client = app.test_client()
+    response = client.get('/login')
+    assert response.status_code == 200, response.status_code
+    first = time.time()
+    # 直接写入 Flask-Login 的会话，不计入与启动无关的密码哈希耗时
+    with app.app_context():
+        user_id = User.query.filter_by(username='superadmin').one().id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    response = client.get('/')
+    assert response.status_code == 200, response.status_code
+    home = time.time()
+
+    for page in WARM_PAGES:
+        client.get(page)
+    gc.collect()
+    uss, pss = memory_usage()
+    return {'first_ms': (first - started) * 1000, 'home_ms': (home - first) * 1000, 'uss_mb': uss, 'pss_mb': pss}
+
+
+def child_cold(spawned):
+    imported = time.time()
+    from app import create_app
+    created = time.time()
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    ready = time.time()
+    result = serve_first_requests(app, ready)
+    result.update(interpreter_ms=(STARTED - spawned) * 1000, import_ms=(created - imported) * 1000,
+                  create_ms=(ready - created) * 1000)
+    result['total_ms'] = (ready - spawned) * 1000 + result['first_ms'] + result['home_ms']
+    return [result]
+
+
+def child_cli(spawned):
+    imported = time.time()
+    from app import create_app
+    from simple_models import db, User
+    created = time.time()
+    app = create_app(views=False)
+    ready = time.time()
+    with app.app_context():
+        db.session.query(User.id).limit(1).all()
+    done = time.time()
+    return [{
+        'interpreter_ms': (STARTED - spawned) * 1000, 'import_ms': (created - imported) * 1000,
+        'create_ms': (ready - created) * 1000, 'first_ms': (done - ready) * 1000,
+        'total_ms': (done - spawned) * 1000,
+    }]
+
+
+def child_master(workers, warm):
+    """在本进程创建应用后 fork 出 workers 个子进程，收集各子进程的结果"""
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    if warm:
+        from prefork import prepare_for_fork
+        prepare_for_fork(app)
+
+    pipes = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        forked = time.time()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 0
+            try:
+                result = serve_first_requests(app, forked)
+                result['total_ms'] = result['first_ms'] + result['home_ms']
+                os.write(write_fd, json.dumps(result).encode())
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        pipes.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in pipes:
+        with os.fdopen(read_fd) as f:
+            data = f.read()
+        _, status = os.waitpid(pid, 0)
+        if status != 0 or not data:
+            raise RuntimeError(f'worker {pid} 失败')
+        results.append(json.loads(data))
+    return results
+
+
+def run_child(mode, env, workers):
+    spawned = time.time()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, '--spawned', repr(spawned),
+         '--workers', str(workers)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(rows, key):
+    values = [row[key] for row in rows if row.get(key) is not None]
+    return statistics.median(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='每种方式重复的次数')
+    parser.add_argument('--workers', type=int, default=4, help='预派生方式每次 fork 的 worker 数')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--spawned', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.child == 'cold':
+            results = child_cold(args.spawned)
+        elif args.child == 'cli':
+            results = child_cli(args.spawned)
+        else:
+            results = child_master(args.workers, warm=args.child == 'prefork')
+        print(json.dumps(results))
+        return
+
+    tmp_dir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}",
+               PORTAL_CONFIG='production', SECRET_KEY='bench-startup-secret-key')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    subprocess.run([sys.executable, 'init_db.py'], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+
+    columns = (('interpreter_ms', '解释器'), ('import_ms', '导入'), ('create_ms', 'create_app'),
+               ('first_ms', '首个响应'), ('home_ms', '首页'), ('total_ms', '合计'),
+               ('uss_mb', 'USS(MB)'), ('pss_mb', 'PSS(MB)'))
+    print(f"{'方式':<15}" + ''.join(f'{title:>12}' for _, title in columns))
+    for mode in args.modes:
+        rows = []
+        for _ in range(args.runs):
+            rows.extend(run_child(mode, env, args.workers))
+        cells = []
+        for key, _ in columns:
+            value = median(rows, key)
+            cells.append(f'{value:>12.1f}' if value is not None else f"{'-':>12}")
+        print(f'{mode:<15}' + ''.join(cells))
+    print(f'\n各列为中位数；耗时单位毫秒。预派生方式的耗时从 fork 开始计算，'
+          f'每次 {args.workers} 个 worker，共 {args.runs} 次。')
+
+
+if __name__ == '__main__':
+    main()
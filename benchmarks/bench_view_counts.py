@@ -0,0 +1,155 @@
+"""文章浏览量写入方式对比：逐次写入 vs 内存缓冲批量写回
+
+在临时 SQLite 数据库上，多个读进程持续“阅读文章”，同时若干写进程持续
+插入消息（模拟其他业务写操作），分别统计两种模式下的读吞吐、写吞吐、
+写延迟、锁冲突次数，以及最终落库的浏览量是否与实际浏览次数一致。
+每个工作进程各自持有连接（与多进程部署一致），避免 GIL 干扰结果。
+
+用法：python benchmarks/bench_view_counts.py [--seconds 5] [--readers 4] [--writers 2]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from simple_models import db, User, KnowledgeArticle, Message
+from view_counter import ViewCountBuffer
+
+ARTICLE_COUNT = 100
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(db_path):
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', department='技术部', status='active', is_active=True)
+        user.set_password('bench123')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([
+            KnowledgeArticle(title=f'文章 {i}', content='内容' * 200, author_id=user.id, view_count=0)
+            for i in range(ARTICLE_COUNT)
+        ])
+        db.session.commit()
+
+
+def reader(db_path, mode, deadline, results):
+    app = create_app(db_path)
+    buffer = ViewCountBuffer(app) if mode == 'buffered' else None
+    reads = errors = 0
+    article_id = os.getpid() % ARTICLE_COUNT
+    with app.app_context():
+        while time.time() < deadline:
+            article_id = article_id % ARTICLE_COUNT + 1
+            try:
+                article = db.session.get(KnowledgeArticle, article_id)
+                if buffer is not None:
+                    buffer.record(article.id)
+                else:
+                    # 原实现：每次浏览都在请求内提交一次写事务
+                    article.view_count += 1
+                    db.session.commit()
+                reads += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+            db.session.remove()
+    if buffer is not None:
+        buffer.flush()
+    results.put({'reads': reads, 'errors': errors})
+
+
+def writer(db_path, deadline, results):
+    app = create_app(db_path)
+    writes = errors = 0
+    latencies = []
+    with app.app_context():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                db.session.add(Message(title='bench', content='bench', sender_id=1, recipient_id=1))
+                db.session.commit()
+                writes += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+            db.session.remove()
+    results.put({'writes': writes, 'errors': errors, 'latencies': latencies})
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(mode, seconds, readers, writers):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(db_path)
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + 1 + seconds
+    processes = [multiprocessing.Process(target=reader, args=(db_path, mode, deadline, results))
+                 for _ in range(readers)]
+    processes += [multiprocessing.Process(target=writer, args=(db_path, deadline, results))
+                  for _ in range(writers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = sum(r.get('reads', 0) for r in collected)
+    writes = sum(r.get('writes', 0) for r in collected)
+    latencies = [l for r in collected for l in r.get('latencies', [])]
+
+    app = create_app(db_path)
+    with app.app_context():
+        views_in_db = db.session.query(db.func.sum(KnowledgeArticle.view_count)).scalar()
+
+    return {
+        'mode': mode,
+        'reads_per_sec': reads / seconds,
+        'writes_per_sec': writes / seconds,
+        'write_p50_ms': percentile(latencies, 50) * 1000,
+        'write_p95_ms': percentile(latencies, 95) * 1000,
+        'lock_errors': sum(r['errors'] for r in collected),
+        'views': reads,
+        'views_in_db': views_in_db,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'模式':<10}{'读/秒':>10}{'写/秒':>10}{'写p50(ms)':>12}{'写p95(ms)':>12}{'锁冲突':>8}  落库/实际浏览")
+    for mode in ('direct', 'buffered'):
+        r = run(mode, args.seconds, args.readers, args.writers)
+        print(f"{r['mode']:<10}{r['reads_per_sec']:>10.0f}{r['writes_per_sec']:>10.0f}"
+              f"{r['write_p50_ms']:>12.1f}{r['write_p95_ms']:>12.1f}{r['lock_errors']:>8}"
+              f"  {r['views_in_db']}/{r['views']}")
+
+
+if __name__ == '__main__':
+    main()
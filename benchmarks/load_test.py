@@ -0,0 +1,449 @@
+"""端到端压测：按场景组合模拟并发用户，输出各端点吞吐、延迟分位数和错误率
+
+虚拟用户（线程）在 --duration 秒内不断按 --mix 的权重挑选场景执行：
+
+- morning_login        上班登录：登录后看首页、消息、通知、未读数，退出
+- approver_inbox       审批：管理员打开申请列表，逐个审批待审批的申请
+- supply_request_burst 集中申领：普通用户连续提交几次耗材申请
+- knowledge_browsing   知识库浏览：分类、文章、标签、全文检索
+- admin                后台管理：用户管理、员工名录与检索、档案统计、耗材管理
+
+与浏览器一样，表单的 csrf_token 和要访问的 id 都从页面中解析，不直接读数据库。
+
+压测目标（--target）：
+- test-client：Flask 测试客户端，在本进程内调用，不经过网络（默认）
+- local：在本进程内启动多线程的 werkzeug WSGI 服务器，经 HTTP 访问
+- http://主机:端口：已在运行的服务（如 gunicorn），使用 init_db 的测试账号
+
+前两种在临时 SQLite 数据库上先用 generate_data 按 --scale 生成数据。
+结果（含提交号）以 JSON 写入 --output（默认标准输出），人可读的汇总打印到标准错误；
+--baseline 指定之前的结果文件时，汇总中附带与之相比的变化，便于跨提交对比。
+
+用法：python benchmarks/load_test.py [--target test-client|local|URL] [--users 8] [--duration 30]
+                                     [--mix default] [--scale 0.05] [--output result.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime
+from http.cookies import SimpleCookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from perf_profiler import percentile
+
+# 场景权重组合
+MIXES = {
+    'default': {'morning_login': 3, 'knowledge_browsing': 4, 'supply_request_burst': 1, 'approver_inbox': 1, 'admin': 1},
+    'morning': {'morning_login': 8, 'knowledge_browsing': 2},
+    'approval': {'supply_request_burst': 3, 'approver_inbox': 3, 'morning_login': 1},
+    'browse': {'knowledge_browsing': 1},
+    'admin': {'admin': 1},
+}
+PERCENTILES = (50, 90, 95, 99)
+
+# init_db 的测试账号（连接已有服务时使用）
+APPROVER = ('admin', 'admin123')
+SUPER_ADMIN = ('superadmin', 'admin123')
+DEFAULT_USERS = [('zhangsan', 'admin123'), ('lisi', 'admin123')]
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+SEARCH_WORDS = ['流程', '报销', '培训', '安全', '审批', '规范']
+
+
+# ============ 客户端 ============
+
+class TestClientTransport:
+    """Flask 测试客户端，自带 cookie"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HTTPTransport:
+    """长连接 HTTP 客户端，只处理会话 cookie"""
+
+    def __init__(self, base_url):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.conn = None
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{key}={morsel.value}' for key, morsel in self.cookies.items())
+        if data is not None:
+            body = urllib.parse.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, urllib.parse.quote(path, safe='/?=&%'), body=body, headers=headers)
+                response = self.conn.getresponse()
+                text = response.read().decode('utf-8', 'replace')
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # 服务端关闭了空闲连接，重连一次
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+        return response.status, text
+
+
+class VirtualUser:
+    """一个虚拟用户：持有会话，按端点名记录每次请求的耗时和结果"""
+
+    def __init__(self, index, make_transport, accounts, seed, record):
+        self.rnd = random.Random(seed * 1000 + index)
+        self.make_transport = make_transport
+        self.accounts = accounts
+        self.record = record
+        self.transport = make_transport()
+        self.logged_in_as = None
+
+    def call(self, name, method, path, data=None, expect=(200,)):
+        started = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, path, data)
+        except Exception as e:
+            status, body = None, ''
+            error = type(e).__name__
+        else:
+            error = None if status in expect else f'HTTP {status}'
+        self.record(f'{method} {name}', started, (time.perf_counter() - started) * 1000, error)
+        return body if error is None else None
+
+    def get(self, name, path, **kwargs):
+        return self.call(name, 'GET', path, **kwargs)
+
+    def post(self, name, path, data, expect=(302,)):
+        return self.call(name, 'POST', path, data, expect=expect)
+
+    def form_token(self, html):
+        match = CSRF_RE.search(html or '')
+        return match.group(1) if match else ''
+
+    def login(self, account, fresh=False):
+        if self.logged_in_as == account and not fresh:
+            return True
+        self.transport = self.make_transport()
+        self.logged_in_as = None
+        page = self.get('login', '/login')
+        if page is None:
+            return False
+        username, password = account
+        if self.post('login', '/login', {'username': username, 'password': password,
+                                          'csrf_token': self.form_token(page)}) is None:
+            return False
+        self.logged_in_as = account
+        return True
+
+    def regular_account(self):
+        return self.rnd.choice(self.accounts)
+
+    def pick(self, pattern, html):
+        found = re.findall(pattern, html or '')
+        return self.rnd.choice(found) if found else None
+
+
+# ============ 场景 ============
+
+def morning_login(vu):
+    if not vu.login(vu.regular_account(), fresh=True):
+        return
+    vu.get('index', '/')
+    vu.get('messages_list', '/messages')
+    vu.get('api_unread_messages_count', '/api/unread_messages_count')
+    vu.get('notifications_list', '/notifications')
+    vu.get('logout', '/logout', expect=(302,))
+    vu.logged_in_as = None
+
+
+def approver_inbox(vu):
+    if not vu.login(APPROVER):
+        return
+    inbox = vu.get('request_list', '/requests')
+    pending = sorted(set(re.findall(r'/request/(\d+)/approve', inbox or '')))
+    # 各审批人随机挑选，避免并发的虚拟用户都去审批同一条
+    for request_id in vu.rnd.sample(pending, min(3, len(pending))):
+        page = vu.get('approve_request', f'/request/{request_id}/approve')
+        if page is None:
+            continue
+        action = 'approve' if vu.rnd.random() < 0.85 else 'reject'
+        vu.post('approve_request', f'/request/{request_id}/approve', {
+            'action': action, 'reject_reason': '压测' if action == 'reject' else '',
+            'csrf_token': vu.form_token(page),
+        })
+    vu.get('index', '/')
+
+
+def supply_request_burst(vu):
+    if not vu.login(vu.regular_account()):
+        return
+    vu.get('supplies_list', '/supplies')
+    for _ in range(3):
+        page = vu.get('supply_request', '/supply/request')
+        supply_id = vu.pick(r'<option[^>]* value="(\d+)"', page)
+        if supply_id is None:
+            return
+        vu.post('supply_request', '/supply/request', {
+            'supply_id': supply_id, 'quantity': 1, 'csrf_token': vu.form_token(page),
+        })
+    vu.get('request_list', '/requests')
+
+
+def knowledge_browsing(vu):
+    if not vu.login(vu.regular_account()):
+        return
+    home = vu.get('knowledge_base', '/knowledge')
+    category_id = vu.pick(r'/knowledge/category/(\d+)"', home)
+    if category_id is not None:
+        page = vu.get('knowledge_category', f'/knowledge/category/{category_id}?include_sub=1')
+        for article_id in set(re.findall(r'/knowledge/article/(\d+)"', page or '')[:3]):
+            vu.get('knowledge_article', f'/knowledge/article/{article_id}')
+    tag = vu.pick(r'/knowledge/tag/([^"]+)"', home)
+    if tag is not None:
+        vu.get('knowledge_tag', f'/knowledge/tag/{urllib.parse.unquote(tag)}')
+    vu.get('knowledge_search', f'/knowledge/search?q={vu.rnd.choice(SEARCH_WORDS)}')
+
+
+def admin(vu):
+    if not vu.login(SUPER_ADMIN):
+        return
+    vu.get('admin_users', '/admin/users')
+    vu.get('admin_users', '/admin/users?status=pending')
+    vu.get('employees_list', '/employees')
+    vu.get('employees_list', f'/employees?keyword={vu.rnd.choice("王李张刘陈")}')
+    vu.get('archives', '/archives')
+    vu.get('admin_supplies', '/admin/supplies')
+
+
+SCENARIOS = {f.__name__: f for f in (morning_login, approver_inbox, supply_request_burst, knowledge_browsing, admin)}
+
+
+# ============ 运行 ============
+
+class Recorder:
+    """汇总所有虚拟用户的请求记录；预热期内开始的请求不计入"""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.scenarios = defaultdict(lambda: {'iterations': 0, 'failed': 0})
+
+    def record(self, name, started, elapsed_ms, error):
+        if started < self.measure_from:
+            return
+        with self.lock:
+            self.latencies[name].append(elapsed_ms)
+            if error:
+                self.errors[name][error] += 1
+
+    def scenario_done(self, name, started, failed):
+        if started < self.measure_from:
+            return
+        with self.lock:
+            self.scenarios[name]['iterations'] += 1
+            self.scenarios[name]['failed'] += int(failed)
+
+
+def run_virtual_user(index, args, make_transport, accounts, recorder, deadline):
+    vu = VirtualUser(index, make_transport, accounts, args.seed, recorder.record)
+    names = list(MIXES[args.mix])
+    weights = [MIXES[args.mix][name] for name in names]
+    while time.perf_counter() < deadline:
+        name = vu.rnd.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            SCENARIOS[name](vu)
+            failed = False
+        except Exception:
+            # 页面结构与预期不符等，视为本次场景失败，换新会话继续
+            failed = True
+            vu.logged_in_as = None
+        recorder.scenario_done(name, started, failed)
+        if args.think_ms:
+            time.sleep(vu.rnd.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    error_count = sum(errors.values())
+    result = {
+        'requests': len(values),
+        'throughput_rps': round(len(values) / elapsed, 2),
+        'error_rate': round(error_count / len(values), 4) if values else 0.0,
+        'errors': dict(errors),
+        'mean_ms': round(sum(values) / len(values), 2) if values else 0.0,
+        'max_ms': round(values[-1], 2) if values else 0.0,
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = round(percentile(values, p), 2)
+    return result
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def prepare_local_app(args):
+    """在临时 SQLite 数据库上生成数据并导入应用，返回 (app, 普通用户账号列表)"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # 按生产配置压测，该配置要求提供 SECRET_KEY
+    os.environ.setdefault('SECRET_KEY', 'load-test-secret-key')
+
+    import init_db
+    from generate_data import PASSWORD, generate
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.init_database()
+        with init_db.app.app_context():
+            generate(scale=args.scale, seed=args.seed)
+
+    from app import create_app
+    from simple_models import db, User, Role
+    app = create_app('production')
+    with app.app_context():
+        usernames = db.session.query(User.username).join(User.roles)\
+            .filter(User.status == 'active', User.username.like('u%'), Role.name == 'user')\
+            .order_by(User.id).limit(500).all()
+        db.session.remove()
+    return app, [(username, PASSWORD) for username, in usernames] or DEFAULT_USERS
+
+
+def print_report(result, baseline, out):
+    base_endpoints = (baseline or {}).get('endpoints', {})
+
+    def change(name, key, value):
+        old = base_endpoints.get(name, {}).get(key) if name else (baseline or {}).get('totals', {}).get(key)
+        if not old:
+            return ''
+        return f' ({(value - old) / old * 100:+.0f}%)'
+
+    print(f"{'端点':<32}{'请求数':>8}{'吞吐/秒':>16}{'p50':>9}{'p95':>18}{'p99':>9}{'错误率':>8}", file=out)
+    rows = sorted(result['endpoints'].items(), key=lambda item: -item[1]['requests'])
+    for name, row in rows + [('合计', result['totals'])]:
+        key = None if name == '合计' else name
+        print(f"{name:<34}{row['requests']:>8}"
+              f"{row['throughput_rps']:>9.1f}{change(key, 'throughput_rps', row['throughput_rps']):<7}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{change(key, 'p95_ms', row['p95_ms']):<9}"
+              f"{row['p99_ms']:>9.1f}{row['error_rate'] * 100:>7.1f}%", file=out)
+    for name, errors in sorted((name, row['errors']) for name, row in result['endpoints'].items() if row['errors']):
+        print(f'  {name} 错误：{errors}', file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default='test-client', help='test-client、local 或已运行服务的地址')
+    parser.add_argument('--users', type=int, default=8, help='并发虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='计入结果的压测时长（秒）')
+    parser.add_argument('--warmup', type=float, default=3, help='预热时长（秒），期间的请求不计入')
+    parser.add_argument('--mix', default='default', choices=sorted(MIXES))
+    parser.add_argument('--think-ms', type=float, default=0, help='场景之间的平均思考时间（毫秒）')
+    parser.add_argument('--scale', type=float, default=0.05, help='本地目标时 generate_data 的数据规模')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON 结果写入的文件，默认输出到标准输出')
+    parser.add_argument('--baseline', help='用于对比的之前的 JSON 结果')
+    args = parser.parse_args()
+
+    server = None
+    accounts = DEFAULT_USERS
+    if args.target in ('test-client', 'local'):
+        app, accounts = prepare_local_app(args)
+        if args.target == 'test-client':
+            make_transport = lambda: TestClientTransport(app)
+        else:
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            make_transport = lambda: HTTPTransport(base_url)
+    elif args.target.startswith('http://'):
+        make_transport = lambda: HTTPTransport(args.target)
+    else:
+        parser.error('--target 须为 test-client、local 或 http:// 地址')
+
+    started = time.perf_counter()
+    recorder = Recorder(measure_from=started + args.warmup)
+    deadline = started + args.warmup + args.duration
+    threads = [threading.Thread(target=run_virtual_user, args=(i, args, make_transport, accounts, recorder, deadline))
+               for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - recorder.measure_from
+    if server is not None:
+        server.shutdown()
+
+    commit, dirty = git_revision()
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    all_errors = defaultdict(int)
+    for errors in recorder.errors.values():
+        for error, count in errors.items():
+            all_errors[error] += count
+    result = {
+        'meta': {
+            'commit': commit, 'dirty': dirty, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'target': args.target, 'users': args.users, 'duration_s': round(elapsed, 2), 'warmup_s': args.warmup,
+            'mix': args.mix, 'mix_weights': MIXES[args.mix], 'think_ms': args.think_ms,
+            'scale': args.scale if args.target in ('test-client', 'local') else None, 'seed': args.seed,
+            'python': platform.python_version(), 'platform': platform.platform(),
+        },
+        'totals': summarize(all_latencies, all_errors, elapsed),
+        'endpoints': {name: summarize(values, recorder.errors[name], elapsed)
+                      for name, values in sorted(recorder.latencies.items())},
+        'scenarios': {name: dict(stats) for name, stats in sorted(recorder.scenarios.items())},
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline, sys.stderr)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+"""按路由检查 SQL 条数与耗时预算，防止 N+1 查询回归
+
+在临时 SQLite 数据库上先执行 init_db 的初始化，再按 --scale 批量生成通知、
+耗材申请、员工、消息、知识库文章和用户，然后分别以超级管理员、管理员和
+普通用户身份，用 Flask 测试客户端访问 ROUTES 中的每个页面、执行 ACTIONS
+中的每个写操作和流式下载，统计请求线程执行的 SQL 条数和耗时（中位数）；
+流式响应读完全部内容后才停止计时。之后把数据量扩大到 --growth 倍再测一次：
+
+- SQL 条数超过路由预算，或耗时超过预算（乘以 --latency-factor）时失败；
+- 数据量扩大后 SQL 条数变多即判为随行数增长（通常是模板中逐行懒加载关联，
+  或写操作逐行查询、逐行写入），即使仍在预算内也失败；批量操作涉及的用户数、
+  导入的行数随数据量同比放大；
+- 写操作以超级管理员身份执行时返回的状态码与预期不符（如表单校验失败），
+  说明测到的不是实际处理路径，同样失败。
+
+有路由失败时退出码为 1。新增页面或有意改变查询方式时，同步调整 ROUTES、ACTIONS 中的预算。
+
+用法：python benchmarks/query_budget.py [--scale 30] [--growth 4] [--runs 3] [--latency-factor 1.0] [--route 端点名]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 应用在导入时按 DATABASE_URL 连接数据库，必须在导入 app / init_db 之前设置；
+# 上传的档案文件同样放在临时目录，不写入实例目录
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, 'query_budget.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['EMPLOYEE_FILE_ROOT'] = os.path.join(TMP_DIR, 'employee_files')
+os.environ['EMPLOYEE_FILE_PREVIEW_ROOT'] = os.path.join(TMP_DIR, 'employee_file_previews')
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 登录身份：init_db 创建的测试账号
+ROLES = [
+    ('super_admin', 'superadmin', 'admin123'),
+    ('admin', 'admin', 'admin123'),
+    ('user', 'zhangsan', 'admin123'),
+]
+
+# (端点名, 地址, SQL 条数预算, 耗时预算 ms)；地址中的 {占位符} 取自 sample_ids()
+# 预算按所有角色中的最大值设定，包含 Flask-Login 加载当前用户和导航栏未读消息计数
+ROUTES = [
+    ('index', '/', 9, 150),
+    ('notifications', '/notifications', 5, 150),
+    ('notification_detail', '/notification/{notification_id}', 5, 100),
+    ('create_notification', '/notification/create', 3, 100),
+    ('supplies_list', '/supplies', 5, 150),
+    ('request_list', '/requests', 6, 200),
+    ('request_supply', '/supply/request', 4, 100),
+    ('admin_supplies', '/admin/supplies', 5, 150),
+    ('supply_categories', '/supply/categories', 5, 100),
+    ('employees_list', '/employees', 4, 150),
+    ('employees_list:search', '/employees?keyword=员工1', 4, 150),
+    ('employee_detail', '/employee/{employee_id}', 5, 100),
+    ('archives', '/archives', 3, 150),
+    ('knowledge_base', '/knowledge', 7, 150),
+    ('knowledge_search', '/knowledge/search?q=流程', 6, 150),
+    ('knowledge_tag', '/knowledge/tag/{tag}', 6, 150),
+    ('knowledge_category', '/knowledge/category/{category_id}', 6, 150),
+    ('knowledge_article', '/knowledge/article/{article_id}', 7, 150),
+    ('article_history', '/knowledge/article/{article_id}/history', 5, 100),
+    ('create_knowledge_article', '/knowledge/article/create', 4, 100),
+    ('edit_knowledge_article', '/knowledge/article/{article_id}/edit', 5, 100),
+    ('messages_list', '/messages', 5, 150),
+    ('message_detail', '/message/{message_id}', 4, 100),
+    ('send_message', '/message/send', 4, 100),
+    ('api_unread_messages_count', '/api/unread_messages_count', 2, 50),
+    ('admin_users', '/admin/users', 7, 200),
+    ('admin_users:pending', '/admin/users?status=pending', 7, 200),
+    ('user_roles', '/admin/user/{user_id}/roles', 6, 100),
+    ('admin_permissions', '/admin/permissions', 4, 100),
+]
+
+# 写操作与流式下载：(端点名, 方法, 地址, 准备函数, SQL 条数预算, 耗时预算 ms, 超级管理员的预期状态码)
+# 准备函数在计时之外、每次请求前于应用上下文中调用，参数为 (当前用户, 规模)，
+# 返回 (地址占位符, 表单数据)；规模随数据量同比放大（见 measure_all）
+ACTIONS = [
+    ('supply_request:post', 'POST', '/supply/request', lambda user, size: _supply_request_form(), 10, 150, 302),
+    ('approve_request:approve', 'POST', '/request/{request_id}/approve',
+     lambda user, size: _supply_request_target(user, 'pending', {'action': 'approve'}), 7, 100, 302),
+    ('approve_request:reject', 'POST', '/request/{request_id}/approve',
+     lambda user, size: _supply_request_target(user, 'pending', {'action': 'reject', 'reject_reason': '预算不足'}),
+     7, 100, 302),
+    ('issue_request', 'POST', '/request/{request_id}/issue',
+     lambda user, size: _supply_request_target(user, 'approved', {}), 7, 100, 302),
+    ('bulk_review_users', 'POST', '/admin/users/review', lambda user, size: _bulk_review_form(size), 6, 150, 302),
+    ('bulk_assign_roles', 'POST', '/admin/users/roles', lambda user, size: _bulk_roles_form(size), 9, 150, 302),
+    ('send_message:post', 'POST', '/message/send', lambda user, size: _message_form(user), 5, 100, 302),
+    ('import_employees:post', 'POST', '/employees/import', lambda user, size: _import_form(size), 7, 300, 200),
+    ('export_employees:csv', 'GET', '/employees/export/csv', None, 4, 200, 200),
+    ('export_employees:xlsx', 'GET', '/employees/export/xlsx', None, 4, 300, 200),
+    ('upload_employee_file', 'POST', '/employee/{employee_id}/files/upload',
+     lambda user, size: _upload_form(), 6, 150, 302),
+    ('download_employee_file', 'GET', '/employee/file/{file_id}/download',
+     lambda user, size: _stored_employee_file(), 4, 100, 200),
+    ('delete_employee_file', 'POST', '/employee/file/{file_id}/delete',
+     lambda user, size: _stored_employee_file(), 7, 100, 302),
+    ('create_knowledge_article:post', 'POST', '/knowledge/article/create',
+     lambda user, size: _article_form(None), 16, 200, 302),
+    ('edit_knowledge_article:post', 'POST', '/knowledge/article/{article_id}/edit',
+     lambda user, size: _article_form(user), 14, 200, 302),
+]
+
+DEPARTMENTS = ['技术部', '人事部', '财务部', '市场部', '行政部']
+TAGS = ['入职', '流程', '财务', '报销', '培训', '安全', '制度', '规范']
+
+
+# ============ 测试数据 ============
+
+def seed(count, rnd):
+    """每类数据各追加 count 条；关联对象（发布人、申请人、作者、发件人）尽量分散，
+    模板若逐行懒加载关联，SQL 条数会随之增长"""
+    from simple_models import (
+        db, User, Role, Notification, Supply, SupplyRequest, Employee, EmployeeFile,
+        KnowledgeCategory, KnowledgeArticle, Message,
+    )
+    from kb_tree import rebuild_category_tree
+    from kb_tags import rebuild_tag_index
+
+    start = db.session.query(db.func.count(User.id)).scalar()
+    user_role = Role.query.filter_by(name='user').first()
+    pending_role = Role.query.filter_by(name='pending').first()
+    users = []
+    for i in range(start, start + count):
+        pending = i % 4 == 0
+        user = User(username=f'bench{i}', password_hash='x', department=DEPARTMENTS[i % len(DEPARTMENTS)],
+                    real_name=f'用户{i}', email=f'bench{i}@company.com',
+                    status='pending' if pending else 'active', is_active=not pending)
+        user.roles.append(pending_role if pending else user_role)
+        users.append(user)
+    db.session.add_all(users)
+    db.session.flush()
+
+    # 登录用户各自也有数据，"我的申请"、"我的消息" 等页面才有内容
+    logins = User.query.filter(User.username.in_([username for _, username, _ in ROLES])).all()
+    people = users + logins
+    supplies = Supply.query.all()
+    categories = KnowledgeCategory.query.all()
+    now = datetime.now()
+
+    for i in range(count):
+        moment = now - timedelta(minutes=rnd.randint(1, 60 * 24 * 90))
+        db.session.add(Notification(
+            title=f'通知 {start + i}', content='通知内容' * 20, publisher_id=rnd.choice(people).id,
+            publish_time=moment, department=rnd.choice(DEPARTMENTS + ['全公司', None]), is_top=i % 10 == 0))
+        db.session.add(SupplyRequest(
+            applicant_id=rnd.choice(people).id, supply_id=rnd.choice(supplies).id, quantity=rnd.randint(1, 5),
+            status=rnd.choice(['pending', 'approved', 'rejected', 'issued']), apply_time=moment,
+            approver_id=rnd.choice(logins).id))
+        employee = Employee(
+            employee_id=f'B{start + i:06d}', name=f'员工{start + i}', department=rnd.choice(DEPARTMENTS),
+            position='工程师', email=f'e{start + i}@company.com', hire_date=date(2020, 1, 1) + timedelta(days=i),
+            status=rnd.choice(['在职', '在职', '离职']))
+        db.session.add(employee)
+        tags = ','.join(rnd.sample(TAGS, 3))
+        db.session.add(KnowledgeArticle(
+            title=f'流程文档 {start + i}', content='正文内容，介绍工作流程。' * 30, category_id=rnd.choice(categories).id,
+            author_id=rnd.choice(people).id, tags=tags, is_published=i % 8 != 0, publish_time=moment))
+        for recipient in logins:
+            db.session.add(Message(
+                title=f'消息 {start + i}', content='消息内容' * 10, sender_id=rnd.choice(people).id,
+                recipient_id=recipient.id, created_at=moment, is_read=rnd.random() < 0.5,
+                message_type=rnd.choice(['system', 'approval', 'department'])))
+    db.session.flush()
+
+    # 第一个员工的档案文件随数据量增加（文件本身不存在，只显示列表）
+    first_employee = Employee.query.order_by(Employee.id).first()
+    for i in range(count):
+        digest = '%064x' % rnd.getrandbits(256)
+        db.session.add(EmployeeFile(
+            employee_id=first_employee.id, file_name=f'档案{start + i}.pdf', file_type='pdf',
+            file_path=f'{digest[:2]}/{digest}', uploader_id=rnd.choice(logins).id,
+            upload_time=now - timedelta(minutes=i)))
+
+    rebuild_category_tree()
+    rebuild_tag_index()
+    db.session.commit()
+
+
+def sample_ids(username):
+    """地址占位符的取值：每类取一条，消息取发给当前用户的"""
+    from simple_models import db, User, Notification, Employee, KnowledgeArticle, KnowledgeTag, Message
+
+    user = User.query.filter_by(username=username).first()
+    article = KnowledgeArticle.query.filter_by(is_published=True).order_by(KnowledgeArticle.id).first()
+    return {
+        'notification_id': db.session.query(db.func.min(Notification.id)).scalar(),
+        'employee_id': db.session.query(db.func.min(Employee.id)).scalar(),
+        'article_id': article.id,
+        'category_id': article.category_id,
+        'tag': KnowledgeTag.query.order_by(KnowledgeTag.article_count.desc()).first().name,
+        'message_id': Message.query.filter_by(recipient_id=user.id).order_by(Message.id).first().id,
+        'user_id': User.query.filter_by(status='pending').order_by(User.id).first().id,
+    }
+
+
+# ============ 写操作的准备 ============
+
+# 每次准备生成唯一的工号、用户名、文件内容等
+_serial = itertools.count(1)
+
+
+def _available_supply():
+    from simple_models import db, Supply
+
+    supply = Supply.query.filter_by(is_available=True).order_by(Supply.id).first()
+    supply.current_stock = supply.total_stock = 10 ** 6
+    db.session.commit()
+    return supply
+
+
+def _supply_request_form():
+    return {}, {'supply_id': _available_supply().id, 'quantity': 1}
+
+
+def _supply_request_target(user, status, form):
+    """以当前用户为申请人建一条申请（审批人与申请人同部门，走完整审批路径）"""
+    from simple_models import db, SupplyRequest
+
+    supply_request = SupplyRequest(applicant_id=user.id, supply_id=_available_supply().id, quantity=1,
+                                   status=status, apply_time=datetime.now())
+    db.session.add(supply_request)
+    db.session.commit()
+    return {'request_id': supply_request.id}, form
+
+
+def _new_users(size, status):
+    from simple_models import db, User, Role
+
+    role = Role.query.filter_by(name='pending' if status == 'pending' else 'user').first()
+    users = []
+    for _ in range(size):
+        serial = next(_serial)
+        user = User(username=f'action{serial}', password_hash='x', department=DEPARTMENTS[serial % len(DEPARTMENTS)],
+                    real_name=f'操作用户{serial}', email=f'action{serial}@company.com',
+                    status=status, is_active=status != 'pending')
+        user.roles.append(role)
+        users.append(user)
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def _bulk_review_form(size):
+    return {}, {'action': 'approve', 'user_ids': _new_users(size, 'pending')}
+
+
+def _bulk_roles_form(size):
+    from simple_models import Role
+
+    roles = Role.query.filter(Role.name.in_(['user', 'admin'])).all()
+    return {}, {'mode': 'replace', 'user_ids': _new_users(size, 'active'), 'role_ids': [role.id for role in roles]}
+
+
+def _message_form(user):
+    return {}, {'title': '基准测试消息', 'content': '消息内容', 'recipient_id': user.id, 'message_type': 'system'}
+
+
+def _import_form(size):
+    """size × 10 行的 CSV：一半为新工号，一半更新已有员工"""
+    from simple_models import Employee
+
+    existing = Employee.query.order_by(Employee.id).limit(size * 5).all()
+    rows = ['工号,姓名,部门,职位,入职日期,状态']
+    rows += [f'{e.employee_id},{e.name},{e.department},高级工程师,2020-01-01,在职' for e in existing]
+    serial = next(_serial)
+    rows += [f'I{serial:04d}{i:05d},导入员工{i},技术部,工程师,2021-03-01,在职' for i in range(size * 10 - len(existing))]
+    return {}, {'file': (io.BytesIO('\n'.join(rows).encode('utf-8')), 'employees.csv')}
+
+
+def _upload_form():
+    content = f'档案内容 {next(_serial)}'.encode('utf-8')
+    return {}, {'file': (io.BytesIO(content), 'record.txt'), 'description': '基准测试'}
+
+
+def _stored_employee_file():
+    """写入一个实际存在的档案文件并登记，供下载与删除"""
+    from flask import current_app
+    from simple_models import db, Employee, EmployeeFile, User
+
+    store = current_app.extensions['employee_file_store']
+    tmp_path, digest, _ = store.stage(io.BytesIO(f'下载内容 {next(_serial)}'.encode('utf-8') * 1000))
+    try:
+        with store.lock():
+            relative_path = store.place(tmp_path, digest)
+    finally:
+        store.discard(tmp_path)
+    employee_file = EmployeeFile(
+        employee_id=db.session.query(db.func.min(Employee.id)).scalar(), file_name='下载.txt', file_type='TXT',
+        file_path=relative_path, uploader_id=User.query.filter_by(username='superadmin').one().id,
+        upload_time=datetime.now())
+    db.session.add(employee_file)
+    db.session.commit()
+    return {'file_id': employee_file.id}, None
+
+
+def _article_form(user):
+    """user 为 None 时新建文章，否则修改 sample_ids 中的文章（每次正文不同，都会记录修订）"""
+    from simple_models import KnowledgeArticle, KnowledgeCategory
+
+    serial = next(_serial)
+    if user is None:
+        form = {'title': f'新建文章 {serial}', 'content': '正文内容，介绍工作流程。' * 30,
+                'category_id': KnowledgeCategory.query.order_by(KnowledgeCategory.id).first().id,
+                'tags': '流程,规范'}
+        return {}, dict(form, is_published='y')
+    article = KnowledgeArticle.query.filter_by(is_published=True).order_by(KnowledgeArticle.id).first()
+    form = {'title': article.title, 'content': f'{article.content}\n第 {serial} 次修改', 'category_id': article.category_id,
+            'tags': article.tags or '', 'is_published': 'y'}
+    return {'article_id': article.id}, form
+
+
+# ============ 测量 ============
+
+class QueryCounter:
+    """统计当前线程执行的 SQL（后台线程如浏览量写回、预览生成不计入）"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self._thread = None
+        event.listen(Engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._thread == threading.get_ident():
+            self.count += 1
+            self.statements.append(' '.join(statement.split()))
+
+    @contextlib.contextmanager
+    def measure(self):
+        self.count = 0
+        self.statements = []
+        self._thread = threading.get_ident()
+        try:
+            yield self
+        finally:
+            self._thread = None
+
+
+def measure_all(app, counter, routes, runs, size):
+    """返回 {(端点名, 角色): 结果}，结果含状态码、SQL 条数与语句、耗时中位数
+
+    routes 为统一格式 (端点名, 方法, 地址, 准备函数, SQL 预算, 耗时预算, 预期状态码)，
+    size 为写操作的规模（批量操作的用户数、导入行数的十分之一）。
+    """
+    from simple_models import db, User
+
+    results = {}
+    for role, username, password in ROLES:
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        if response.status_code != 302:
+            raise SystemExit(f'{username} 登录失败（{response.status_code}）')
+        with app.app_context():
+            ids = sample_ids(username)
+            user_id = User.query.filter_by(username=username).one().id
+            db.session.remove()
+
+        for name, method, url, prepare, _, _, _ in routes:
+            timings = []
+            # 第一次为预热：首次访问会建派生表、填充缓存，不计入
+            for run in range(runs + 1):
+                params, data = {}, None
+                if prepare is not None:
+                    with app.app_context():
+                        params, data = prepare(db.session.get(User, user_id), size)
+                        db.session.remove()
+                target = url.format(**dict(ids, **params))
+                with counter.measure():
+                    started = time.perf_counter()
+                    response = client.open(target, method=method, data=data)
+                    # 流式响应在读取时才执行查询
+                    response.get_data()
+                    elapsed = (time.perf_counter() - started) * 1000
+                response.close()
+                if run:
+                    timings.append(elapsed)
+            results[name, role] = {
+                'url': target,
+                'status': response.status_code,
+                'queries': counter.count,
+                'statements': counter.statements,
+                'ms': statistics.median(timings),
+            }
+    return results
+
+
+def check(routes, small, large, latency_factor):
+    """比较两次测量，返回失败说明列表"""
+    failures = []
+    for name, method, _, _, query_budget, ms_budget, expect in routes:
+        for role, _, _ in ROLES:
+            before, after = small[name, role], large[name, role]
+            label = f'{name} [{role}] {method} {after["url"]}'
+            if after['status'] >= 500:
+                failures.append(f'{label}：返回 {after["status"]}')
+                continue
+            if expect is not None and role == 'super_admin' and after['status'] != expect:
+                failures.append(f'{label}：返回 {after["status"]}，预期 {expect}')
+            if after['queries'] > query_budget:
+                failures.append(f'{label}：SQL {after["queries"]} 条，超出预算 {query_budget} 条')
+            if after['queries'] > before['queries']:
+                extra = [s for s in after['statements'] if s not in before['statements']] or after['statements']
+                failures.append(f'{label}：SQL 条数随数据量增长 {before["queries"]} → {after["queries"]}，'
+                                f'疑似逐行查询：{extra[-1][:200]}')
+            if after['ms'] > ms_budget * latency_factor:
+                failures.append(f'{label}：耗时 {after["ms"]:.1f} ms，超出预算 {ms_budget * latency_factor:.0f} ms')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=30, help='首次测量时每类数据的条数')
+    parser.add_argument('--growth', type=int, default=4, help='第二次测量时数据量扩大的倍数')
+    parser.add_argument('--runs', type=int, default=3, help='每个地址测量次数，耗时取中位数')
+    parser.add_argument('--latency-factor', type=float, default=1.0, help='耗时预算的放大系数（较慢的机器上调大）')
+    parser.add_argument('--route', action='append', help='只检查指定端点名（可多次指定）')
+    args = parser.parse_args()
+
+    routes = [(name, 'GET', url, None, query_budget, ms_budget, None) for name, url, query_budget, ms_budget in ROUTES]
+    routes += ACTIONS
+    routes = [route for route in routes if not args.route or route[0] in args.route]
+    if not routes:
+        raise SystemExit('没有匹配的路由')
+
+    import init_db
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.init_database()
+
+    from app import create_app
+    from simple_models import db
+    app = create_app('testing')
+    app.config['ARCHIVE_STATS_STAMP_FILE'] = os.path.join(TMP_DIR, 'archive_stats.stamp')
+    app.config['KB_RELATED_MODEL_PATH'] = os.path.join(TMP_DIR, 'kb_related_model.npz')
+    counter = QueryCounter()
+    rnd = random.Random(42)
+
+    with app.app_context():
+        seed(args.scale, rnd)
+    small = measure_all(app, counter, routes, args.runs, max(args.scale // 10, 1))
+
+    with app.app_context():
+        seed(args.scale * (args.growth - 1), rnd)
+        db.session.remove()
+    large = measure_all(app, counter, routes, args.runs, max(args.scale * args.growth // 10, 1))
+    app.extensions['preview_worker'].shutdown()
+
+    print(f"{'端点':<28}{'角色':<13}{'状态':>5}{'SQL':>10}{'预算':>6}{'耗时(ms)':>10}{'预算':>7}")
+    for name, _, _, _, query_budget, ms_budget, _ in routes:
+        for role, _, _ in ROLES:
+            before, after = small[name, role], large[name, role]
+            queries = f'{before["queries"]}→{after["queries"]}'
+            print(f'{name:<30}{role:<13}{after["status"]:>5}{queries:>10}{query_budget:>6}'
+                  f'{after["ms"]:>10.1f}{ms_budget * args.latency_factor:>7.0f}')
+
+    failures = check(routes, small, large, args.latency_factor)
+    if failures:
+        print(f'\n{len(failures)} 项超出预算：')
+        for failure in failures:
+            print(f'  ✗ {failure}')
+        sys.exit(1)
+    print(f'\n全部 {len(routes)} 个路由 × {len(ROLES)} 个角色在预算内'
+          f'（数据量 {args.scale} → {args.scale * args.growth} 条/类）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""配置档案
+
+create_app(config_name) 按名称选用；未指定时取环境变量 PORTAL_CONFIG，
+默认 development。各功能模块的配置项（数据库连接池、慢查询、指标等）
+在对应模块的 init_app 中用 setdefault 给出默认值，这里只写需要按环境
+区分的部分。
+"""
+import os
+
+
+class Config:
+    # 未设置时 create_app 为本进程生成随机密钥并给出警告
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # 单次上传上限 512MB
+    # 以下目录未通过环境变量指定时放在实例目录下
+    EMPLOYEE_FILE_ROOT = os.environ.get('EMPLOYEE_FILE_ROOT')
+    EMPLOYEE_FILE_PREVIEW_ROOT = os.environ.get('EMPLOYEE_FILE_PREVIEW_ROOT')
+    PREVIEW_WORKERS = 2
+
+
+class DevelopmentConfig(Config):
+    # 修改模板后无需重启
+    TEMPLATES_AUTO_RELOAD = True
+
+
+class ProductionConfig(Config):
+    # 生产环境必须通过环境变量提供 SECRET_KEY，create_app 检查
+    REQUIRE_SECRET_KEY = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'testing-secret-key'
+    WTF_CSRF_ENABLED = False
+    # 测试与压测脚本自行统计查询，不写慢查询日志
+    SLOW_QUERY_THRESHOLD_MS = None
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def get_config(name=None):
+    name = name or os.environ.get('PORTAL_CONFIG') or 'development'
+    if name not in CONFIGS:
+        raise ValueError(f"未知的配置档案：{name}（可选 {', '.join(CONFIGS)}）")
+    return CONFIGS[name]
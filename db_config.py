@@ -0,0 +1,119 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from simple_models import db
+from db_routing import REPLICA_BIND
+
+DEFAULT_DATABASE_URI = 'sqlite:///portal.db'
+
+# 每个 SQLite 连接建立时执行的 PRAGMA：
+# WAL 下读不阻塞写、写不阻塞读；busy_timeout 让写冲突排队等待而不是立即报错；
+# WAL 模式下 synchronous=NORMAL 只在检查点时 fsync，断电最多丢最近的事务，不会损坏数据库
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,             # 毫秒
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,   # 字节
+    'cache_size': -64 * 1024,         # 负数单位为 KiB，即每个连接 64MB 页缓存
+    'temp_store': 'MEMORY',
+}
+
+# 只读连接不能修改日志模式和同步级别，只保留读相关的设置
+SQLITE_REPLICA_PRAGMAS = {
+    'busy_timeout': SQLITE_PRAGMAS['busy_timeout'],
+    'mmap_size': SQLITE_PRAGMAS['mmap_size'],
+    'cache_size': SQLITE_PRAGMAS['cache_size'],
+    'temp_store': SQLITE_PRAGMAS['temp_store'],
+    'query_only': 1,
+}
+
+# 服务器数据库（PostgreSQL/MySQL）连接池默认值，均可用同名环境变量覆盖
+POOL_DEFAULTS = {
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 30,       # 秒，等待空闲连接的最长时间
+    'DB_POOL_RECYCLE': 1800,     # 秒，早于服务端 wait_timeout 回收连接
+}
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def engine_options(uri):
+    """按数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS"""
+    if uri.startswith('sqlite'):
+        # 驱动层的锁等待与 busy_timeout 保持一致
+        return {'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}}
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', POOL_DEFAULTS['DB_POOL_SIZE']),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', POOL_DEFAULTS['DB_MAX_OVERFLOW']),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', POOL_DEFAULTS['DB_POOL_TIMEOUT']),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', POOL_DEFAULTS['DB_POOL_RECYCLE']),
+        'pool_pre_ping': True,
+    }
+
+
+def replica_uri(uri):
+    """只读库连接串：优先取环境变量 DATABASE_REPLICA_URL
+
+    主库是 SQLite 文件时，用同一文件的只读连接（mode=ro）充当只读库；
+    WAL 模式下它与主库的写事务互不阻塞。其他数据库未配置只读库时返回 None。
+    """
+    if os.environ.get('DATABASE_REPLICA_URL'):
+        return os.environ['DATABASE_REPLICA_URL']
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('uri'):
+        return None
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'})\
+        .render_as_string(hide_password=False)
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or SQLITE_PRAGMAS).items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """为 SQLite 引擎注册连接事件，新建的每个连接都执行 PRAGMA"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def configure_database(app):
+    """配置并初始化数据库
+
+    连接串取环境变量 DATABASE_URL，未设置时使用实例目录下的 SQLite 文件；
+    只读库见 replica_uri()。已在 app.config 中显式设置的值优先。
+    """
+    uri = app.config.setdefault('SQLALCHEMY_DATABASE_URI',
+                                os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI)
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
+    pragmas = dict(SQLITE_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {}))
+
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    replica = app.config.get('DATABASE_REPLICA_URI') or replica_uri(uri)
+    if replica and REPLICA_BIND not in binds:
+        binds[REPLICA_BIND] = dict(engine_options(replica), url=replica)
+
+    db.init_app(app)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            install_sqlite_pragmas(engine, SQLITE_REPLICA_PRAGMAS if key == REPLICA_BIND else pragmas)
+        if REPLICA_BIND in db.engines and db.engine.dialect.name == 'sqlite':
+            # 先由主库建立一次连接：数据库文件不存在时创建它，并切换到 WAL 模式
+            db.engine.connect().close()
@@ -0,0 +1,67 @@
+from functools import wraps
+
+from flask import request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.elements import TextClause
+
+# 只读库在 SQLALCHEMY_BINDS 中的键名
+REPLICA_BIND = 'replica'
+
+# 这些请求方法不修改数据，会话默认从只读库读取
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _is_read(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].lower() == 'select'
+    return bool(getattr(clause, 'is_select', False)) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """按读写分流的会话
+
+    会话标记为可读只读库（info['read_replica']）时，普通 SELECT 走只读引擎；
+    一旦发生 flush 或执行了写语句就固定到主库（info['primary_pinned']），
+    此后同一请求内的读也走主库，保证读到自己刚写入的数据。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_replica') and not self.info.get('primary_pinned'):
+            if not self._flushing and _is_read(clause):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+            self.info['primary_pinned'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def pin_primary(session):
+    """之后的查询都走主库（用于先读后写、需要读到最新数据的场景）"""
+    session.info['primary_pinned'] = True
+
+
+def init_read_routing(app, db):
+    """请求开始时按请求方法决定会话能否使用只读库
+
+    会话随应用上下文创建和销毁，每个请求都从未固定主库的状态开始。
+    DATABASE_READ_ROUTING 为 False 或没有配置只读库时全部走主库。
+    """
+    app.config.setdefault('DATABASE_READ_ROUTING', True)
+
+    @app.before_request
+    def _route_reads():
+        if app.config['DATABASE_READ_ROUTING'] and request.method in READ_METHODS:
+            db.session.info['read_replica'] = True
+
+
+def use_primary(db):
+    """路由装饰器：该视图的所有查询都走主库（GET 中会修改数据的视图使用）"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            pin_primary(db.session)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,157 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# 导出列定义：(表头, 列名)
+EXPORT_COLUMNS = [
+    ('工号', 'employee_id'),
+    ('姓名', 'name'),
+    ('部门', 'department'),
+    ('职位', 'position'),
+    ('邮箱', 'email'),
+    ('电话', 'phone'),
+    ('入职日期', 'hire_date'),
+    ('状态', 'status'),
+]
+
+# 每批从数据库游标读取的行数，同时也是每次向客户端刷新输出的行数
+EXPORT_BATCH_SIZE = 1000
+
+# XML 1.0 不允许出现的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# 以这些字符开头的单元格会被 Excel / LibreOffice 当作公式执行
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# 加在上述单元格前的转义前缀；导入时去掉（见 employee_import）
+FORMULA_ESCAPE = "'"
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    text = str(value)
+    # 用户填写的内容原样写入会被当作公式，加前缀按文本显示
+    if text.startswith(FORMULA_PREFIXES):
+        return FORMULA_ESCAPE + text
+    return text
+
+
+def iter_csv(rows):
+    """逐批生成 CSV 内容（带 BOM，方便 Excel 正确识别中文）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('﻿')
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+    for index, row in enumerate(rows, 1):
+        writer.writerow([_cell_text(value) for value in row])
+        if index % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """只追加的写入目标，供 zipfile 以非 seek 方式流式写入"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="员工名录" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        text = _ILLEGAL_XML_CHARS.sub('', _cell_text(value))
+        cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def iter_xlsx(rows):
+    """逐批生成 XLSX 内容
+
+    工作表使用内联字符串，不需要共享字符串表；zip 以流式模式写出，
+    因此无论导出多少行，内存中只保留当前一批数据。
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES_XML)
+        archive.writestr('_rels/.rels', _ROOT_RELS_XML)
+        archive.writestr('xl/workbook.xml', _WORKBOOK_XML)
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row([header for header, _ in EXPORT_COLUMNS])
+            ).encode('utf-8'))
+
+            batch = []
+            for index, row in enumerate(rows, 1):
+                batch.append(_xlsx_row(row))
+                if index % EXPORT_BATCH_SIZE == 0:
+                    sheet.write(''.join(batch).encode('utf-8'))
+                    batch = []
+                    yield sink.drain()
+
+            sheet.write((''.join(batch) + '</sheetData></worksheet>').encode('utf-8'))
+
+    yield sink.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -0,0 +1,283 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from simple_models import db, Employee
+from employee_export import EXPORT_COLUMNS, FORMULA_PREFIXES, FORMULA_ESCAPE
+
+# 每个事务写入的行数
+IMPORT_CHUNK_SIZE = 1000
+
+# 结果页最多展示的错误条数（错误总数仍会完整统计）
+MAX_REPORTED_ERRORS = 500
+
+VALID_DEPARTMENTS = {'技术部', '人事部', '财务部', '行政部', '市场部'}
+VALID_STATUSES = {'在职', '离职', '休假', '调岗'}
+DEFAULT_STATUS = '在职'
+
+REQUIRED_FIELDS = ('employee_id', 'name', 'department', 'position', 'hire_date')
+# 可选列：文件中没有该列或单元格为空时，已有员工保留原值
+OPTIONAL_FIELDS = ('email', 'phone', 'status')
+
+# 表头别名：既接受导出文件的中文表头，也接受字段名
+HEADER_ALIASES = {header: field for header, field in EXPORT_COLUMNS}
+HEADER_ALIASES.update({field: field for _, field in EXPORT_COLUMNS})
+FIELD_LABELS = {field: header for header, field in EXPORT_COLUMNS}
+
+_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d')
+
+
+class ImportResult:
+    """批量导入结果"""
+
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []  # [(行号, 工号, 错误说明)]
+
+    @property
+    def imported(self):
+        return self.inserted + self.updated
+
+    def add_error(self, line_no, employee_id, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, employee_id, message))
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # 快速路径：标准 ISO 格式
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS[1:]:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _normalize(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value
+    text = str(value).strip()
+    # 去掉导出时为防止公式执行加的前缀，导出再导入不改变内容
+    if text.startswith(FORMULA_ESCAPE) and text[1:].startswith(FORMULA_PREFIXES):
+        return text[1:]
+    return text
+
+
+def _map_header(header):
+    fields = [HEADER_ALIASES.get(_normalize(name)) for name in header]
+    missing = [FIELD_LABELS[f] for f in REQUIRED_FIELDS if f not in fields]
+    if missing:
+        raise ValueError(f"缺少必要的列：{', '.join(missing)}")
+    return fields
+
+
+def _iter_csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise ValueError('文件不是 UTF-8 编码的 CSV，请另存为 UTF-8 后重试')
+    except csv.Error as e:
+        raise ValueError(f'CSV 格式错误：{e}')
+    finally:
+        text.detach()
+
+
+def _iter_xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError('服务器未安装 openpyxl，无法导入 Excel 文件，请改用 CSV')
+
+    # read_only 模式按行解析工作表，不会把整个文件载入内存
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ValueError('文件不是有效的 Excel（.xlsx）文件')
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_records(stream, filename):
+    """按文件类型逐行读取，返回 (行号, 记录字典)"""
+    if filename.lower().endswith('.xlsx'):
+        rows = _iter_xlsx_rows(stream)
+    else:
+        rows = _iter_csv_rows(stream)
+
+    fields = None
+    for line_no, row in enumerate(rows, 1):
+        if fields is None:
+            fields = _map_header(row)
+            continue
+        if not any(_normalize(v) for v in row):
+            continue
+        record = {}
+        for field, value in zip(fields, row):
+            if field:
+                record[field] = _normalize(value)
+        yield line_no, record
+
+    if fields is None:
+        raise ValueError('文件为空')
+
+
+def _upsert_statement(columns):
+    """根据数据库方言构造按工号插入或更新的语句
+
+    只更新文件中出现的列；可选列的值为空时保留原值。
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+
+    table = Employee.__table__
+    stmt = insert(table)
+    set_ = {}
+    for name in columns:
+        if name == 'employee_id':
+            continue
+        if name in OPTIONAL_FIELDS:
+            set_[name] = func.coalesce(stmt.excluded[name], table.c[name])
+        else:
+            set_[name] = stmt.excluded[name]
+    return stmt.on_conflict_do_update(index_elements=['employee_id'], set_=set_)
+
+
+def _write_chunk(chunk, result):
+    ids = [record['employee_id'] for record in chunk]
+    existing = set(db.session.execute(
+        select(Employee.employee_id).where(Employee.employee_id.in_(ids))
+    ).scalars())
+
+    now = datetime.utcnow()
+    for record in chunk:
+        record['updated_at'] = now
+        # 状态只在新增时取默认值，更新时为空则保留原状态
+        if record['employee_id'] not in existing and not record.get('status'):
+            record['status'] = DEFAULT_STATUS
+
+    # 同一文件的记录列相同，只有新增记录可能多出默认的状态列；
+    # 批量执行要求每条记录的键一致，已有员工补 None（保留原状态）
+    columns = {name for record in chunk for name in record}
+    stmt = _upsert_statement(sorted(columns))
+    if stmt is not None:
+        if 'status' in columns:
+            for record in chunk:
+                record.setdefault('status', None)
+        db.session.execute(stmt, chunk)
+    else:
+        new_records = [r for r in chunk if r['employee_id'] not in existing]
+        old_records = [r for r in chunk if r['employee_id'] in existing]
+        if new_records:
+            db.session.execute(Employee.__table__.insert(), new_records)
+        for record in old_records:
+            values = {k: v for k, v in record.items()
+                      if k != 'employee_id' and not (k in OPTIONAL_FIELDS and v is None)}
+            db.session.execute(
+                Employee.__table__.update()
+                .where(Employee.employee_id == record['employee_id'])
+                .values(**values)
+            )
+    db.session.commit()
+
+    result.updated += len(existing)
+    result.inserted += len(chunk) - len(existing)
+
+
+def import_employees(stream, filename):
+    """流式读取上传文件，校验后按工号分批插入或更新员工
+
+    每批单独提交，校验逐行进行、与写入交替；文件读到一半出错或某批写入
+    失败时，之前的批次已经提交。文件和数据库错误都以 ValueError 抛出，
+    说明中带已导入的行数。
+
+    邮箱、电话、状态为可选列：文件中没有该列或单元格为空时，已有员工
+    保留原值，导入不会清空这些字段，也不会把离职员工改回在职。
+    """
+    result = ImportResult()
+    seen_ids = set()
+    chunk = []
+
+    for line_no, record in iter_records(stream, filename):
+        result.total += 1
+        employee_id = record.get('employee_id', '')
+
+        missing = [FIELD_LABELS[f] for f in REQUIRED_FIELDS if not record.get(f)]
+        if missing:
+            result.add_error(line_no, employee_id, f"缺少必填字段：{', '.join(missing)}")
+            continue
+
+        hire_date = _parse_date(record['hire_date'])
+        if hire_date is None:
+            result.add_error(line_no, employee_id, f"入职日期格式错误：{record['hire_date']}")
+            continue
+
+        if record['department'] not in VALID_DEPARTMENTS:
+            result.add_error(line_no, employee_id, f"未知部门：{record['department']}")
+            continue
+
+        status = record.get('status') or None
+        if status is not None and status not in VALID_STATUSES:
+            result.add_error(line_no, employee_id, f"未知状态：{status}")
+            continue
+
+        if employee_id in seen_ids:
+            result.add_error(line_no, employee_id, '文件中工号重复')
+            continue
+        seen_ids.add(employee_id)
+
+        values = {
+            'employee_id': employee_id,
+            'name': record['name'],
+            'department': record['department'],
+            'position': record['position'],
+            'hire_date': hire_date,
+        }
+        # 只带上文件中存在的可选列，空值写为 None（更新时保留原值）
+        for field in OPTIONAL_FIELDS:
+            if field in record:
+                values[field] = record[field] or None
+        chunk.append(values)
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _write_chunk_or_raise(chunk, result)
+            chunk = []
+
+    if chunk:
+        _write_chunk_or_raise(chunk, result)
+
+    return result
+
+
+def _write_chunk_or_raise(chunk, result):
+    try:
+        _write_chunk(chunk, result)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise ValueError(f'写入数据库失败（此前已导入 {result.imported} 行）：{getattr(e, "orig", None) or e}')
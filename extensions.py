@@ -0,0 +1,48 @@
+"""扩展实例
+
+这里只创建不绑定应用的实例，由 create_app() 调用各自的 init_app()；
+视图模块从这里导入，避免与应用工厂互相导入。
+与具体目录绑定的员工文件存储和预览进程池按应用保存在
+app.extensions 中，这里提供指向当前应用实例的代理。
+"""
+from flask import current_app
+from flask_login import LoginManager, current_user
+from werkzeug.local import LocalProxy
+
+from simple_models import User
+from auth import PERMISSION_MANAGE_ROLES
+from view_counter import ViewCountBuffer
+from article_render import RenderedContentCache
+from perf_profiler import RequestProfiler
+from slow_queries import SlowQueryLog
+from metrics import PortalMetrics
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = '请先登录以访问此页面'
+
+# 文章浏览量缓冲，定期批量写回
+view_counter = ViewCountBuffer()
+# 文章正文渲染结果缓存，按（文章 id, update_time）失效
+article_render_cache = RenderedContentCache()
+
+# 请求级性能记录（/debug/perf）；?_profile=1 的 cProfile 分析仅限有角色管理权限的用户
+request_profiler = RequestProfiler(
+    can_profile=lambda: current_user.is_authenticated and current_user.has_permission(PERMISSION_MANAGE_ROLES)
+)
+
+# 慢查询日志（instance/logs/slow_queries.log 与 /debug/slow-queries），附带查询计划
+slow_query_log = SlowQueryLog()
+
+# Prometheus 指标（/metrics），多进程部署见 metrics 模块说明
+portal_metrics = PortalMetrics()
+
+# 员工档案文件存储（内容寻址，相同文件只存一份）
+employee_file_store = LocalProxy(lambda: current_app.extensions['employee_file_store'])
+# 缩略图与文本提取在后台进程池中完成，结果按内容摘要缓存在磁盘
+preview_worker = LocalProxy(lambda: current_app.extensions['preview_worker'])
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
@@ -0,0 +1,365 @@
+"""员工档案文件的缩略图、文本提取与全文索引
+
+预览在后台进程池中生成，结果按内容摘要存放在磁盘上；元数据文件不存在
+即为待处理，元数据中带 error 即为处理失败。提取出的文本写入全文索引表，
+员工列表的关键词搜索会匹配档案内容。
+
+进程池中的任务不落盘，Web 进程重启或进程池崩溃时未完成的文件保持待处理，
+用命令行补做：python file_previews.py [--retry-failed]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import text as sql_text
+
+from simple_models import db
+
+logger = logging.getLogger(__name__)
+
+# 缩略图最大边长（像素）
+THUMBNAIL_SIZE = (320, 320)
+
+# 页面上展示的文本摘要长度
+EXCERPT_LENGTH = 200
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+TEXT_EXTENSIONS = {'.txt', '.csv', '.md', '.log'}
+PDF_EXTENSIONS = {'.pdf'}
+
+# 档案文本全文索引，rowid 即 employee_files.id（由迁移 0004 创建，仅 SQLite）
+FILE_TEXT_TABLE = 'employee_file_texts_fts'
+
+# trigram 分词器按三个字符切分，更短的关键词无法使用索引
+MIN_TRIGRAM_LENGTH = 3
+
+
+def artifact_paths(root, digest):
+    """派生文件路径：按内容摘要存放，同一内容只处理一次"""
+    base = os.path.join(root, digest[:2], digest)
+    return {
+        'meta': base + '.json',
+        'thumbnail': base + '.thumb.png',
+        'text': base + '.txt',
+    }
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    encoding = None if isinstance(data, bytes) else 'utf-8'
+    with open(tmp_path, mode, encoding=encoding) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _image_thumbnail(source_path, thumb_path):
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    with Image.open(source_path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        tmp_path = f'{thumb_path}.{os.getpid()}.tmp'
+        image.save(tmp_path, format='PNG')
+    os.replace(tmp_path, thumb_path)
+    return True
+
+
+def _pdf_artifacts(source_path, thumb_path):
+    """PDF：首页缩略图与全文文本（依赖 PyMuPDF，缺失时退回 pypdf 仅提取文本）"""
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(source_path) as document:
+            text = '\n'.join(page.get_text() for page in document)
+            if document.page_count:
+                page = document[0]
+                zoom = THUMBNAIL_SIZE[0] / max(page.rect.width, page.rect.height)
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+                _write_atomic(thumb_path, pixmap.tobytes('png'))
+                return True, text
+        return False, text
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return False, None
+    reader = PdfReader(source_path)
+    return False, '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def generate_artifacts(source_path, file_name, root, digest):
+    """在工作进程中生成缩略图与文本，结果写入磁盘"""
+    paths = artifact_paths(root, digest)
+    os.makedirs(os.path.dirname(paths['meta']), exist_ok=True)
+
+    extension = os.path.splitext(file_name)[1].lower()
+    has_thumbnail = False
+    text = None
+    error = None
+
+    try:
+        if extension in IMAGE_EXTENSIONS:
+            has_thumbnail = _image_thumbnail(source_path, paths['thumbnail'])
+        elif extension in PDF_EXTENSIONS:
+            has_thumbnail, text = _pdf_artifacts(source_path, paths['thumbnail'])
+        elif extension in TEXT_EXTENSIONS:
+            with open(source_path, 'rb') as f:
+                text = f.read().decode('utf-8', errors='replace')
+    except Exception as e:
+        error = str(e)
+
+    if text:
+        text = text.strip()
+        _write_atomic(paths['text'], text)
+
+    meta = {
+        'thumbnail': has_thumbnail,
+        'text': bool(text),
+        'excerpt': text[:EXCERPT_LENGTH] if text else '',
+        'error': error,
+    }
+    # 元数据最后写入，页面以它的存在作为处理完成的标志
+    _write_atomic(paths['meta'], json.dumps(meta, ensure_ascii=False))
+    return meta
+
+
+# ============ 全文索引 ============
+
+def file_text_search_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def create_file_text_index(conn):
+    """创建档案文本全文索引表（幂等），供迁移调用"""
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FILE_TEXT_TABLE} USING fts5(content, tokenize='trigram')"
+    )
+
+
+def index_file_text(file_id, text):
+    """写入（或替换）一个档案文件的文本，单独一个事务"""
+    if not file_text_search_supported():
+        return
+    with db.engine.begin() as conn:
+        conn.execute(sql_text(f'DELETE FROM {FILE_TEXT_TABLE} WHERE rowid = :id'), {'id': file_id})
+        conn.execute(sql_text(f'INSERT INTO {FILE_TEXT_TABLE}(rowid, content) VALUES (:id, :content)'),
+                     {'id': file_id, 'content': text})
+
+
+def unindex_file(file_id):
+    """在当前会话中删除档案文件的文本，随调用方的事务提交"""
+    if file_text_search_supported():
+        db.session.execute(sql_text(f'DELETE FROM {FILE_TEXT_TABLE} WHERE rowid = :id'), {'id': file_id})
+
+
+def indexed_file_ids():
+    if not file_text_search_supported():
+        return set()
+    return set(db.session.execute(sql_text(f'SELECT rowid FROM {FILE_TEXT_TABLE}')).scalars())
+
+
+def file_text_match(keyword):
+    """档案内容包含关键词的员工 id 子查询；关键词过短或不支持时返回 None"""
+    if len(keyword) < MIN_TRIGRAM_LENGTH or not file_text_search_supported():
+        return None
+    return sql_text(
+        f'SELECT employee_id FROM employee_files WHERE id IN '
+        f'(SELECT rowid FROM {FILE_TEXT_TABLE} WHERE {FILE_TEXT_TABLE} MATCH :file_text)'
+    ).bindparams(file_text='"' + keyword.replace('"', '""') + '"')
+
+
+# ============ 后台处理 ============
+
+class PreviewWorker:
+    """后台生成文件预览的进程池
+
+    上传完成后提交任务，请求线程不做任何预览计算；
+    详情页只读取已经生成好的派生文件。传入 app 与 store（档案文件的
+    FileStore）时，任务完成后在应用上下文中把提取的文本写入全文索引。
+    """
+
+    def __init__(self, root, max_workers=2, app=None, store=None):
+        self.root = root
+        self.max_workers = max_workers
+        self.app = app
+        self.store = store
+        self._executor = None
+        self._pid = None
+        # 处理中的内容摘要 -> 等待写入索引的档案文件 id
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # 预派生的 worker 不能沿用父进程的进程池，按进程号惰性创建
+        if self._pid != os.getpid():
+            self._executor = None
+            self._pending = {}
+            self._pid = os.getpid()
+        if self._executor is None:
+            # 使用 spawn，避免在多线程的 Web 进程中 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, source_path, file_name, digest, file_id=None, force=False):
+        """提交处理任务；已处理或处理中的内容会被跳过（force 时重新处理）
+
+        进程池不可用时不抛出异常：文件保持待处理，由命令行补做。
+        """
+        if not force and os.path.exists(artifact_paths(self.root, digest)['meta']):
+            # 相同内容已处理过，只需为新记录写入索引
+            if file_id is not None:
+                self._index(digest, [file_id])
+            return None
+
+        with self._lock:
+            waiting = self._pending.get(digest)
+            if waiting is not None:
+                if file_id is not None:
+                    waiting.add(file_id)
+                return None
+            try:
+                executor = self._get_executor()
+                future = executor.submit(generate_artifacts, source_path, file_name, self.root, digest)
+            except (RuntimeError, OSError):
+                # BrokenProcessPool 也是 RuntimeError：丢弃进程池，下次提交时重建
+                self._executor = None
+                logger.warning('预览任务提交失败，文件 %s 保持待处理', file_name, exc_info=True)
+                return None
+            self._pending[digest] = {file_id} if file_id is not None else set()
+
+        caller = threading.get_ident()
+
+        def callback(f):
+            # 任务在挂回调前已完成时回调会在提交线程内立即执行，
+            # 此时转交给独立线程，不让请求线程写索引、等待存储锁
+            if threading.get_ident() == caller:
+                threading.Thread(target=self._done, args=(digest, executor, f), daemon=True).start()
+            else:
+                self._done(digest, executor, f)
+
+        future.add_done_callback(callback)
+        return future
+
+    def _done(self, digest, executor, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            file_ids = self._pending.pop(digest, set())
+            if isinstance(error, BrokenProcessPool) and self._executor is executor:
+                self._executor = None
+        if future.cancelled() or error is not None:
+            logger.warning('预览任务失败，内容 %s 保持待处理', digest, exc_info=error)
+            return
+        self._index(digest, file_ids)
+
+    def _index(self, digest, file_ids):
+        """为仍引用该内容的档案文件写入索引
+
+        处理期间文件可能已被删除：只索引仍存在且内容相同的记录；内容已
+        没有任何记录引用时丢弃结果，删除生成的派生文件。检查与写入在
+        存储锁内进行，与删除档案文件互斥（调用方不能已持有该锁）。
+        """
+        if self.app is None or self.store is None:
+            return
+        from simple_models import EmployeeFile
+        try:
+            with self.store.lock(), self.app.app_context():
+                live_ids = set(db.session.execute(
+                    db.select(EmployeeFile.id)
+                    .where(EmployeeFile.file_path == self.store.relative_path(digest))
+                ).scalars())
+                if not live_ids:
+                    self.delete_preview(digest)
+                    return
+                preview = self.get_preview(digest)
+                file_ids = set(file_ids) & live_ids
+                if not file_ids or not preview or not preview['text_path']:
+                    return
+                with open(preview['text_path'], encoding='utf-8') as f:
+                    text = f.read()
+                for file_id in file_ids:
+                    index_file_text(file_id, text)
+        except Exception:
+            logger.warning('档案文本写入索引失败：%s', digest, exc_info=True)
+
+    def get_preview(self, digest):
+        """读取已生成的预览信息，未生成时返回 None"""
+        paths = artifact_paths(self.root, digest)
+        try:
+            with open(paths['meta'], encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta['thumbnail_path'] = paths['thumbnail'] if meta.get('thumbnail') else None
+        meta['text_path'] = paths['text'] if meta.get('text') else None
+        return meta
+
+    def delete_preview(self, digest):
+        """删除内容对应的派生文件；没有档案文件引用该内容时调用"""
+        for path in artifact_paths(self.root, digest).values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def backfill(worker, store, retry_failed=False):
+    """补做待处理（以及 retry_failed 时处理失败）的档案文件，并补写全文索引
+
+    返回 (提交处理的文件数, 补写索引的文件数)。
+    """
+    from file_store import digest_of
+    from simple_models import EmployeeFile
+
+    indexed = indexed_file_ids()
+    submitted = reindexed = 0
+    rows = db.session.query(EmployeeFile.id, EmployeeFile.file_name, EmployeeFile.file_path)\
+        .order_by(EmployeeFile.id).execution_options(yield_per=1000)
+    for file_id, file_name, file_path in rows:
+        digest = digest_of(file_path)
+        preview = worker.get_preview(digest)
+        failed = preview is not None and preview.get('error')
+        if preview is None or (failed and retry_failed):
+            source_path = store.path_for(file_path)
+            if source_path and os.path.isfile(source_path):
+                worker.submit(source_path, file_name, digest, file_id=file_id, force=True)
+                submitted += 1
+        elif file_id not in indexed and preview['text_path']:
+            worker._index(digest, [file_id])
+            reindexed += 1
+    # 等待全部任务完成（完成回调在此之前写入索引）
+    worker.shutdown()
+    return submitted, reindexed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='补做员工档案文件的预览与全文索引')
+    parser.add_argument('--retry-failed', action='store_true', help='同时重新处理之前失败的文件')
+    args = parser.parse_args()
+
+    from app import create_app
+    from file_store import FileStore
+    app = create_app(views=False)
+    with app.app_context():
+        store = FileStore(app.config['EMPLOYEE_FILE_ROOT'])
+        worker = PreviewWorker(app.config['EMPLOYEE_FILE_PREVIEW_ROOT'], app.config['PREVIEW_WORKERS'],
+                               app=app, store=store)
+        submitted, reindexed = backfill(worker, store, args.retry_failed)
+        print(f'已处理 {submitted} 个文件，补写索引 {reindexed} 个文件')
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：只能在进程内加锁
+    fcntl = None
+
+# 每次读写的块大小，单次传输的内存占用与文件大小无关
+CHUNK_SIZE = 64 * 1024
+
+HASH_ALGORITHM = 'sha256'
+
+
+class FileStore:
+    """基于内容寻址的文件存储
+
+    文件按内容的 SHA-256 存放在 <root>/<前两位>/<次两位>/<摘要>，
+    相同内容只保存一份。数据库中只记录相对路径（即摘要路径）。
+
+    同一内容被多条记录共享，以"没有记录引用"作为删除条件。上传时
+    放置文件并提交记录、删除时检查引用并删除文件，这两段都要在
+    lock() 内完成，否则并发上传可能在文件被删后提交引用它的记录。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._thread_lock = threading.Lock()
+
+    def relative_path(self, digest):
+        """内容摘要对应的相对路径（即数据库中记录的 file_path）"""
+        return os.path.join(digest[:2], digest[2:4], digest)
+
+    def path_for(self, relative_path):
+        """返回相对路径对应的绝对路径，路径不合法时返回 None"""
+        full_path = os.path.abspath(os.path.join(self.root, relative_path))
+        if not full_path.startswith(os.path.abspath(self.root) + os.sep):
+            return None
+        return full_path
+
+    def exists(self, relative_path):
+        full_path = self.path_for(relative_path)
+        return full_path is not None and os.path.isfile(full_path)
+
+    @contextmanager
+    def lock(self):
+        """存储级排他锁，跨线程、跨进程（预派生的各 worker）有效"""
+        os.makedirs(self.root, exist_ok=True)
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+        # 每次加锁单独打开文件，flock 对同一进程内的不同线程同样互斥
+        with open(os.path.join(self.root, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stage(self, stream):
+        """分块读取上传流，边写临时文件边计算摘要（不需要加锁）
+
+        返回 (临时文件路径, 摘要, 文件大小)；随后在 lock() 内调用 place()，
+        最后无论成功与否都调用 discard() 清理临时文件。
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        hasher = hashlib.new(HASH_ALGORITHM)
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+
+        return tmp_path, hasher.hexdigest(), size
+
+    def place(self, tmp_path, digest):
+        """把暂存的文件放到内容路径下，返回相对路径；调用方须持有 lock()
+
+        内容已存在时保留原文件，临时文件由 discard() 删除。
+        """
+        relative_path = self.relative_path(digest)
+        full_path = os.path.join(self.root, relative_path)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_path, full_path)
+        return relative_path
+
+    @staticmethod
+    def discard(tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def delete(self, relative_path):
+        """删除文件；调用方须持有 lock() 并已确认没有记录引用"""
+        full_path = self.path_for(relative_path)
+        if full_path and os.path.isfile(full_path):
+            os.remove(full_path)
+
+
+def digest_of(relative_path):
+    """从存储路径取出内容摘要（用作 ETag）"""
+    return os.path.basename(relative_path)
@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, IntegerField, SelectField, TextAreaField, BooleanField, SelectMultipleField, widgets
 from wtforms.validators import DataRequired, Length, NumberRange, Optional, Email, ValidationError
 from simple_models import User
@@ -173,6 +174,35 @@ class EmployeeSearchForm(FlaskForm):
     ], validators=[Optional()])
     submit = SubmitField('搜索')
 
+class UserSearchForm(FlaskForm):
+    q = StringField('关键词', validators=[Optional()])
+    department = SelectField('部门', choices=[
+        ('', '所有部门'),
+        ('技术部', '技术部'),
+        ('人事部', '人事部'),
+        ('财务部', '财务部'),
+        ('行政部', '行政部'),
+        ('市场部', '市场部')
+    ], validators=[Optional()])
+    submit = SubmitField('搜索')
+
+class BulkUserActionForm(FlaskForm):
+    # 批量审核/分配角色：勾选的用户和角色是多选列表，直接从 request.form 读取，
+    # 此表单只负责 CSRF 校验
+    pass
+
+class EmployeeImportForm(FlaskForm):
+    file = FileField('导入文件', validators=[
+        FileRequired(message='请选择要导入的文件'),
+        FileAllowed(['csv', 'xlsx'], message='仅支持 CSV 或 XLSX 文件')
+    ])
+    submit = SubmitField('开始导入')
+
+class EmployeeFileForm(FlaskForm):
+    file = FileField('档案文件', validators=[FileRequired(message='请选择要上传的文件')])
+    description = StringField('文件说明', validators=[Optional(), Length(max=255)])
+    submit = SubmitField('上传')
+
 class KnowledgeCategoryForm(FlaskForm):
     name = StringField('分类名称', validators=[DataRequired(message='请输入分类名称')])
     description = TextAreaField('分类描述', validators=[Optional()])
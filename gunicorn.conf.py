@@ -0,0 +1,26 @@
+"""gunicorn 配置：gunicorn -c gunicorn.conf.py
+
+preload_app 让主进程先创建应用、预热后再派生 worker，各 worker 以写时复制
+共享已导入的代码和已编译的模板，启动更快、总内存更少（见 prefork 模块）。
+代价是修改代码后须重启主进程，kill -HUP 只会用旧代码重新派生 worker。
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('PORTAL_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+
+def when_ready(server):
+    # 主进程已加载应用，尚未派生 worker
+    from prefork import prepare_for_fork
+    prepare_for_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    # 多进程 Prometheus 指标：清理已退出 worker 的 livesum 仪表，见 metrics 模块
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
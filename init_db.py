@@ -1,15 +1,13 @@
 import os
 from simple_models import db, User, Role, Notification, SupplyCategory, Supply, SupplyRequest, Employee, EmployeeFile, KnowledgeCategory, KnowledgeArticle, Message
 from auth import ROLE_PERMISSIONS, ROLE_SUPER_ADMIN, ROLE_ADMIN, ROLE_USER, ROLE_PENDING
+from kb_tree import rebuild_category_tree
+from kb_tags import rebuild_tag_index
+from migrations import upgrade
+from app import create_app
 
-# 创建临时应用实例用于初始化数据库
-from flask import Flask
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///portal.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'temp-secret-key'
-
-db.init_app(app)
+# 只配置数据库的应用实例，不加载页面
+app = create_app(views=False)
 
 def init_database():
     # 确保instance目录存在
@@ -17,11 +15,19 @@ def init_database():
     
     with app.app_context():
         # 删除现有数据库（开发环境用，生产环境不要这样用）
-        if os.path.exists('instance/portal.db'):
-            os.remove('instance/portal.db')
+        if db.engine.dialect.name == 'sqlite':
+            db.engine.dispose()
+            database = db.engine.url.database or ':memory:'
+            # WAL 模式下还有 -wal/-shm 文件，残留的 WAL 会被回放到新库
+            for path in (database, database + '-wal', database + '-shm'):
+                if database != ':memory:' and os.path.exists(path):
+                    os.remove(path)
+        else:
+            db.drop_all()
         
-        # 创建所有表
+        # 创建所有表，再执行迁移（建索引、知识库全文索引等）
         db.create_all()
+        upgrade(log=lambda message: None)
         print("数据库表创建成功！")
         
         # 添加角色数据
@@ -273,6 +279,16 @@ def init_database():
         db.session.commit()
         print("知识库文章创建成功！")
         
+        # 生成分类闭包表和文章计数
+        rebuild_category_tree()
+        db.session.commit()
+        print("知识库分类树创建成功！")
+        
+        # 从文章标签字符串生成标签索引
+        rebuild_tag_index()
+        db.session.commit()
+        print("知识库标签索引创建成功！")
+        
         print("\n数据库初始化完成！")
         print("测试账号：")
         print("  - 超级管理员: superadmin / admin123")
@@ -0,0 +1,371 @@
+import argparse
+import itertools
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from simple_models import db, KnowledgeArticle, KnowledgeRelatedArticle
+from kb_search import split_tags
+
+# 每篇文章保留的相关文章数
+TOP_K = 5
+# 标题、标签中的词比正文更能代表主题
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 3
+# 每篇文章只保留权重最高的若干词，控制相似度计算量
+MAX_TERMS_PER_DOC = 40
+# 只在一篇文章出现的词没有区分度；出现在过多文章中的词近似停用词
+MIN_DF = 2
+MAX_DF_RATIO = 0.2
+# 语料较小时不按比例剔除高频词
+MAX_DF_FLOOR = 50
+MIN_SCORE = 0.05
+# 相似度按行分块计算，限制峰值内存
+CHUNK_ROWS = 2000
+# IN 条件每批的参数个数
+ID_BATCH_SIZE = 500
+
+_CJK_START = '\u3400'
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+(?:[._+#-][a-z0-9]+)*')
+
+def related_articles(article_id, limit=TOP_K):
+    """文章页读取预先算好的相关文章"""
+    return KnowledgeArticle.query\
+        .join(KnowledgeRelatedArticle, KnowledgeRelatedArticle.related_id == KnowledgeArticle.id)\
+        .filter(KnowledgeRelatedArticle.article_id == article_id, KnowledgeArticle.is_published == True)\
+        .order_by(KnowledgeRelatedArticle.score.desc())\
+        .limit(limit).all()
+
+
+def remove_related(article_id):
+    """删除文章前清理其相关文章记录（不提交）"""
+    KnowledgeRelatedArticle.query.filter(
+        (KnowledgeRelatedArticle.article_id == article_id) | (KnowledgeRelatedArticle.related_id == article_id)
+    ).delete(synchronize_session=False)
+
+
+# ============ 分词与向量化 ============
+
+def tokenize(text):
+    """中日韩文字按相邻二字切分，字母数字按词切分"""
+    tokens = []
+    for match in _TOKEN_RE.finditer((text or '').lower()):
+        run = match.group()
+        if run[0] >= _CJK_START:
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(map(str.__add__, run, run[1:]))
+        elif len(run) > 1:
+            tokens.append(run)
+    return tokens
+
+
+def document_terms(title, content, tags):
+    """文章的词频（标题、标签加权；标签以 # 前缀区别于正文词）"""
+    terms = Counter(tokenize(content))
+    for token in tokenize(title):
+        terms[token] += TITLE_WEIGHT
+    for tag in split_tags(tags):
+        terms['#' + tag.lower()] += TAG_WEIGHT
+    return terms
+
+
+def _count_matrix(docs, vocabulary, grow):
+    """把 (id, title, content, tags) 序列转为词频稀疏矩阵"""
+    import numpy as np
+    from scipy import sparse
+
+    if grow:
+        # 新词按出现顺序编号；逐词查表是建模的主要开销，交给 C 实现的 map
+        vocabulary = defaultdict(None, vocabulary)
+        vocabulary.default_factory = vocabulary.__len__
+
+    ids, indptr, indices, data = [], [0], [], []
+    for article_id, title, content, tags in docs:
+        terms = document_terms(title, content, tags)
+        if grow:
+            indices.extend(map(vocabulary.__getitem__, terms))
+            data.extend(terms.values())
+        else:
+            for term, count in terms.items():
+                column = vocabulary.get(term)
+                if column is not None:
+                    indices.append(column)
+                    data.append(count)
+        indptr.append(len(indices))
+        ids.append(article_id)
+
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(ids), len(vocabulary))
+    )
+    return np.array(ids, dtype=np.int64), matrix, vocabulary
+
+
+def _weigh(counts, idf):
+    """次线性 TF × IDF，每行截取权重最高的词后做 L2 归一化"""
+    import numpy as np
+    from scipy import sparse
+
+    matrix = counts.tocsr(copy=True)
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if end - start > MAX_TERMS_PER_DOC:
+            weights = matrix.data[start:end]
+            cutoff = np.partition(weights, -MAX_TERMS_PER_DOC)[-MAX_TERMS_PER_DOC]
+            weights[weights < cutoff] = 0
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).astype(np.float32).tocsr()
+
+
+class TfidfModel:
+    """词表、IDF 与全部已发布文章的归一化向量"""
+
+    def __init__(self, terms, idf, article_ids, matrix, watermark=None):
+        self.terms = terms
+        self.idf = idf
+        self.article_ids = article_ids
+        self.matrix = matrix
+        # 建模时文章 update_time 的最大值，之后修改过的文章需要增量更新
+        self.watermark = watermark
+        self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        # 词表较大，只在需要向量化新文章时才建立
+        if self._vocabulary is None:
+            self._vocabulary = {term: column for column, term in enumerate(self.terms.tolist())}
+        return self._vocabulary
+
+    @classmethod
+    def fit(cls, docs):
+        """从全部文章建立模型"""
+        import numpy as np
+
+        article_ids, counts, vocabulary = _count_matrix(docs, {}, grow=True)
+        n = len(article_ids)
+        df = np.bincount(counts.indices, minlength=len(vocabulary))
+        keep = np.flatnonzero((df >= MIN_DF) & (df <= max(MAX_DF_FLOOR, MAX_DF_RATIO * n)))
+        idf = (np.log((1 + n) / (1 + df[keep])) + 1).astype(np.float32)
+        matrix = _weigh(counts[:, keep], idf)
+        # 不在任何文章保留词中的词对相似度没有贡献，从词表中去掉
+        used = np.unique(matrix.indices)
+        terms = np.array(list(vocabulary), dtype=str)[keep[used]]
+        return cls(terms, idf[used], article_ids, matrix[:, used].tocsr())
+
+    def transform(self, docs):
+        """用现有词表与 IDF 计算文章向量（新词在下次完整重建前忽略）"""
+        article_ids, counts, _ = _count_matrix(docs, self.vocabulary, grow=False)
+        return article_ids, _weigh(counts, self.idf)
+
+    def save(self, path):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(
+            tmp_path,
+            terms=self.terms, idf=self.idf, article_ids=self.article_ids,
+            data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            watermark=np.array(self.watermark.isoformat() if self.watermark else '')
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        from scipy import sparse
+
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            matrix = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            watermark = str(f['watermark'])
+            return cls(f['terms'], f['idf'], f['article_ids'], matrix,
+                       datetime.fromisoformat(watermark) if watermark else None)
+
+
+def nearest_neighbors(matrix, rows, k=TOP_K):
+    """计算指定行与全部文章的余弦相似度，返回 {行号: [(行号, 相似度)]}"""
+    import numpy as np
+
+    transposed = matrix.T.tocsr()
+    result = {}
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = np.asarray(rows[start:start + CHUNK_ROWS])
+        sims = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk.tolist()):
+            begin, end = sims.indptr[offset], sims.indptr[offset + 1]
+            columns, scores = sims.indices[begin:end], sims.data[begin:end]
+            mask = (columns != row) & (scores >= MIN_SCORE)
+            columns, scores = columns[mask], scores[mask]
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+                columns, scores = columns[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            result[row] = list(zip(columns[order].tolist(), scores[order].tolist()))
+    return result
+
+
+# ============ 离线任务 ============
+
+def model_path():
+    return current_app.config.get('KB_RELATED_MODEL_PATH') or \
+        os.path.join(current_app.instance_path, 'kb_related_model.npz')
+
+
+def _article_docs(article_ids=None):
+    query = db.session.query(
+        KnowledgeArticle.id, KnowledgeArticle.title, KnowledgeArticle.content, KnowledgeArticle.tags
+    ).filter(KnowledgeArticle.is_published == True)
+    if article_ids is not None:
+        query = query.filter(KnowledgeArticle.id.in_(article_ids))
+    return query.order_by(KnowledgeArticle.id).execution_options(yield_per=1000)
+
+
+def _batches(values):
+    values = list(values)
+    for start in range(0, len(values), ID_BATCH_SIZE):
+        yield values[start:start + ID_BATCH_SIZE]
+
+
+def _write_neighbors(model, neighbors):
+    """覆盖写入给定文章的相关文章列表（不提交）"""
+    article_ids = model.article_ids
+    table = KnowledgeRelatedArticle.__table__
+    for batch in _batches(int(article_ids[row]) for row in neighbors):
+        db.session.execute(table.delete().where(table.c.article_id.in_(batch)))
+    rows = [
+        {'article_id': int(article_ids[row]), 'related_id': int(article_ids[other]), 'score': float(score)}
+        for row, items in neighbors.items() for other, score in items
+    ]
+    if rows:
+        db.session.execute(table.insert(), rows)
+
+
+def rebuild_related():
+    """完整重建模型和全部相关文章，返回写入的文章数"""
+    watermark = db.session.query(func.max(KnowledgeArticle.update_time)).scalar()
+    model = TfidfModel.fit(_article_docs())
+    model.watermark = watermark
+
+    neighbors = nearest_neighbors(model.matrix, range(len(model.article_ids)))
+    db.session.execute(KnowledgeRelatedArticle.__table__.delete())
+    _write_neighbors(model, neighbors)
+    db.session.commit()
+    model.save(model_path())
+    return len(neighbors)
+
+
+def update_related():
+    """只为上次计算后新增、修改、撤回或删除的文章更新相关文章，返回写入的文章数
+
+    词表和 IDF 沿用上次完整重建的结果；没有模型时退化为完整重建。
+    """
+    import numpy as np
+    from scipy import sparse
+
+    model = TfidfModel.load(model_path())
+    if model is None:
+        return rebuild_related()
+
+    published = dict(db.session.query(KnowledgeArticle.id, KnowledgeArticle.update_time)
+                      .filter(KnowledgeArticle.is_published == True).all())
+    known = {article_id: row for row, article_id in enumerate(model.article_ids.tolist())}
+    removed = [article_id for article_id in known if article_id not in published]
+    changed = [article_id for article_id, update_time in published.items()
+               if article_id not in known
+               or (model.watermark and update_time and update_time > model.watermark)]
+    if not removed and not changed:
+        return 0
+
+    # 去掉已删除或撤回的文章，再替换修改过的向量、追加新文章
+    matrix, article_ids = model.matrix, model.article_ids
+    # 删除文章时其相关记录已被清掉，只能凭旧向量找出可能引用过它的文章
+    removed_vectors = matrix[[known[article_id] for article_id in removed]]
+    if removed:
+        keep = np.flatnonzero(~np.isin(article_ids, removed))
+        matrix, article_ids = matrix[keep], article_ids[keep]
+    changed_ids, changed_vectors = model.transform(
+        itertools.chain.from_iterable(_article_docs(batch) for batch in _batches(changed)))
+    rows = {article_id: row for row, article_id in enumerate(article_ids.tolist())}
+    existing = [i for i, article_id in enumerate(changed_ids.tolist()) if article_id in rows]
+    appended = [i for i, article_id in enumerate(changed_ids.tolist()) if article_id not in rows]
+    if existing:
+        target_rows = [rows[int(changed_ids[i])] for i in existing]
+        mask = np.ones(matrix.shape[0], dtype=np.float32)
+        mask[target_rows] = 0
+        replacement = sparse.csr_matrix(
+            (np.ones(len(existing), dtype=np.float32), (target_rows, existing)),
+            shape=(matrix.shape[0], len(changed_ids))
+        ) @ changed_vectors
+        matrix = (sparse.diags(mask) @ matrix + replacement).tocsr()
+    if appended:
+        matrix = sparse.vstack([matrix, changed_vectors[appended]]).tocsr()
+        article_ids = np.concatenate([article_ids, changed_ids[appended]])
+    model.matrix, model.article_ids = matrix.astype(np.float32), article_ids
+    rows = {article_id: row for row, article_id in enumerate(article_ids.tolist())}
+
+    # 需要重算的文章：变更的文章本身、列表里引用了变更文章的、与变更文章足够相似的
+    changed_rows = np.array([rows[int(article_id)] for article_id in changed_ids], dtype=np.int64)
+    recompute = set(changed_rows.tolist())
+    for batch in _batches(set(changed) | set(removed)):
+        for (article_id,) in db.session.query(KnowledgeRelatedArticle.article_id)\
+                .filter(KnowledgeRelatedArticle.related_id.in_(batch)).distinct():
+            if article_id in rows:
+                recompute.add(rows[article_id])
+    probe = sparse.vstack([matrix[changed_rows], removed_vectors]).tocsr()
+    if probe.shape[0]:
+        # 只有当变更文章的相似度超过某篇文章当前第 k 名（或其列表不满 k 篇）时才需重算
+        similar = matrix @ probe.T
+        best = np.asarray(similar.max(axis=1).todense()).ravel()
+        candidates = {int(article_ids[row]): float(best[row])
+                      for row in np.flatnonzero(best >= MIN_SCORE).tolist() if row not in recompute}
+        thresholds = {}
+        for batch in _batches(candidates):
+            thresholds.update((article_id, (lowest, count)) for article_id, lowest, count in db.session.query(
+                KnowledgeRelatedArticle.article_id,
+                func.min(KnowledgeRelatedArticle.score),
+                func.count(KnowledgeRelatedArticle.related_id)
+            ).filter(KnowledgeRelatedArticle.article_id.in_(batch)).group_by(KnowledgeRelatedArticle.article_id))
+        for article_id, score in candidates.items():
+            lowest, count = thresholds.get(article_id, (0.0, 0))
+            if count < TOP_K or score > lowest:
+                recompute.add(rows[article_id])
+
+    table = KnowledgeRelatedArticle.__table__
+    for batch in _batches(removed):
+        db.session.execute(table.delete().where(table.c.article_id.in_(batch)))
+        db.session.execute(table.delete().where(table.c.related_id.in_(batch)))
+    _write_neighbors(model, nearest_neighbors(matrix, sorted(recompute)))
+    db.session.commit()
+
+    changed_times = [published[article_id] for article_id in changed if published[article_id]]
+    if changed_times:
+        model.watermark = max([model.watermark] + changed_times) if model.watermark else max(changed_times)
+    model.save(model_path())
+    return len(recompute)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='计算知识库相关文章（TF-IDF）')
+    parser.add_argument('--full', action='store_true', help='忽略已有模型，完整重建')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app(views=False)
+    with app.app_context():
+        started = time.perf_counter()
+        count = rebuild_related() if args.full else update_related()
+        print(f'已更新 {count} 篇文章的相关文章，用时 {time.perf_counter() - started:.1f} 秒')
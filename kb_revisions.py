@@ -0,0 +1,139 @@
+import difflib
+import json
+import zlib
+
+from simple_models import db, KnowledgeArticleRevision
+
+# 两个完整快照之间最多间隔的修订数，还原任一修订最多应用这么多个差异
+SNAPSHOT_INTERVAL = 50
+# 差异压缩后超过全文压缩后大小的一半时，直接存快照更划算
+SNAPSHOT_DELTA_RATIO = 0.5
+
+# ============ 差异编码 ============
+
+def _compress(value):
+    return zlib.compress(value.encode('utf-8'), 9)
+
+
+def _decompress(data):
+    return zlib.decompress(data).decode('utf-8')
+
+
+def make_delta(old, new):
+    """按行计算差异：[行号起, 行号止] 表示沿用旧版这些行，字符串表示新插入的文本"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_lines[op[0]:op[1]])
+    return ''.join(parts)
+
+
+# ============ 修订读写 ============
+
+def _revision_rows(article_id, revision):
+    """还原某个修订所需的行：起点快照到该修订之间的全部记录"""
+    target = KnowledgeArticleRevision.query.filter_by(article_id=article_id, revision=revision).first()
+    if target is None:
+        return None
+    return KnowledgeArticleRevision.query\
+        .options(db.undefer(KnowledgeArticleRevision.data))\
+        .filter(KnowledgeArticleRevision.article_id == article_id,
+                KnowledgeArticleRevision.revision >= target.snapshot_revision,
+                KnowledgeArticleRevision.revision <= revision)\
+        .order_by(KnowledgeArticleRevision.revision).all()
+
+
+def _reconstruct(rows):
+    content = None
+    for row in rows:
+        value = _decompress(row.data)
+        content = value if row.is_snapshot else apply_delta(content, value)
+    return content
+
+
+def get_revision(article_id, revision):
+    """还原指定修订，返回 (修订记录, 正文)；不存在时返回 None"""
+    rows = _revision_rows(article_id, revision)
+    if not rows:
+        return None
+    return rows[-1], _reconstruct(rows)
+
+
+def list_revisions(article_id):
+    """修订列表（不加载正文数据，编辑人随同一查询取出），新的在前"""
+    return KnowledgeArticleRevision.query.filter_by(article_id=article_id)\
+        .options(db.joinedload(KnowledgeArticleRevision.editor))\
+        .order_by(KnowledgeArticleRevision.revision.desc()).all()
+
+
+def _add_revision(article_id, revision, snapshot_revision, title, tags, content, data, editor_id, created_at=None):
+    row = KnowledgeArticleRevision(
+        article_id=article_id,
+        revision=revision,
+        snapshot_revision=snapshot_revision,
+        is_snapshot=snapshot_revision == revision,
+        title=title,
+        tags=tags,
+        data=data,
+        data_size=len(data),
+        content_length=len(content),
+        editor_id=editor_id
+    )
+    if created_at is not None:
+        row.created_at = created_at
+    db.session.add(row)
+    return row
+
+
+def record_revision(article, editor_id, previous=None):
+    """文章保存后记录一次修订（不提交）
+
+    previous 为编辑前的 (title, content, tags, author_id, update_time)：
+    早于修订功能的文章首次编辑时，先把编辑前的版本补记为第 1 版。
+    内容、标题、标签都没有变化时不记录。
+    """
+    latest = KnowledgeArticleRevision.query.filter_by(article_id=article.id)\
+        .order_by(KnowledgeArticleRevision.revision.desc()).first()
+    if latest is None and previous is not None:
+        title, content, tags, author_id, update_time = previous
+        content = content or ''
+        latest = _add_revision(article.id, 1, 1, title, tags, content, _compress(content), author_id, update_time)
+        db.session.flush()
+
+    content = article.content or ''
+    full = _compress(content)
+    if latest is None:
+        return _add_revision(article.id, 1, 1, article.title, article.tags, content, full, editor_id)
+
+    base = _reconstruct(_revision_rows(article.id, latest.revision))
+    if base == content and latest.title == article.title and latest.tags == article.tags:
+        return None
+
+    revision = latest.revision + 1
+    delta = _compress(make_delta(base, content))
+    # 差异链过长或差异接近全文大小时另起快照，保证还原成本有上限
+    if revision - latest.snapshot_revision >= SNAPSHOT_INTERVAL or len(delta) > len(full) * SNAPSHOT_DELTA_RATIO:
+        return _add_revision(article.id, revision, revision, article.title, article.tags, content, full, editor_id)
+    return _add_revision(article.id, revision, latest.snapshot_revision, article.title, article.tags,
+                         content, delta, editor_id)
+
+
+def remove_revisions(article_id):
+    """删除文章前清理修订记录（不提交）"""
+    KnowledgeArticleRevision.query.filter_by(article_id=article_id).delete(synchronize_session=False)
@@ -0,0 +1,226 @@
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import DateTime, text
+
+from simple_models import db
+
+FTS_TABLE = 'knowledge_articles_fts'
+
+# trigram 分词器按三个字符切分，对中文（无空格分词）同样适用
+MIN_TRIGRAM_LENGTH = 3
+
+# BM25 列权重：标题、正文、标签
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# 分面与总数只统计按相关度排序的前 N 条命中，避免宽泛查询扫描全部结果
+FACET_SCAN_LIMIT = 1000
+FACET_TAG_LIMIT = 20
+
+SNIPPET_TOKENS = 24
+
+# 高亮标记使用控制字符，先对文本转义再替换为 <mark>，避免 XSS
+_HL_START = '\x02'
+_HL_END = '\x03'
+
+# 标签分隔符；按标签筛选的 SQL 与 split_tags 使用同一组分隔符
+TAG_SEPARATORS = ',，;；'
+_TAG_SPLIT = re.compile(f'[{TAG_SEPARATORS}]')
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, tags,
+        content='knowledge_articles', content_rowid='id',
+        tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_articles_fts_ai AFTER INSERT ON knowledge_articles BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, coalesce(new.tags, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_articles_fts_ad AFTER DELETE ON knowledge_articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, coalesce(old.tags, ''));
+    END""",
+    # 只在可检索字段变化时更新索引，浏览量等字段的更新不会触发
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_articles_fts_au AFTER UPDATE OF title, content, tags ON knowledge_articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, coalesce(old.tags, ''));
+        INSERT INTO {FTS_TABLE}(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, coalesce(new.tags, ''));
+    END""",
+    # 持久化排序函数，查询时直接 ORDER BY rank，由 FTS5 内部完成 BM25 排序
+    f"""INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank)
+        VALUES ('rank', 'bm25({', '.join(str(w) for w in BM25_WEIGHTS)})')""",
+]
+
+def split_tags(tags):
+    """把逗号分隔的标签字符串拆分为去重后的列表"""
+    if not tags:
+        return []
+    result = []
+    for tag in _TAG_SPLIT.split(tags):
+        tag = tag.strip()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+def search_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def create_search_index(conn):
+    """创建全文索引及同步触发器（幂等），供迁移调用
+
+    索引首次创建时会从文章表完整重建，此后由触发器在增删改时同步。
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    for statement in _DDL:
+        conn.execute(text(statement))
+    if not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def rebuild_search_index():
+    """从文章表完整重建全文索引"""
+    with db.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _mark_terms(value, terms):
+    """为未经 FTS 高亮的短词加上高亮标记"""
+    if not value or not terms:
+        return value
+    pattern = re.compile('|'.join(re.escape(term) for term in terms))
+    return pattern.sub(lambda m: f'{_HL_START}{m.group(0)}{_HL_END}', value)
+
+
+def _highlight(value):
+    """转义文本并把高亮标记替换为 <mark>"""
+    escaped = str(escape(value or ''))
+    return Markup(escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+
+
+def _escape_like(value):
+    """转义 LIKE 通配符，配合 ESCAPE '\\' 使用"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _build_conditions(terms, category_id, tag, use_fts):
+    """返回 (MATCH 表达式, WHERE 条件列表, 参数)"""
+    params = {}
+    match_terms = []
+    conditions = ['a.is_published = :published']
+    params['published'] = True
+    alias = 'f' if use_fts else 'a'
+
+    for index, term in enumerate(terms):
+        if use_fts and len(term) >= MIN_TRIGRAM_LENGTH:
+            match_terms.append('"' + term.replace('"', '""') + '"')
+        else:
+            # 少于三个字符的词无法使用 trigram 索引，退化为 LIKE
+            key = f'like_{index}'
+            params[key] = f'%{_escape_like(term)}%'
+            conditions.append(
+                f"({alias}.title LIKE :{key} ESCAPE '\\' OR {alias}.content LIKE :{key} ESCAPE '\\' "
+                f"OR {alias}.tags LIKE :{key} ESCAPE '\\')"
+            )
+
+    if category_id:
+        conditions.append('a.category_id = :category_id')
+        params['category_id'] = category_id
+
+    tag = (split_tags(tag) or [None])[0]
+    if tag:
+        # 与 split_tags 相同的规范化：各种分隔符统一为逗号，去掉空格后整段匹配
+        normalized = "coalesce(a.tags, '')"
+        for separator in TAG_SEPARATORS[1:]:
+            normalized = f"replace({normalized}, '{separator}', ',')"
+        conditions.append(f"(',' || replace({normalized}, ' ', '') || ',') LIKE :tag_pattern ESCAPE '\\'")
+        params['tag_pattern'] = f"%,{_escape_like(tag.replace(' ', ''))},%"
+
+    match = ' AND '.join(match_terms) if match_terms else None
+    if match:
+        conditions.insert(0, f'{FTS_TABLE} MATCH :match')
+        params['match'] = match
+
+    return match, conditions, params
+
+
+def search_articles(query, category_id=None, tag=None, page=1, per_page=20):
+    """全文检索已发布的文章
+
+    返回 dict：total（超过 FACET_SCAN_LIMIT 时封顶，total_capped 为真）、
+    results（含高亮标题与摘要）、category_facets、tag_facets。
+    """
+    terms = [term for term in query.split() if term][:10]
+    if not terms:
+        return {'total': 0, 'total_capped': False, 'results': [], 'category_facets': [], 'tag_facets': []}
+
+    use_fts = search_supported()
+    match, conditions, params = _build_conditions(terms, category_id, tag, use_fts)
+    where = ' AND '.join(conditions)
+    if match:
+        # 由全文索引驱动，按预先配置的 BM25 rank 排序
+        base = f'FROM {FTS_TABLE} f JOIN knowledge_articles a ON a.id = f.rowid WHERE {where}'
+        title = f"highlight({FTS_TABLE}, 0, '{_HL_START}', '{_HL_END}')"
+        snippet = f"snippet({FTS_TABLE}, 1, '{_HL_START}', '{_HL_END}', '…', {SNIPPET_TOKENS})"
+        order = 'f.rank'
+    else:
+        if use_fts:
+            # 只有短词时无法使用索引：从最新文章倒序扫描，凑满一页即可停止
+            base = f'FROM knowledge_articles a CROSS JOIN {FTS_TABLE} f ON f.rowid = a.id WHERE {where}'
+            snippet = 'substr(a.content, max(instr(a.content, :first_term) - 40, 1), 160)'
+            params['first_term'] = terms[0]
+        else:
+            # 非 SQLite 数据库没有 FTS5，退化为 LIKE 查询
+            base = f'FROM knowledge_articles a WHERE {where}'
+            snippet = 'substr(a.content, 1, 160)'
+        title = 'a.title'
+        order = 'a.id DESC'
+
+    params_page = dict(params, limit=per_page, offset=(page - 1) * per_page)
+    rows = db.session.execute(text(
+        f'SELECT a.id, {title} AS title, {snippet} AS snippet, a.category_id, a.tags, '
+        f'a.publish_time, a.view_count '
+        f'{base} ORDER BY {order} LIMIT :limit OFFSET :offset'
+    ).columns(publish_time=DateTime), params_page).all()
+
+    # 一次取出前 N 条命中的分类与标签，同时得到（封顶的）总数和分面
+    facet_rows = db.session.execute(text(
+        f'SELECT a.category_id, a.tags {base} ORDER BY {order} LIMIT {FACET_SCAN_LIMIT + 1}'
+    ), params).all()
+    total = len(facet_rows)
+    total_capped = total > FACET_SCAN_LIMIT
+    facet_rows = facet_rows[:FACET_SCAN_LIMIT]
+
+    category_counts = {}
+    tag_counts = {}
+    for category, tags in facet_rows:
+        category_counts[category] = category_counts.get(category, 0) + 1
+        for item in split_tags(tags):
+            tag_counts[item] = tag_counts.get(item, 0) + 1
+    category_facets = sorted(category_counts.items(), key=lambda item: -item[1])
+    tag_facets = sorted(tag_counts.items(), key=lambda item: (-item[1], item[0]))[:FACET_TAG_LIMIT]
+
+    short_terms = terms if not use_fts else [t for t in terms if len(t) < MIN_TRIGRAM_LENGTH]
+    results = [{
+        'id': row.id,
+        'title': _highlight(_mark_terms(row.title, short_terms)),
+        'snippet': _highlight(_mark_terms(row.snippet, short_terms)),
+        'category_id': row.category_id,
+        'tags': split_tags(row.tags),
+        'publish_time': row.publish_time,
+        'view_count': row.view_count,
+    } for row in rows]
+
+    return {
+        'total': FACET_SCAN_LIMIT if total_capped else total,
+        'total_capped': total_capped,
+        'results': results,
+        'category_facets': category_facets,
+        'tag_facets': tag_facets,
+    }
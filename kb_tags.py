@@ -0,0 +1,177 @@
+from collections import Counter
+from itertools import permutations
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from simple_models import db, KnowledgeArticle, KnowledgeTag, KnowledgeTagCooccurrence, knowledge_article_tags
+from kb_search import split_tags
+
+# 标签表、关联表与共现表由迁移 0007 建表并从文章的标签字符串回填
+TAG_TABLES = (KnowledgeTag.__table__, knowledge_article_tags, KnowledgeTagCooccurrence.__table__)
+
+
+def _contributions(tag_ids):
+    """一篇已发布文章对标签计数和共现计数的贡献"""
+    result = Counter()
+    for tag_id in tag_ids:
+        result[('tag', tag_id)] += 1
+    for tag_id, other_tag_id in permutations(tag_ids, 2):
+        result[('pair', tag_id, other_tag_id)] += 1
+    return result
+
+
+def _apply(diff):
+    """把计数变化写入标签表和共现表（不提交）"""
+    tags = KnowledgeTag.__table__
+    pairs = KnowledgeTagCooccurrence.__table__
+    for key, delta in diff.items():
+        if not delta:
+            continue
+        if key[0] == 'tag':
+            db.session.execute(
+                tags.update().where(tags.c.id == key[1]).values(article_count=tags.c.article_count + delta)
+            )
+            continue
+        _, tag_id, other_tag_id = key
+        updated = db.session.execute(
+            pairs.update()
+            .where(pairs.c.tag_id == tag_id, pairs.c.other_tag_id == other_tag_id)
+            .values(count=pairs.c.count + delta)
+        ).rowcount
+        if not updated and delta > 0:
+            db.session.execute(pairs.insert().values(tag_id=tag_id, other_tag_id=other_tag_id, count=delta))
+
+
+def _insert_ignore(table):
+    """忽略唯一键冲突的 INSERT"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with('IGNORE')
+
+
+def _tag_ids(names):
+    """按名称取标签 id，不存在的标签自动创建
+
+    先插入（已存在则忽略）再查询，并发保存同一新标签时不会违反唯一约束。
+    """
+    if not names:
+        return {}
+    ids = dict(db.session.query(KnowledgeTag.name, KnowledgeTag.id).filter(KnowledgeTag.name.in_(names)).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.session.execute(_insert_ignore(KnowledgeTag.__table__),
+                           [{'name': name, 'article_count': 0} for name in missing])
+        ids.update(db.session.query(KnowledgeTag.name, KnowledgeTag.id).filter(KnowledgeTag.name.in_(missing)).all())
+    return ids
+
+
+def _current_tag_ids(article_id):
+    return {tag_id for (tag_id,) in db.session.execute(
+        db.select(knowledge_article_tags.c.tag_id).where(knowledge_article_tags.c.article_id == article_id)
+    )}
+
+
+def sync_article_tags(article, old_published):
+    """文章新建或编辑后同步标签关联与计数（不提交，文章需已 flush 出 id）"""
+    old_ids = _current_tag_ids(article.id)
+    names = split_tags(article.tags)
+    ids = _tag_ids(names)
+    new_ids = {ids[name] for name in names}
+
+    removed, added = old_ids - new_ids, new_ids - old_ids
+    if removed:
+        db.session.execute(knowledge_article_tags.delete().where(
+            knowledge_article_tags.c.article_id == article.id,
+            knowledge_article_tags.c.tag_id.in_(removed)
+        ))
+    if added:
+        db.session.execute(knowledge_article_tags.insert(),
+                           [{'article_id': article.id, 'tag_id': tag_id} for tag_id in added])
+
+    diff = Counter()
+    if old_published:
+        diff.subtract(_contributions(old_ids))
+    if article.is_published:
+        diff.update(_contributions(new_ids))
+    _apply(diff)
+
+
+def remove_article_tags(article):
+    """删除文章前移除其标签关联并扣减计数（不提交）"""
+    old_ids = _current_tag_ids(article.id)
+    if not old_ids:
+        return
+    if article.is_published:
+        diff = Counter()
+        diff.subtract(_contributions(old_ids))
+        _apply(diff)
+    db.session.execute(knowledge_article_tags.delete().where(knowledge_article_tags.c.article_id == article.id))
+
+
+def rebuild_tag_index():
+    """从文章的标签字符串完整重建标签表、关联表和共现计数（不提交）"""
+    rows = db.session.query(KnowledgeArticle.id, KnowledgeArticle.tags, KnowledgeArticle.is_published).all()
+    article_tags = [(article_id, split_tags(tags), is_published) for article_id, tags, is_published in rows]
+
+    db.session.execute(KnowledgeTagCooccurrence.__table__.delete())
+    db.session.execute(knowledge_article_tags.delete())
+    db.session.execute(KnowledgeTag.__table__.delete())
+
+    names = sorted({name for _, tag_names, _ in article_tags for name in tag_names})
+    if not names:
+        return
+    db.session.execute(KnowledgeTag.__table__.insert(), [{'name': name, 'article_count': 0} for name in names])
+    ids = dict(db.session.query(KnowledgeTag.name, KnowledgeTag.id).all())
+
+    links = []
+    counts = Counter()
+    for article_id, tag_names, is_published in article_tags:
+        tag_ids = [ids[name] for name in tag_names]
+        links.extend({'article_id': article_id, 'tag_id': tag_id} for tag_id in tag_ids)
+        if is_published:
+            counts.update(_contributions(tag_ids))
+
+    if links:
+        db.session.execute(knowledge_article_tags.insert(), links)
+    tag_counts = [{'tag_id': key[1], 'count': count} for key, count in counts.items() if key[0] == 'tag']
+    if tag_counts:
+        tags = KnowledgeTag.__table__
+        db.session.execute(
+            tags.update().where(tags.c.id == db.bindparam('tag_id')).values(article_count=db.bindparam('count')),
+            tag_counts
+        )
+    pair_counts = [{'tag_id': key[1], 'other_tag_id': key[2], 'count': count}
+                   for key, count in counts.items() if key[0] == 'pair']
+    if pair_counts:
+        db.session.execute(KnowledgeTagCooccurrence.__table__.insert(), pair_counts)
+
+
+def popular_tags(limit=30):
+    """标签云：按已发布文章数降序的 [(标签, 文章数)]"""
+    return db.session.query(KnowledgeTag.name, KnowledgeTag.article_count)\
+        .filter(KnowledgeTag.article_count > 0)\
+        .order_by(KnowledgeTag.article_count.desc(), KnowledgeTag.name)\
+        .limit(limit).all()
+
+
+def get_tag(name):
+    return KnowledgeTag.query.filter_by(name=name).first()
+
+
+def related_tags(tag, limit=10):
+    """与指定标签共同出现最多的标签 [(标签, 共现文章数)]"""
+    return db.session.query(KnowledgeTag.name, KnowledgeTagCooccurrence.count)\
+        .join(KnowledgeTag, KnowledgeTag.id == KnowledgeTagCooccurrence.other_tag_id)\
+        .filter(KnowledgeTagCooccurrence.tag_id == tag.id, KnowledgeTagCooccurrence.count > 0)\
+        .order_by(KnowledgeTagCooccurrence.count.desc(), KnowledgeTag.name)\
+        .limit(limit).all()
+
+
+def tagged_articles_query(tag):
+    """带有指定标签的已发布文章查询（经关联表索引，无需 LIKE 扫描）"""
+    return KnowledgeArticle.query\
+        .join(knowledge_article_tags, knowledge_article_tags.c.article_id == KnowledgeArticle.id)\
+        .filter(knowledge_article_tags.c.tag_id == tag.id, KnowledgeArticle.is_published == True)
@@ -0,0 +1,141 @@
+from sqlalchemy import func
+
+from simple_models import db, KnowledgeCategory, KnowledgeArticle, KnowledgeCategoryTree, KnowledgeCategoryStats
+
+
+class CategoryNode:
+    """分类树节点：分类对象、文章数与子节点"""
+
+    def __init__(self, category, article_count=0, subtree_article_count=0):
+        self.category = category
+        self.article_count = article_count
+        self.subtree_article_count = subtree_article_count
+        self.children = []
+
+    @property
+    def id(self):
+        return self.category.id
+
+
+def rebuild_category_tree():
+    """根据 parent_id 重建闭包表和全部文章数（不提交，由调用方提交）
+
+    分类数量很少，分类增删改时整体重建即可；文章变更走增量更新。
+    两张表由迁移 0006 建表并首次回填。
+    """
+    parents = dict(db.session.query(KnowledgeCategory.id, KnowledgeCategory.parent_id).all())
+
+    closure = []
+    for category_id in parents:
+        ancestor, depth, visited = category_id, 0, set()
+        # visited 防止错误数据中的环导致死循环
+        while ancestor is not None and ancestor not in visited:
+            visited.add(ancestor)
+            closure.append({'ancestor_id': ancestor, 'descendant_id': category_id, 'depth': depth})
+            ancestor = parents.get(ancestor)
+            depth += 1
+
+    direct = dict(db.session.query(KnowledgeArticle.category_id, func.count(KnowledgeArticle.id))
+                  .filter(KnowledgeArticle.is_published == True)
+                  .filter(KnowledgeArticle.category_id.isnot(None))
+                  .group_by(KnowledgeArticle.category_id).all())
+
+    subtree = {category_id: 0 for category_id in parents}
+    for row in closure:
+        subtree[row['ancestor_id']] += direct.get(row['descendant_id'], 0)
+
+    db.session.query(KnowledgeCategoryTree).delete(synchronize_session=False)
+    db.session.query(KnowledgeCategoryStats).delete(synchronize_session=False)
+    if closure:
+        db.session.execute(KnowledgeCategoryTree.__table__.insert(), closure)
+    if parents:
+        db.session.execute(KnowledgeCategoryStats.__table__.insert(), [
+            {'category_id': category_id,
+             'article_count': direct.get(category_id, 0),
+             'subtree_article_count': subtree[category_id]}
+            for category_id in parents
+        ])
+
+
+def adjust_article_count(category_id, delta):
+    """文章发布/撤回/移动/删除时增量更新本分类及所有祖先的计数（不提交）"""
+    if not category_id or not delta:
+        return
+
+    stats = KnowledgeCategoryStats.__table__
+    tree = KnowledgeCategoryTree.__table__
+    db.session.execute(
+        stats.update()
+        .where(stats.c.category_id == category_id)
+        .values(article_count=stats.c.article_count + delta)
+    )
+    ancestors = db.select(tree.c.ancestor_id).where(tree.c.descendant_id == category_id)
+    db.session.execute(
+        stats.update()
+        .where(stats.c.category_id.in_(ancestors))
+        .values(subtree_article_count=stats.c.subtree_article_count + delta)
+    )
+
+
+def article_changed(old_category_id, old_published, new_category_id, new_published):
+    """比较文章变更前后的分类与发布状态，更新计数"""
+    if old_category_id == new_category_id and bool(old_published) == bool(new_published):
+        return
+    if old_published:
+        adjust_article_count(old_category_id, -1)
+    if new_published:
+        adjust_article_count(new_category_id, 1)
+
+
+def get_category_tree():
+    """一次查询取出全部分类及计数，返回根节点列表和 {id: 节点}"""
+    rows = db.session.query(
+        KnowledgeCategory,
+        KnowledgeCategoryStats.article_count,
+        KnowledgeCategoryStats.subtree_article_count
+    ).outerjoin(KnowledgeCategoryStats, KnowledgeCategoryStats.category_id == KnowledgeCategory.id)\
+        .order_by(KnowledgeCategory.id).all()
+
+    nodes = {category.id: CategoryNode(category, count or 0, subtree or 0)
+             for category, count, subtree in rows}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node.category.parent_id)
+        if parent is not None:
+            parent.children.append(node)
+        else:
+            roots.append(node)
+    return roots, nodes
+
+
+def get_category_counts(category_ids):
+    """返回 {分类 id: (本分类文章数, 含子分类文章数)}"""
+    if not category_ids:
+        return {}
+    rows = db.session.query(
+        KnowledgeCategoryStats.category_id,
+        KnowledgeCategoryStats.article_count,
+        KnowledgeCategoryStats.subtree_article_count
+    ).filter(KnowledgeCategoryStats.category_id.in_(category_ids)).all()
+    return {category_id: (count, subtree) for category_id, count, subtree in rows}
+
+
+def subtree_category_ids(category_id):
+    """分类及其全部子孙分类的 id（子查询，可直接用于 IN 条件）"""
+    return db.select(KnowledgeCategoryTree.descendant_id)\
+        .where(KnowledgeCategoryTree.ancestor_id == category_id)
+
+
+def subtree_articles_query(category_id):
+    """某分类整棵子树下已发布文章的查询"""
+    return KnowledgeArticle.query.filter(
+        KnowledgeArticle.category_id.in_(subtree_category_ids(category_id)),
+        KnowledgeArticle.is_published == True
+    )
+
+
+def is_descendant(category_id, candidate_id):
+    """candidate_id 是否为 category_id 自身或其子孙（用于防止把分类移到自己下面）"""
+    return db.session.query(KnowledgeCategoryTree.query.filter_by(
+        ancestor_id=category_id, descendant_id=candidate_id
+    ).exists()).scalar()
@@ -0,0 +1,259 @@
+"""Prometheus 指标
+
+多进程部署（gunicorn 等预派生 worker）时，启动前设置环境变量
+PROMETHEUS_MULTIPROC_DIR 指向一个空目录：各进程把指标值写入该目录下的
+mmap 文件，/metrics 由任一进程汇总所有进程的文件后输出。worker 退出时
+应调用 mark_process_dead(pid)（gunicorn 的 child_exit 钩子），否则
+livesum 类的仪表会继续计入已退出进程的值。
+
+未安装 prometheus_client 时所有指标都是空操作，/metrics 返回 503。
+"""
+import os
+import threading
+import time
+import weakref
+from collections import Counter as _Counter
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from simple_models import Message
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+    )
+    from prometheus_client import multiprocess
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def _metric(cls, *args, **kwargs):
+    if cls is None:
+        return _NoopMetric()
+    if cls is not Gauge:
+        kwargs.pop('multiprocess_mode', None)
+    return cls(*args, **kwargs)
+
+
+# ============ 指标定义 ============
+
+http_request_duration = _metric(
+    Histogram, 'portal_http_request_duration_seconds', '请求处理耗时',
+    ['endpoint', 'method', 'status'], buckets=REQUEST_BUCKETS)
+http_requests_in_progress = _metric(
+    Gauge, 'portal_http_requests_in_progress', '正在处理的请求数', multiprocess_mode='livesum')
+
+db_queries = _metric(
+    Counter, 'portal_db_queries', 'SQL 语句数（按库和语句类型）', ['bind', 'statement'])
+db_query_duration = _metric(
+    Histogram, 'portal_db_query_duration_seconds', 'SQL 语句耗时', ['bind'], buckets=QUERY_BUCKETS)
+# 每个 worker 在处理第一个请求时写入自己的容量，汇总为存活 worker 之和，
+# 可与同为 livesum 的 checked_out 直接比较
+db_pool_size = _metric(
+    Gauge, 'portal_db_pool_size', '连接池容量（存活 worker 之和）', ['bind'], multiprocess_mode='livesum')
+db_pool_connections = _metric(
+    Gauge, 'portal_db_pool_connections', '已建立的数据库连接数', ['bind'], multiprocess_mode='livesum')
+db_pool_checked_out = _metric(
+    Gauge, 'portal_db_pool_checked_out', '正在使用的数据库连接数', ['bind'], multiprocess_mode='livesum')
+db_pool_checkouts = _metric(
+    Counter, 'portal_db_pool_checkouts', '从连接池取出连接的次数', ['bind'])
+
+cache_requests = _metric(
+    Counter, 'portal_cache_requests', '缓存访问次数，命中率 = hit / (hit + miss)', ['cache', 'result'])
+
+supply_requests_submitted = _metric(
+    Counter, 'portal_supply_requests_submitted', '提交的耗材申请数')
+supplies_issued = _metric(
+    Counter, 'portal_supplies_issued', '发放的耗材申请数')
+supply_items_issued = _metric(
+    Counter, 'portal_supply_items_issued', '发放的耗材数量')
+messages_created = _metric(
+    Counter, 'portal_messages_created', '创建的站内消息数', ['message_type'])
+
+
+def _statement_type(statement):
+    word = statement.lstrip()[:8].split(None, 1)
+    word = word[0].lower() if word else ''
+    return word if word in ('select', 'insert', 'update', 'delete') else 'other'
+
+
+def count_messages(session, message_type, count=1):
+    """记录绕过 ORM 批量插入的消息数，随会话提交计入指标，回滚则丢弃"""
+    session.info.setdefault('_metrics_messages', _Counter())[message_type] += count
+
+
+class PortalMetrics:
+    """把请求、SQL、连接池和缓存数据接入 Prometheus 指标"""
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self._apps = weakref.WeakSet()
+        self._bind_labels = {}
+        self._pool_size_pid = None
+        self._caches = {}
+        self._cache_seen = {}
+        self._cache_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    @property
+    def available(self):
+        return Counter is not None
+
+    def init_app(self, app, db):
+        self.app = app
+        app.config.setdefault('METRICS_TOKEN', None)
+        if not self.available:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        # 会话事件只能挂在全局 Session 类上：每个进程只注册一次，
+        # 处理时只统计已接入本扩展的应用中的会话
+        self._apps.add(app)
+        for name, listener in (('after_flush', self._after_flush),
+                               ('after_commit', self._after_commit),
+                               ('after_rollback', self._after_rollback)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+        with app.app_context():
+            for key, engine in db.engines.items():
+                self._instrument_engine(key or 'primary', engine)
+
+    def register_cache(self, name, stats):
+        """登记一个缓存；stats() 返回本进程累计的 (命中, 未命中) 次数"""
+        self._caches[name] = stats
+        self._cache_seen[name] = (0, 0)
+
+    # ============ 采集 ============
+
+    def _instrument_engine(self, label, engine):
+        self._bind_labels[engine] = label
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        pool = engine.pool
+
+        @event.listens_for(pool, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            db_pool_connections.labels(label).inc()
+
+        @event.listens_for(pool, 'close')
+        def _on_close(dbapi_connection, connection_record):
+            db_pool_connections.labels(label).dec()
+
+        @event.listens_for(pool, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            db_pool_checkouts.labels(label).inc()
+            db_pool_checked_out.labels(label).inc()
+
+        @event.listens_for(pool, 'checkin')
+        def _on_checkin(dbapi_connection, connection_record):
+            db_pool_checked_out.labels(label).dec()
+
+    def _set_pool_sizes(self):
+        # 不在 init_app 中设置：预加载时 init_app 只在主进程运行一次，
+        # 主进程的值既不属于任何 worker，也不会随 worker 数变化
+        for engine, label in self._bind_labels.items():
+            if hasattr(engine.pool, 'size'):
+                db_pool_size.labels(label).set(engine.pool.size())
+        self._pool_size_pid = os.getpid()
+
+    def _before_request(self):
+        if self._pool_size_pid != os.getpid():
+            self._set_pool_sizes()
+        g._metrics_started = time.perf_counter()
+        http_requests_in_progress.inc()
+
+    def _teardown_request(self, exc):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        http_requests_in_progress.dec()
+        if request.endpoint == 'static':
+            return
+        status = getattr(g, '_metrics_status', None) or (500 if exc is not None else 200)
+        http_request_duration.labels(request.endpoint or '(unmatched)', request.method, str(status))\
+            .observe(time.perf_counter() - started)
+        self._sync_caches()
+
+    def _after_request(self, response):
+        # teardown 阶段拿不到响应对象，在这里记下状态码
+        g._metrics_status = response.status_code
+        return response
+
+    def _sync_caches(self):
+        # 缓存自身只维护进程内计数，这里把增量计入（可跨进程汇总的）计数器
+        with self._cache_lock:
+            for name, stats in self._caches.items():
+                hits, misses = stats()
+                seen_hits, seen_misses = self._cache_seen[name]
+                if hits > seen_hits:
+                    cache_requests.labels(name, 'hit').inc(hits - seen_hits)
+                if misses > seen_misses:
+                    cache_requests.labels(name, 'miss').inc(misses - seen_misses)
+                self._cache_seen[name] = (hits, misses)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['_metrics_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('_metrics_started', None)
+        if started is None:
+            return
+        label = self._bind_labels.get(conn.engine, 'other')
+        db_queries.labels(label, _statement_type(statement)).inc()
+        db_query_duration.labels(label).observe(time.perf_counter() - started)
+
+    def _tracks_current_app(self):
+        return has_app_context() and current_app._get_current_object() in self._apps
+
+    def _after_flush(self, session, flush_context):
+        if not self._tracks_current_app():
+            return
+        for obj in session.new:
+            if isinstance(obj, Message):
+                count_messages(session, obj.message_type or 'system')
+
+    def _after_commit(self, session):
+        for message_type, count in session.info.pop('_metrics_messages', {}).items():
+            messages_created.labels(message_type).inc(count)
+
+    def _after_rollback(self, session):
+        session.info.pop('_metrics_messages', None)
+
+    # ============ 输出 ============
+
+    def render(self):
+        """返回 (正文, Content-Type)；多进程模式下汇总目录中所有进程的指标"""
+        if MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,222 @@
+"""数据库版本迁移
+
+迁移按版本号顺序执行，已执行的版本记录在 schema_migrations 表中，
+对已有数据的数据库可反复运行，只会执行尚未应用的迁移。
+
+用法：python migrations.py [upgrade|status|analyze]
+"""
+import argparse
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from simple_models import db
+
+# 迁移记录表不放进模型元数据，db.create_all() 不会创建它
+_meta = sa.MetaData()
+schema_migrations = sa.Table(
+    'schema_migrations', _meta,
+    sa.Column('version', sa.String(64), primary_key=True),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version):
+    """注册迁移；version 以序号开头，按字典序执行"""
+    def decorator(f):
+        MIGRATIONS.append((version, f))
+        return f
+    return decorator
+
+
+# ============ 迁移操作 ============
+
+def create_index(table_name, index_name, columns, unique=False):
+    """在线创建索引（已存在时跳过）
+
+    PostgreSQL 用 CREATE INDEX CONCURRENTLY，建索引期间不阻塞读写；
+    SQLite 每个索引单独一个短事务，WAL 模式下只在此期间排队写操作，读不受影响；
+    MySQL InnoDB 默认即为在线建索引。
+    """
+    engine = db.engine
+    table = sa.Table(table_name, sa.MetaData(), autoload_with=engine)
+    if index_name in {index['name'] for index in sa.inspect(engine).get_indexes(table_name)}:
+        return False
+
+    index = sa.Index(index_name, *[table.c[column] for column in columns], unique=unique,
+                     postgresql_concurrently=True)
+    if engine.dialect.name == 'postgresql':
+        # CONCURRENTLY 不能在事务中执行
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            index.create(conn)
+    else:
+        with engine.begin() as conn:
+            index.create(conn)
+    return True
+
+
+def analyze():
+    """刷新查询规划器的统计信息，新索引建好后规划器才会稳定地选用它"""
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'sqlite':
+            conn.exec_driver_sql('ANALYZE')
+            conn.exec_driver_sql('PRAGMA optimize')
+        elif db.engine.dialect.name == 'mysql':
+            for table_name in sa.inspect(conn).get_table_names():
+                conn.exec_driver_sql(f'ANALYZE TABLE {table_name}')
+        else:
+            conn.exec_driver_sql('ANALYZE')
+
+
+# ============ 迁移列表 ============
+
+@migration('0001_baseline')
+def _baseline():
+    # 补建缺失的表（已存在的表不受影响）
+    db.create_all()
+
+
+@migration('0002_list_pagination_indexes')
+def _list_pagination_indexes():
+    # 知识库分类列表与用户管理列表的游标分页
+    create_index('knowledge_articles', 'ix_knowledge_articles_category_published_time',
+                 ['category_id', 'is_published', 'publish_time'])
+    create_index('users', 'ix_users_status_created_at', ['status', 'created_at'])
+    create_index('users', 'ix_users_created_at', ['created_at'])
+    create_index('users', 'ix_users_department', ['department'])
+
+
+@migration('0003_hot_path_indexes')
+def _hot_path_indexes():
+    # 未读消息计数（每个页面的导航栏都会查询）与消息列表
+    create_index('messages', 'ix_messages_recipient_read', ['recipient_id', 'is_read'])
+    create_index('messages', 'ix_messages_recipient_created_at', ['recipient_id', 'created_at'])
+    create_index('messages', 'ix_messages_category_department', ['category', 'target_department'])
+    create_index('messages', 'ix_messages_sender_id', ['sender_id'])
+    # 通知列表：有效通知按置顶、发布时间倒序
+    create_index('notifications', 'ix_notifications_active_top_time', ['is_active', 'is_top', 'publish_time'])
+    # 申请列表：我的申请、待审批计数、全部申请按时间倒序
+    create_index('supply_requests', 'ix_supply_requests_applicant_time', ['applicant_id', 'apply_time'])
+    create_index('supply_requests', 'ix_supply_requests_status_time', ['status', 'apply_time'])
+    create_index('supply_requests', 'ix_supply_requests_apply_time', ['apply_time'])
+    # 员工名录按部门、姓名排序；员工档案文件按上传时间倒序
+    create_index('employees', 'ix_employees_department_name', ['department', 'name'])
+    create_index('employee_files', 'ix_employee_files_employee_time', ['employee_id', 'upload_time'])
+
+
+@migration('0004_employee_file_text_index')
+def _employee_file_text_index():
+    # 档案文件提取文本的全文索引；已有文件的文本由 python file_previews.py 补写
+    from file_previews import create_file_text_index
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            create_file_text_index(conn)
+
+
+@migration('0005_knowledge_search_index')
+def _knowledge_search_index():
+    # 知识库 FTS5 全文索引及同步触发器，首次创建时从文章表重建
+    from kb_search import create_search_index
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            create_search_index(conn)
+
+
+@migration('0006_knowledge_category_tree')
+def _knowledge_category_tree():
+    # 知识库分类闭包表与文章数统计表：补建并从现有分类、文章回填
+    from simple_models import create_table_if_missing, KnowledgeCategoryTree, KnowledgeCategoryStats
+    from kb_tree import rebuild_category_tree
+    for model in (KnowledgeCategoryTree, KnowledgeCategoryStats):
+        create_table_if_missing(model.__table__)
+    rebuild_category_tree()
+    db.session.commit()
+
+
+@migration('0007_knowledge_tag_index')
+def _knowledge_tag_index():
+    # 知识库标签表、文章标签关联表与共现表：补建并从文章的标签字符串回填
+    from simple_models import create_table_if_missing
+    from kb_tags import TAG_TABLES, rebuild_tag_index
+    for table in TAG_TABLES:
+        create_table_if_missing(table)
+    rebuild_tag_index()
+    db.session.commit()
+
+
+@migration('0008_knowledge_related_table')
+def _knowledge_related_table():
+    # 相关文章表；内容由 python kb_related.py 计算
+    from simple_models import create_table_if_missing, KnowledgeRelatedArticle
+    create_table_if_missing(KnowledgeRelatedArticle.__table__)
+
+
+@migration('0009_knowledge_revision_table')
+def _knowledge_revision_table():
+    # 知识文章修订记录表
+    from simple_models import create_table_if_missing, KnowledgeArticleRevision
+    create_table_if_missing(KnowledgeArticleRevision.__table__)
+
+
+@migration('0010_knowledge_publish_time_backfill')
+def _knowledge_publish_time_backfill():
+    # 分类列表按 (发布时间, id) 游标分页，发布时间为空的文章无法参与行值比较；
+    # 用更新时间（或当前时间）补齐
+    from simple_models import KnowledgeArticle
+    table = KnowledgeArticle.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update()
+                     .where(table.c.publish_time.is_(None))
+                     .values(publish_time=sa.func.coalesce(table.c.update_time, datetime.utcnow())))
+
+
+# ============ 执行 ============
+
+def applied_versions():
+    _meta.create_all(db.engine, checkfirst=True)
+    with db.engine.connect() as conn:
+        return set(conn.execute(sa.select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [(version, f) for version, f in sorted(MIGRATIONS) if version not in applied]
+
+
+def upgrade(log=print):
+    """执行全部未应用的迁移，之后运行 ANALYZE；返回本次执行的版本列表"""
+    done = []
+    for version, f in pending_migrations():
+        started = time.perf_counter()
+        f()
+        with db.engine.begin() as conn:
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        done.append(version)
+        log(f'已应用 {version}（{time.perf_counter() - started:.1f} 秒）')
+    if done:
+        analyze()
+        log('已更新统计信息（ANALYZE）')
+    return done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='数据库版本迁移')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['upgrade', 'status', 'analyze'])
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app(views=False)
+    with app.app_context():
+        if args.command == 'upgrade':
+            if not upgrade():
+                print('数据库已是最新版本')
+        elif args.command == 'status':
+            applied = applied_versions()
+            for version, _ in sorted(MIGRATIONS):
+                print(f"{'✓' if version in applied else ' '} {version}")
+        else:
+            analyze()
+            print('已更新统计信息（ANALYZE）')
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, tuple_
+
+
+class KeysetPage:
+    """一页结果及下一页游标"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(values):
+    if any(v is None for v in values):
+        raise ValueError('游标列的值不能为空')
+    payload = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """解析游标；格式不对时返回 None（按第一页处理）"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        result = []
+        for column, value in zip(columns, values):
+            if value is None:
+                # 正常生成的游标不含空值（见 keyset_paginate）
+                return None
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            result.append(value)
+        return result
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20):
+    """按 columns 降序的游标分页
+
+    以上一页最后一行的排序键为起点（WHERE (a, b) < (?, ?)），配合以这些列
+    结尾的索引，任何一页都只读取 per_page + 1 行，与翻到第几页无关。
+    columns 的最后一列须唯一（通常是主键），保证顺序稳定。
+
+    行值比较遇到 NULL 结果为未知，排序列为空的行无法定位到任何一页之后，
+    因此统一排除在外；可为空的排序列应由迁移补齐（如文章的发布时间）。
+    """
+    values = decode_cursor(cursor, columns) if cursor else None
+    query = query.filter(*[column.isnot(None) for column in columns if column.nullable])
+    if values is not None:
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+    rows = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,202 @@
+import cProfile
+import io
+import itertools
+import math
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+# 每条记录保留的最慢语句条数、语句文本最大长度
+SLOW_STATEMENT_LIMIT = 5
+STATEMENT_MAX_LENGTH = 500
+# cProfile 结果保留的函数条数（按累计耗时排序）
+PROFILE_STATS_LIMIT = 40
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数，sorted_values 须已升序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RequestRecord:
+    __slots__ = ('id', 'started_at', 'method', 'path', 'endpoint', 'status', 'wall_ms',
+                 'sql_count', 'sql_ms', 'template_ms', 'slow_statements', 'profile')
+
+    def __init__(self, record_id):
+        self.id = record_id
+        self.started_at = datetime.now()
+        self.method = request.method
+        self.path = request.full_path.rstrip('?')
+        self.endpoint = request.endpoint or '(未匹配)'
+        self.status = None
+        self.wall_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.slow_statements = []   # [(耗时 ms, 语句)]，按耗时降序
+        self.profile = None
+
+    def add_statement(self, statement, elapsed_ms):
+        self.sql_count += 1
+        self.sql_ms += elapsed_ms
+        slow = self.slow_statements
+        if len(slow) < SLOW_STATEMENT_LIMIT or elapsed_ms > slow[-1][0]:
+            slow.append((elapsed_ms, ' '.join(statement.split())[:STATEMENT_MAX_LENGTH]))
+            slow.sort(key=lambda item: -item[0])
+            del slow[SLOW_STATEMENT_LIMIT:]
+
+
+class RequestProfiler:
+    """请求级性能记录
+
+    每个请求记录总耗时、SQL 条数与总耗时（SQLAlchemy 游标事件）、模板渲染
+    耗时和最慢的几条语句，保存在进程内的环形缓冲中，由 /debug/perf 汇总展示。
+    按 PERF_PROFILE_SAMPLE_RATE 的比例，或带 ?_profile=1 参数（须 can_profile
+    回调允许）的请求，额外用 cProfile 记录函数级耗时。
+    """
+
+    def __init__(self, app=None, db=None, can_profile=None):
+        self.app = None
+        self.enabled = True
+        self.sample_rate = 0.0
+        self.can_profile = can_profile
+        self._records = deque(maxlen=2000)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.enabled = app.config.setdefault('PERF_PROFILING', True)
+        self.sample_rate = app.config.setdefault('PERF_PROFILE_SAMPLE_RATE', 0.0)
+        self._records = deque(maxlen=app.config.setdefault('PERF_BUFFER_SIZE', 2000))
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        # 只监听本应用的引擎（主库与只读库），只在请求上下文中计数
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    # ============ 请求钩子 ============
+
+    def _before_request(self):
+        if request.endpoint == 'static':
+            return
+        record = RequestRecord(next(self._ids))
+        g._perf_record = record
+        g._perf_started = time.perf_counter()
+        if self._should_profile():
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 同一线程已有其他性能分析器在运行
+                return
+            g._perf_profiler = profiler
+
+    def _should_profile(self):
+        if request.args.get('_profile') == '1':
+            return self.can_profile is not None and self.can_profile()
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _after_request(self, response):
+        record = g.get('_perf_record')
+        if record is not None:
+            record.status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        record = g.pop('_perf_record', None)
+        if record is None:
+            return
+        record.wall_ms = (time.perf_counter() - g.pop('_perf_started')) * 1000
+        if record.status is None:
+            record.status = 500 if exc is not None else 200
+        profiler = g.pop('_perf_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_STATS_LIMIT)
+            record.profile = output.getvalue()
+        with self._lock:
+            self._records.append(record)
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context():
+            g._perf_render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        if not has_request_context():
+            return
+        record = g.get('_perf_record')
+        started = g.pop('_perf_render_started', None)
+        if record is not None and started is not None:
+            record.template_ms += (time.perf_counter() - started) * 1000
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and g.get('_perf_record') is not None:
+            conn.info.setdefault('_perf_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        record = g.get('_perf_record')
+        started = conn.info.get('_perf_started')
+        if record is not None and started:
+            record.add_statement(statement, (time.perf_counter() - started.pop()) * 1000)
+
+    # ============ 查询 ============
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def get(self, record_id):
+        return next((record for record in self.records() if record.id == record_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """按端点汇总：请求数、耗时分位数、平均 SQL 条数与耗时、平均模板耗时"""
+        groups = {}
+        for record in self.records():
+            groups.setdefault((record.method, record.endpoint), []).append(record)
+
+        rows = []
+        for (method, endpoint), records in groups.items():
+            wall = sorted(record.wall_ms for record in records)
+            count = len(records)
+            rows.append({
+                'method': method,
+                'endpoint': endpoint,
+                'count': count,
+                'p50': percentile(wall, 50),
+                'p95': percentile(wall, 95),
+                'p99': percentile(wall, 99),
+                'max': wall[-1],
+                'sql_count': sum(record.sql_count for record in records) / count,
+                'sql_ms': sum(record.sql_ms for record in records) / count,
+                'template_ms': sum(record.template_ms for record in records) / count,
+                'errors': sum(1 for record in records if record.status >= 500),
+            })
+        rows.sort(key=lambda row: row['p95'] * row['count'], reverse=True)
+        return rows
@@ -0,0 +1,60 @@
+"""预派生（pre-fork）部署支持
+
+gunicorn --preload 等方式由主进程创建应用后再 fork 出 worker，各 worker
+以写时复制共享主进程已导入的模块、已完成配置的 ORM 映射和已编译的模板。
+为此主进程在 fork 前：
+
+- warm_up()：完成每个 worker 首个请求都要做的一次性初始化；
+- 关闭连接池中的数据库连接，避免父子进程共用同一个连接；
+- gc.freeze()：把现有对象移出垃圾回收的跟踪范围，否则 worker 中的
+  回收会改写这些对象的头部，使共享的内存页被逐页复制。
+
+fork 之后子进程丢弃继承来的连接池（不关闭父进程的连接），由
+create_app() 登记应用、本模块通过 os.register_at_fork 自动完成（钩子无法
+注销，只注册一次）；浏览量写回线程和预览
+进程池按进程号惰性重建，见 view_counter 与 file_previews。
+"""
+import gc
+import os
+import weakref
+
+from sqlalchemy.orm import configure_mappers
+
+from simple_models import db
+
+
+def warm_up(app):
+    """配置 ORM 映射并编译全部模板"""
+    configure_mappers()
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
+
+
+def prepare_for_fork(app):
+    """主进程 fork worker 之前调用（gunicorn 的 when_ready 钩子）"""
+    warm_up(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    gc.freeze()
+
+
+# fork 后需要重置连接池的应用；弱引用，不阻止已不用的应用被回收
+_fork_apps = weakref.WeakSet()
+_fork_hook_registered = False
+
+
+def _reset_engines_after_fork():
+    for app in list(_fork_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def install_fork_hooks(app):
+    """子进程中丢弃继承的连接池，之后按需重新建立连接"""
+    global _fork_hook_registered
+    _fork_apps.add(app)
+    if not _fork_hook_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_reset_engines_after_fork)
+        _fork_hook_registered = True
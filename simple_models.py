@@ -2,8 +2,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy.schema import CreateIndex, CreateTable
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# 会话按请求方法在主库与只读库之间分流，见 db_routing
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # 角色常量定义（与 auth.py 保持一致）
 ROLE_SUPER_ADMIN = 'super_admin'
@@ -31,6 +34,12 @@ class Role(db.Model):
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # 用户管理列表按状态筛选、按注册时间倒序分页
+        db.Index('ix_users_status_created_at', 'status', 'created_at'),
+        db.Index('ix_users_created_at', 'created_at'),
+        db.Index('ix_users_department', 'department'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
@@ -87,6 +96,10 @@ class User(UserMixin, db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # 有效通知按置顶、发布时间倒序
+        db.Index('ix_notifications_active_top_time', 'is_active', 'is_top', 'publish_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -145,6 +158,12 @@ class Supply(db.Model):
 
 class SupplyRequest(db.Model):
     __tablename__ = 'supply_requests'
+    __table_args__ = (
+        # 我的申请、待审批计数、全部申请按时间倒序
+        db.Index('ix_supply_requests_applicant_time', 'applicant_id', 'apply_time'),
+        db.Index('ix_supply_requests_status_time', 'status', 'apply_time'),
+        db.Index('ix_supply_requests_apply_time', 'apply_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     applicant_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -181,6 +200,10 @@ class SupplyRequest(db.Model):
 
 class Employee(db.Model):
     __tablename__ = 'employees'
+    __table_args__ = (
+        # 员工名录按部门、姓名排序
+        db.Index('ix_employees_department_name', 'department', 'name'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.String(50), unique=True, nullable=False, index=True)
@@ -199,6 +222,9 @@ class Employee(db.Model):
 
 class EmployeeFile(db.Model):
     __tablename__ = 'employee_files'
+    __table_args__ = (
+        db.Index('ix_employee_files_employee_time', 'employee_id', 'upload_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -231,8 +257,34 @@ class KnowledgeCategory(db.Model):
     def __repr__(self):
         return f'<KnowledgeCategory {self.name}>'
 
+class KnowledgeCategoryTree(db.Model):
+    """分类闭包表：每个分类与其所有祖先（含自身）各一行"""
+    __tablename__ = 'knowledge_category_tree'
+    
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('knowledge_categories.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('knowledge_categories.id'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<KnowledgeCategoryTree {self.ancestor_id}->{self.descendant_id}>'
+
+class KnowledgeCategoryStats(db.Model):
+    """分类文章数（仅统计已发布文章），随文章和分类变更维护"""
+    __tablename__ = 'knowledge_category_stats'
+    
+    category_id = db.Column(db.Integer, db.ForeignKey('knowledge_categories.id'), primary_key=True)
+    article_count = db.Column(db.Integer, nullable=False, default=0)  # 本分类
+    subtree_article_count = db.Column(db.Integer, nullable=False, default=0)  # 本分类及全部子分类
+    
+    def __repr__(self):
+        return f'<KnowledgeCategoryStats {self.category_id}>'
+
 class KnowledgeArticle(db.Model):
     __tablename__ = 'knowledge_articles'
+    __table_args__ = (
+        # 分类文章列表按发布时间倒序分页
+        db.Index('ix_knowledge_articles_category_published_time', 'category_id', 'is_published', 'publish_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -252,8 +304,79 @@ class KnowledgeArticle(db.Model):
     def __repr__(self):
         return f'<KnowledgeArticle {self.title}>'
     
+# 文章-标签关联表
+knowledge_article_tags = db.Table('knowledge_article_tags',
+    db.Column('article_id', db.Integer, db.ForeignKey('knowledge_articles.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('knowledge_tags.id'), primary_key=True, index=True)
+)
+
+class KnowledgeTag(db.Model):
+    """规范化的知识库标签，article_count 为已发布文章数"""
+    __tablename__ = 'knowledge_tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    article_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<KnowledgeTag {self.name}>'
+
+class KnowledgeTagCooccurrence(db.Model):
+    """标签共现计数：同时带有两个标签的已发布文章数（双向各存一行）"""
+    __tablename__ = 'knowledge_tag_cooccurrence'
+    
+    tag_id = db.Column(db.Integer, db.ForeignKey('knowledge_tags.id'), primary_key=True)
+    other_tag_id = db.Column(db.Integer, db.ForeignKey('knowledge_tags.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<KnowledgeTagCooccurrence {self.tag_id}-{self.other_tag_id}>'
+
+class KnowledgeRelatedArticle(db.Model):
+    """离线计算的相关文章（TF-IDF 余弦相似度前 k 名）"""
+    __tablename__ = 'knowledge_related_articles'
+    
+    article_id = db.Column(db.Integer, db.ForeignKey('knowledge_articles.id'), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('knowledge_articles.id'), primary_key=True, index=True)
+    score = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<KnowledgeRelatedArticle {self.article_id}->{self.related_id}>'
+
+class KnowledgeArticleRevision(db.Model):
+    """文章修订记录：定期保存完整快照，其余修订只存相对上一版的压缩差异"""
+    __tablename__ = 'knowledge_article_revisions'
+    __table_args__ = (
+        db.UniqueConstraint('article_id', 'revision', name='uq_article_revision'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('knowledge_articles.id'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    snapshot_revision = db.Column(db.Integer, nullable=False)  # 还原时的起点快照
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    title = db.Column(db.String(255), nullable=False)
+    tags = db.Column(db.String(255))
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))  # zlib 压缩的全文或差异
+    data_size = db.Column(db.Integer, nullable=False, default=0)
+    content_length = db.Column(db.Integer, nullable=False, default=0)
+    editor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    editor = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<KnowledgeArticleRevision {self.article_id}#{self.revision}>'
+
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # 未读消息计数与消息列表
+        db.Index('ix_messages_recipient_read', 'recipient_id', 'is_read'),
+        db.Index('ix_messages_recipient_created_at', 'recipient_id', 'created_at'),
+        db.Index('ix_messages_category_department', 'category', 'target_department'),
+        db.Index('ix_messages_sender_id', 'sender_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -287,4 +410,15 @@ class Message(db.Model):
         super().__init__(**kwargs)
     
     def __repr__(self):
-        return f'<Message {self.title}>'
\ No newline at end of file
+        return f'<Message {self.title}>'
+
+
+def create_table_if_missing(table):
+    """按需建表（含索引），供迁移补建后来新增的派生表使用
+
+    用 IF NOT EXISTS 而不是先检查再建表，已由 create_all 建好的表直接跳过。
+    """
+    with db.engine.begin() as conn:
+        conn.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
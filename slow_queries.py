@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+STATEMENT_MAX_LENGTH = 2000
+
+# SQLite 查询计划中需要关注的步骤
+_SQLITE_TEMP_BTREE = 'USE TEMP B-TREE'
+
+# PostgreSQL 计划节点行："Sort  (cost=…)"，嵌套节点为 "  ->  Seq Scan on users u  (cost=…)"；
+# "Sort Key: …"、"Filter: …" 等属性行不匹配
+_PG_PLAN_NODE = re.compile(r'^\s*(?:->\s+)?(?P<node>[A-Z][A-Za-z ]*?)(?: on (?P<relation>\S+).*?)?\s+\(')
+
+# 只对查询和数据修改语句取执行计划；DDL、PRAGMA、事务控制等语句不能或不应 EXPLAIN
+_EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'replace', 'with')
+
+
+def is_explainable(statement):
+    words = statement.lstrip(' \t\r\n(').split(None, 1)
+    return bool(words) and words[0].lower() in _EXPLAINABLE
+
+
+def parameter_shape(parameters):
+    """只记录参数的类型和个数，不记录值（可能含个人信息）"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def analyze_plan(dialect, plan):
+    """从查询计划中找出全表扫描和临时排序，返回标记列表"""
+    flags = []
+    if dialect == 'sqlite':
+        for line in plan:
+            # 虚拟表（如 FTS5）由模块自行检索，CONSTANT ROW 是无表的常量行，都不是全表扫描
+            if line.startswith('SCAN ') and ' USING ' not in line and \
+                    ' VIRTUAL TABLE' not in line and line != 'SCAN CONSTANT ROW':
+                flags.append(f'全表扫描：{line[5:].split()[0]}')
+            elif line.startswith(_SQLITE_TEMP_BTREE):
+                flags.append(f'临时 B 树：{line[len(_SQLITE_TEMP_BTREE) + 5:]}')
+    elif dialect == 'postgresql':
+        for line in plan:
+            match = _PG_PLAN_NODE.match(line)
+            if match is None:
+                continue
+            # 含 Parallel Seq Scan、Incremental Sort 等变体
+            if match['node'].endswith('Seq Scan'):
+                flags.append(f"全表扫描：{match['relation']}")
+            elif match['node'].endswith('Sort'):
+                flags.append('排序')
+    return flags
+
+
+class SlowQueryLog:
+    """慢查询记录
+
+    超过阈值的语句连同参数形态、所属端点和查询计划一起写入滚动的
+    JSON 行日志，并在进程内保留最近的若干条供 /debug/slow-queries 展示。
+    查询计划在同一数据库连接上另开游标执行 EXPLAIN 获取，不经过
+    SQLAlchemy，因此不会再次触发本记录器；PostgreSQL 上 EXPLAIN 放在
+    保存点中执行，失败时回滚到保存点，不会使业务事务进入中止状态。
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.threshold_ms = None
+        self._entries = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('portal.slow_queries')
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.threshold_ms = app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 100)
+        self._entries = deque(maxlen=app.config.setdefault('SLOW_QUERY_BUFFER_SIZE', 200))
+        path = app.config.setdefault('SLOW_QUERY_LOG', os.path.join(app.instance_path, 'logs', 'slow_queries.log'))
+        if self.threshold_ms is None:
+            return
+
+        if path and not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in self.logger.handlers):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=app.config.setdefault('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                          backupCount=app.config.setdefault('SLOW_QUERY_LOG_BACKUPS', 5),
+                                          encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+
+        # 只监听本应用的引擎，同一进程中其他应用（如测试）的阈值不受影响
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['_slow_query_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('_slow_query_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # 阈值随最近一次 init_app 变化，关闭时已注册的监听器不再记录
+        if self.threshold_ms is None or elapsed_ms < self.threshold_ms:
+            return
+
+        dialect = conn.dialect.name
+        plan = [] if executemany or not is_explainable(statement) else \
+            self._explain(conn, dialect, statement, parameters)
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_ms': round(elapsed_ms, 2),
+            'endpoint': (request.endpoint or request.path) if has_request_context() else threading.current_thread().name,
+            'method': request.method if has_request_context() else None,
+            'database': dialect,
+            'statement': ' '.join(statement.split())[:STATEMENT_MAX_LENGTH],
+            'parameters': parameter_shape(parameters[0] if executemany and parameters else parameters),
+            'executemany': executemany,
+            'plan': plan,
+            'flags': analyze_plan(dialect, plan),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        self.logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def _explain(self, conn, dialect, statement, parameters):
+        if dialect == 'sqlite':
+            # 结果的第 4 列是计划步骤的说明，如 SCAN users、USE TEMP B-TREE FOR ORDER BY
+            sql, column = 'EXPLAIN QUERY PLAN ' + statement, 3
+        elif dialect in ('postgresql', 'mysql'):
+            sql, column = 'EXPLAIN ' + statement, 0
+        else:
+            return []
+        dbapi_connection = conn.connection.dbapi_connection
+        # PostgreSQL 事务中任一语句出错都会中止整个事务，用保存点隔离
+        savepoint = dialect == 'postgresql' and not getattr(dbapi_connection, 'autocommit', False)
+        cursor = dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute(sql, parameters)
+                rows = cursor.fetchall()
+            except Exception as e:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                return [f'EXPLAIN 失败：{e}']
+            finally:
+                if savepoint:
+                    cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        except Exception as e:
+            return [f'EXPLAIN 失败：{e}']
+        finally:
+            cursor.close()
+        if dialect == 'mysql':
+            return [' | '.join(str(value) for value in row) for row in rows]
+        return [str(row[column]) for row in rows]
+
+    # ============ 查询 ============
+
+    def entries(self):
+        """最近的慢查询，新的在前"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def summary(self):
+        """按语句归并：出现次数、最长与平均耗时、计划标记，按总耗时降序"""
+        groups = {}
+        for entry in self.entries():
+            group = groups.get(entry['statement'])
+            if group is None:
+                group = groups[entry['statement']] = {
+                    'statement': entry['statement'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'endpoints': set(), 'flags': entry['flags'], 'plan': entry['plan'],
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['elapsed_ms']
+            group['max_ms'] = max(group['max_ms'], entry['elapsed_ms'])
+            group['endpoints'].add(entry['endpoint'])
+        return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+from simple_models import db, User, Role, Message, user_roles, ROLE_SUPER_ADMIN
+from metrics import count_messages
+
+# 单条 IN 查询的 id 个数上限（SQLite 变量个数有限制）
+ID_BATCH_SIZE = 500
+
+REVIEW_MESSAGES = {
+    'approve': ('账户审核通过', '您的账户已通过管理员审核，现在可以登录系统了。'),
+    'reject': ('账户审核未通过', '您的账户审核未通过，请联系管理员了解详情。'),
+}
+
+ROLE_MODES = ('add', 'replace', 'remove')
+
+
+def _batches(values):
+    values = list(values)
+    for start in range(0, len(values), ID_BATCH_SIZE):
+        yield values[start:start + ID_BATCH_SIZE]
+
+
+def _existing_ids(column, ids, *criteria):
+    result = []
+    for batch in _batches(sorted(set(ids))):
+        result.extend(db.session.execute(
+            db.select(column).where(column.in_(batch), *criteria)
+        ).scalars())
+    return result
+
+
+def review_users(user_ids, action, sender_id):
+    """批量审核待审核用户（不提交）
+
+    只处理仍为待审核状态的用户：每批一条 UPDATE 改状态，通知消息一次
+    executemany 批量插入。返回实际处理的用户 id 列表。
+    """
+    title, content = REVIEW_MESSAGES[action]
+    status, is_active = ('active', True) if action == 'approve' else ('inactive', False)
+
+    pending_ids = _existing_ids(User.id, user_ids, User.status == 'pending')
+    if not pending_ids:
+        return []
+
+    users = User.__table__
+    for batch in _batches(pending_ids):
+        db.session.execute(
+            users.update()
+            .where(users.c.id.in_(batch), users.c.status == 'pending')
+            .values(status=status, is_active=is_active)
+        )
+
+    now = datetime.utcnow()
+    db.session.execute(Message.__table__.insert(), [{
+        'title': title,
+        'content': content,
+        'message_type': 'system',
+        'recipient_id': user_id,
+        'sender_id': sender_id,
+        'created_at': now,
+    } for user_id in pending_ids])
+    count_messages(db.session, 'system', len(pending_ids))
+    return pending_ids
+
+
+def assign_roles(user_ids, role_ids, mode='add'):
+    """批量为用户分配角色（不提交）
+
+    mode 为 add（追加）、replace（替换为所选角色）或 remove（移除所选角色）。
+    角色和已有关联各用一条查询取出，关联表按差集批量增删。
+    返回 (受影响的用户数, 实际使用的角色列表)。
+    """
+    roles = Role.query.filter(Role.id.in_(set(role_ids))).all() if role_ids else []
+    valid_role_ids = {role.id for role in roles}
+    valid_user_ids = _existing_ids(User.id, user_ids)
+    if not valid_user_ids:
+        return 0, roles
+
+    existing = set()
+    for batch in _batches(valid_user_ids):
+        existing.update(db.session.execute(
+            db.select(user_roles.c.user_id, user_roles.c.role_id).where(user_roles.c.user_id.in_(batch))
+        ).tuples())
+
+    if mode == 'remove':
+        wanted = {pair for pair in existing if pair[1] not in valid_role_ids}
+    elif mode == 'replace':
+        wanted = {(user_id, role_id) for user_id in valid_user_ids for role_id in valid_role_ids}
+    else:
+        wanted = existing | {(user_id, role_id) for user_id in valid_user_ids for role_id in valid_role_ids}
+
+    removed = existing - wanted
+    added = wanted - existing
+    if removed:
+        db.session.execute(
+            user_roles.delete().where(user_roles.c.user_id == db.bindparam('uid'),
+                                      user_roles.c.role_id == db.bindparam('rid')),
+            [{'uid': user_id, 'rid': role_id} for user_id, role_id in sorted(removed)]
+        )
+    if added:
+        db.session.execute(user_roles.insert(), [{'user_id': user_id, 'role_id': role_id}
+                                                for user_id, role_id in sorted(added)])
+
+    # 会话里已加载的 User.roles 不再准确，下次访问时重新加载
+    valid_user_ids = set(valid_user_ids)
+    for user in db.session.identity_map.values():
+        if isinstance(user, User) and user.id in valid_user_ids:
+            db.session.expire(user, ['roles'])
+
+    return len({pair[0] for pair in removed | added}), roles
+
+
+def approver_ids(permission, department):
+    """拥有某权限、且是超级管理员或属于指定部门的在职用户 id
+
+    判定与 User.has_permission 相同（超级管理员拥有全部权限，其他用户
+    经任一角色获得），但由一条查询完成，不逐个用户加载角色。
+    """
+    roles = Role.query.all()
+    super_role_ids = [role.id for role in roles if role.name == ROLE_SUPER_ADMIN]
+    granting_ids = [role.id for role in roles
+                    if role.name == ROLE_SUPER_ADMIN or permission in (role.permissions or '').split(',')]
+    if not granting_ids:
+        return []
+    return db.session.execute(
+        db.select(User.id).where(
+            User.is_active == True,
+            db.or_(User.roles.any(Role.id.in_(super_role_ids)),
+                   db.and_(User.department == department, User.roles.any(Role.id.in_(granting_ids))))
+        ).order_by(User.id)
+    ).scalars().all()
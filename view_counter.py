@@ -0,0 +1,103 @@
+import atexit
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import text
+
+from simple_models import db
+
+# 直接累加浏览量；不经过 ORM，避免 onupdate 把 update_time 一并改掉
+_FLUSH_SQL = text(
+    'UPDATE knowledge_articles SET view_count = coalesce(view_count, 0) + :delta WHERE id = :article_id'
+)
+
+
+class ViewCountBuffer:
+    """文章浏览量缓冲
+
+    每次浏览只在进程内存中计数，由后台线程按时间间隔或累计阈值
+    批量写回数据库，文章阅读请求本身不再产生写操作。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 5.0
+        self.flush_threshold = 500
+        self._counts = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.setdefault('VIEW_COUNT_FLUSH_INTERVAL', 5.0)
+        self.flush_threshold = app.config.setdefault('VIEW_COUNT_FLUSH_THRESHOLD', 500)
+        atexit.register(self.flush)
+
+    def _ensure_worker(self):
+        # 预派生（pre-fork）的工作进程不会继承父进程的线程，按进程号惰性启动
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid != pid:
+                self._counts = Counter()
+                self._total = 0
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='view-count-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.warning('浏览量写回失败：%s', e)
+
+    def record(self, article_id, count=1):
+        """记录一次浏览"""
+        self._ensure_worker()
+        with self._lock:
+            self._counts[article_id] += count
+            self._total += count
+            if self._total >= self.flush_threshold:
+                self._wakeup.set()
+
+    def pending(self, article_id):
+        """尚未写回数据库的浏览次数"""
+        with self._lock:
+            return self._counts.get(article_id, 0)
+
+    def flush(self):
+        """把缓冲的浏览量以一次批量 UPDATE 写回数据库"""
+        # 串行化写回，保证返回时之前记录的浏览量都已提交
+        with self._flush_lock:
+            with self._lock:
+                if not self._counts:
+                    return 0
+                counts = self._counts
+                self._counts = Counter()
+                self._total = 0
+
+            params = [{'article_id': article_id, 'delta': delta} for article_id, delta in counts.items()]
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(_FLUSH_SQL, params)
+            except Exception:
+                # 写回失败时把计数放回缓冲，下次重试
+                with self._lock:
+                    self._counts.update(counts)
+                    self._total += sum(counts.values())
+                raise
+            return len(params)
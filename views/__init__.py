@@ -0,0 +1,57 @@
+"""页面路由
+
+按功能分成若干蓝图，每个模块定义一个名为 bp 的蓝图，端点名为
+"蓝图名.视图函数名"（如 url_for('knowledge.knowledge_article', ...)）。
+
+视图模块（连同表单、各功能模块）只在 register_blueprints() 时才导入：
+数据库初始化、迁移等命令行脚本用 create_app(views=False) 创建应用，
+不会加载任何页面代码。
+"""
+from datetime import datetime
+from importlib import import_module
+
+from flask import g
+from flask_login import current_user
+
+# 注册顺序即 /debug/routes 中的列出顺序；增删蓝图只需修改这里
+BLUEPRINTS = (
+    'main',
+    'auth',
+    'notifications',
+    'supplies',
+    'employees',
+    'knowledge',
+    'admin',
+    'messages',
+    'debug',
+)
+
+
+def register_blueprints(app, names=None):
+    """导入并注册蓝图；names 为 None 时注册全部"""
+    for name in names or BLUEPRINTS:
+        module = import_module(f'{__name__}.{name}')
+        app.register_blueprint(module.bp)
+
+
+def get_local_time():
+    """获取本地时间"""
+    return datetime.now()
+
+
+def get_unread_messages_count():
+    """当前用户的未读消息数（COUNT 查询，同一请求内只查一次）"""
+    if 'unread_messages_count' not in g:
+        from simple_models import Message
+        g.unread_messages_count = Message.query.filter_by(
+            recipient_id=current_user.id,
+            is_read=False
+        ).count()
+    return g.unread_messages_count
+
+
+def format_local_time(dt):
+    """将时间格式化为本地时间字符串"""
+    if dt is None:
+        return ""
+    return dt.strftime('%Y-%m-%d %H:%M')
@@ -0,0 +1,403 @@
+"""用户与角色权限管理"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+
+from simple_models import db, User, Role, Message
+from forms import RegisterForm, UserEditForm, UserRoleForm, UserSearchForm, ResetPasswordForm, RolePermissionsForm, BulkUserActionForm
+from auth import permission_required, PERMISSION_MANAGE_USERS, PERMISSION_APPROVE_USERS, PERMISSION_RESET_PASSWORDS, PERMISSION_MANAGE_ROLES, ROLE_SUPER_ADMIN, ROLE_ADMIN, ROLE_USER, ROLE_PENDING, PERMISSION_MODULES, get_permission_description, get_role_description
+from pagination import keyset_paginate
+from user_admin import REVIEW_MESSAGES, ROLE_MODES, review_users, assign_roles
+from views import get_local_time
+
+bp = Blueprint('admin', __name__)
+
+
+def filter_users(query, status, department, keyword):
+    """按状态、部门和关键词筛选用户（用户管理列表与批量操作共用）"""
+    if status and status != 'all':
+        query = query.filter(User.status == status)
+    
+    if department:
+        query = query.filter(User.department == department)
+    
+    if keyword:
+        query = query.filter(
+            db.or_(
+                User.username.contains(keyword),
+                User.real_name.contains(keyword),
+                User.department.contains(keyword)
+            )
+        )
+    
+    return query
+
+# 用户管理列表
+@bp.route('/admin/users')
+@login_required
+@permission_required(PERMISSION_MANAGE_USERS)
+def admin_users():
+    form = UserSearchForm(request.args, meta={'csrf': False})
+    status_filter = request.args.get('status', 'all')
+    department = request.args.get('department', '')
+    keyword = request.args.get('q', '').strip()
+    
+    # 各状态人数：一次 GROUP BY，不受当前状态筛选影响
+    status_counts = dict(
+        filter_users(db.session.query(User.status, db.func.count(User.id)), None, department, keyword)
+        .group_by(User.status).all()
+    )
+    
+    # 游标分页；角色用一条 IN 查询预加载，避免模板里逐行懒加载
+    query = filter_users(User.query, status_filter, department, keyword).options(selectinload(User.roles))
+    page = keyset_paginate(query, [User.created_at, User.id],
+                           cursor=request.args.get('after'), per_page=50)
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('admin_users.html', 
+                         users=page.items, 
+                         page=page,
+                         is_first_page=not request.args.get('after'),
+                         form=form,
+                         status_filter=status_filter,
+                         status_counts=status_counts,
+                         all_roles=Role.query.order_by(Role.id).all(),
+                         bulk_form=BulkUserActionForm(),
+                         date=current_date)
+
+def _admin_users_filters():
+    """批量操作表单里带回的列表筛选条件，操作完成后回到同一视图"""
+    return {key: request.form.get(key) or None for key in ('status', 'q', 'department')}
+
+# 批量审核用户
+@bp.route('/admin/users/review', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_APPROVE_USERS)
+def bulk_review_users():
+    if not BulkUserActionForm().validate_on_submit():
+        abort(400)
+    action = request.form.get('action')
+    filters = _admin_users_filters()
+    if action not in REVIEW_MESSAGES:
+        flash('无效的审核操作', 'error')
+        return redirect(url_for('.admin_users', **filters))
+    
+    if request.form.get('scope') == 'all_pending':
+        # 当前搜索条件下的全部待审核用户，不限于本页勾选
+        user_ids = [user_id for (user_id,) in filter_users(
+            db.session.query(User.id), 'pending', filters['department'], (filters['q'] or '').strip()
+        )]
+    else:
+        user_ids = request.form.getlist('user_ids', type=int)
+    
+    if not user_ids:
+        flash('请先选择用户', 'error')
+        return redirect(url_for('.admin_users', **filters))
+    
+    reviewed = review_users(user_ids, action, current_user.id)
+    db.session.commit()
+    
+    skipped = len(set(user_ids)) - len(reviewed)
+    verb = '审核通过' if action == 'approve' else '拒绝'
+    message = f'已{verb} {len(reviewed)} 个用户'
+    if skipped:
+        message += f'，{skipped} 个用户不是待审核状态已跳过'
+    flash(message + '！', 'success' if reviewed else 'error')
+    return redirect(url_for('.admin_users', **filters))
+
+# 批量分配角色
+@bp.route('/admin/users/roles', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def bulk_assign_roles():
+    if not BulkUserActionForm().validate_on_submit():
+        abort(400)
+    filters = _admin_users_filters()
+    user_ids = request.form.getlist('user_ids', type=int)
+    role_ids = request.form.getlist('role_ids', type=int)
+    mode = request.form.get('mode', 'add')
+    
+    if mode not in ROLE_MODES:
+        flash('无效的角色操作', 'error')
+    elif not user_ids:
+        flash('请先选择用户', 'error')
+    elif not role_ids and mode != 'replace':
+        flash('请选择角色', 'error')
+    else:
+        changed, roles = assign_roles(user_ids, role_ids, mode)
+        db.session.commit()
+        role_names = '、'.join(role.name for role in roles) or '无'
+        flash(f'已为 {changed} 个用户更新角色（{role_names}）！', 'success')
+    
+    return redirect(url_for('.admin_users', **filters))
+
+# 审核用户
+@bp.route('/admin/user/<int:user_id>/approve', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_APPROVE_USERS)
+def approve_user(user_id):
+    user = User.query.get_or_404(user_id)
+    
+    if user.status == 'pending':
+        user.approve()
+        
+        # 创建用户审核通过消息 - 修复：添加 sender_id
+        message = Message(
+            title='账户审核通过',
+            content='您的账户已通过管理员审核，现在可以登录系统了。',
+            message_type='system',
+            recipient_id=user.id,
+            sender_id=current_user.id  # 添加这一行
+        )
+        db.session.add(message)
+        
+        db.session.commit()
+        flash(f'用户 {user.username} 已审核通过！', 'success')
+    else:
+        flash('只能审核待审核状态的用户', 'error')
+    
+    return redirect(url_for('.admin_users'))
+
+@bp.route('/admin/user/<int:user_id>/reject', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_APPROVE_USERS)
+def reject_user(user_id):
+    user = User.query.get_or_404(user_id)
+    
+    if user.status == 'pending':
+        user.reject()
+        
+        # 创建用户审核拒绝消息 - 修复：添加 sender_id
+        message = Message(
+            title='账户审核未通过',
+            content='您的账户审核未通过，请联系管理员了解详情。',
+            message_type='system',
+            recipient_id=user.id,
+            sender_id=current_user.id  # 添加这一行
+        )
+        db.session.add(message)
+        
+        db.session.commit()
+        flash(f'用户 {user.username} 已拒绝！', 'success')
+    else:
+        flash('只能拒绝待审核状态的用户', 'error')
+    
+    return redirect(url_for('.admin_users'))
+
+# 编辑用户
+@bp.route('/admin/user/<int:user_id>/edit', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_USERS)
+def edit_user(user_id):
+    user = User.query.get_or_404(user_id)
+    form = UserEditForm(obj=user)
+    
+    if form.validate_on_submit():
+        user.username = form.username.data
+        user.real_name = form.real_name.data
+        user.email = form.email.data
+        user.phone = form.phone.data
+        user.department = form.department.data
+        user.status = form.status.data
+        user.is_active = (form.status.data == 'active')
+        
+        db.session.commit()
+        flash(f'用户 {user.username} 信息更新成功！', 'success')
+        return redirect(url_for('.admin_users'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_user.html', form=form, user=user, date=current_date)
+
+# 分配角色
+@bp.route('/admin/user/<int:user_id>/roles', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def user_roles(user_id):
+    user = User.query.get_or_404(user_id)
+    form = UserRoleForm()
+    
+    # 动态设置角色选项
+    all_roles = Role.query.all()  # 获取所有角色
+    form.roles.choices = [(role.id, role.name) for role in all_roles]
+    
+    if form.validate_on_submit():
+        # 替换为所选角色（一次查询取出全部所选角色）
+        roles_by_id = {role.id: role for role in all_roles}
+        user.roles = [roles_by_id[role_id] for role_id in form.roles.data if role_id in roles_by_id]
+        
+        db.session.commit()
+        flash(f'用户 {user.username} 角色分配成功！', 'success')
+        return redirect(url_for('.admin_users'))
+    
+    # 设置当前选中的角色
+    form.roles.data = [role.id for role in user.roles]
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('user_roles.html', form=form, user=user, all_roles=all_roles, date=current_date)  # 添加 all_roles
+
+# 重置密码
+@bp.route('/admin/user/<int:user_id>/reset_password', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_RESET_PASSWORDS)
+def reset_user_password(user_id):
+    user = User.query.get_or_404(user_id)
+    form = ResetPasswordForm()
+    
+    if form.validate_on_submit():
+        user.set_password(form.new_password.data)
+        db.session.commit()
+        flash(f'用户 {user.username} 密码重置成功！', 'success')
+        return redirect(url_for('.admin_users'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('reset_password.html', form=form, user=user, date=current_date)
+
+# 创建用户（管理员直接创建）
+@bp.route('/admin/user/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_USERS)
+def create_user():
+    form = RegisterForm()
+    
+    if form.validate_on_submit():
+        user = User(
+            username=form.username.data,
+            real_name=form.real_name.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            department=form.department.data,
+            status='active',  # 管理员创建的用户直接激活
+            is_active=True
+        )
+        user.set_password(form.password.data)
+        
+        # 分配默认角色（普通用户）
+        user_role = Role.query.filter_by(name=ROLE_USER).first()
+        if user_role:
+            user.roles.append(user_role)
+        
+        db.session.add(user)
+        db.session.commit()
+        
+        flash(f'用户 {user.username} 创建成功！', 'success')
+        return redirect(url_for('.admin_users'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_user.html', form=form, date=current_date)
+
+# 权限管理页面
+@bp.route('/admin/permissions')
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def admin_permissions():
+    """权限管理页面"""
+    # 获取所有角色及其权限
+    roles = Role.query.order_by(Role.level).all()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('admin_permissions.html', 
+                         roles=roles,
+                         permission_modules=PERMISSION_MODULES,
+                         get_permission_description=get_permission_description,
+                         get_role_description=get_role_description,
+                         date=current_date)
+
+# 角色权限管理页面
+@bp.route('/admin/role/<role_name>/permissions', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def edit_role_permissions(role_name):
+    """编辑角色权限"""
+    # 验证角色名称
+    if role_name not in [ROLE_SUPER_ADMIN, ROLE_ADMIN, ROLE_USER, ROLE_PENDING]:
+        flash('无效的角色名称', 'error')
+        return redirect(url_for('.admin_permissions'))
+    
+    # 获取角色信息
+    role = Role.query.filter_by(name=role_name).first()
+    if not role:
+        flash('角色不存在', 'error')
+        return redirect(url_for('.admin_permissions'))
+    
+    # 创建表单并设置权限选项
+    form = RolePermissionsForm()
+    
+    if request.method == 'GET':
+        # 设置当前权限为选中状态
+        current_permissions = role.permissions.split(',') if role.permissions else []
+        form.permissions.data = current_permissions
+    
+    if form.validate_on_submit():
+        try:
+            # 更新角色权限
+            new_permissions = form.permissions.data
+            
+            print(f"提交的新权限: {new_permissions}")
+            
+            # 过滤掉分隔符
+            new_permissions = [p for p in new_permissions if p != '---separator---']
+            
+            print(f"过滤后的权限: {new_permissions}")
+            
+            # 更新数据库中的角色权限
+            role.permissions = ','.join(new_permissions)
+            
+            print(f"更新前的角色权限: {role.permissions}")
+            
+            db.session.commit()
+            
+            # 重新查询确认更新
+            updated_role = Role.query.filter_by(name=role_name).first()
+            print(f"更新后的角色权限: {updated_role.permissions}")
+            
+            flash(f'角色 {role_name} 的权限已更新！', 'success')
+            return redirect(url_for('.admin_permissions'))
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"更新权限时出错: {str(e)}")
+            flash(f'更新权限时出错: {str(e)}', 'error')
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_role_permissions.html', 
+                         form=form, 
+                         role=role,
+                         role_name=role_name,
+                         get_permission_description=get_permission_description,
+                         get_role_description=get_role_description,
+                         date=current_date)
+
+# 重置角色权限
+@bp.route('/admin/role/<role_name>/reset', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def reset_role_permissions(role_name):
+    """重置角色权限为默认值"""
+    if role_name not in [ROLE_SUPER_ADMIN, ROLE_ADMIN, ROLE_USER, ROLE_PENDING]:
+        flash('无效的角色名称', 'error')
+        return redirect(url_for('.admin_permissions'))
+    
+    try:
+        role = Role.query.filter_by(name=role_name).first()
+        if not role:
+            flash('角色不存在', 'error')
+            return redirect(url_for('.admin_permissions'))
+        
+        # 从默认配置中获取权限
+        from auth import ROLE_PERMISSIONS, reset_role_permissions
+        default_permissions = ROLE_PERMISSIONS.get(role_name, [])
+        
+        # 更新数据库
+        role.permissions = ','.join(default_permissions)
+        db.session.commit()
+        
+        # 更新内存映射
+        reset_role_permissions(role_name)
+        
+        flash(f'角色 {role_name} 的权限已重置为默认值！', 'success')
+        
+    except Exception as e:
+        db.session.rollback()
+        flash(f'重置权限时出错: {str(e)}', 'error')
+    
+    return redirect(url_for('.admin_permissions'))
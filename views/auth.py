@@ -0,0 +1,83 @@
+"""登录、退出与注册"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask_login import login_user, logout_user, login_required, current_user
+from datetime import datetime
+
+from simple_models import db, User, Role
+from forms import LoginForm, RegisterForm
+from auth import ROLE_USER
+
+bp = Blueprint('auth', __name__)
+
+
+# 登录
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.index'))
+    
+    form = LoginForm()
+    
+    if form.validate_on_submit():
+        username = form.username.data
+        password = form.password.data
+        
+        user = User.query.filter_by(username=username).first()
+        
+        if user and user.check_password(password):
+            if not user.is_approved:  # ← 新增检查
+                flash('账户未审核，请等待。', 'error')
+                return render_template('login.html', form=form)
+            
+            login_user(user)
+            user.last_login = datetime.now()  # ← 新增记录最后登录时间
+            db.session.commit()
+            
+            next_page = request.args.get('next')
+            flash(f'欢迎回来，{user.real_name or user.username}！', 'success')
+            return redirect(next_page or url_for('main.index'))
+        else:
+            flash('用户名或密码错误，请重试', 'error')
+    
+    return render_template('login.html', form=form)
+
+# 退出登录
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('您已成功退出登录', 'success')
+    return redirect(url_for('.login'))
+
+# 用户注册
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.index'))
+    
+    form = RegisterForm()
+    
+    if form.validate_on_submit():
+        user = User(
+            username=form.username.data,
+            real_name=form.real_name.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            department=form.department.data,
+            status='pending',  # 注册后状态为待审核
+            is_active=False   # 未激活
+        )
+        user.set_password(form.password.data)
+        
+        # 分配默认角色（普通用户）
+        user_role = Role.query.filter_by(name=ROLE_USER).first()
+        if user_role:
+            user.roles.append(user_role)
+        
+        db.session.add(user)
+        db.session.commit()
+        
+        flash('注册成功！请等待管理员审核。审核通过后即可登录。', 'success')
+        return redirect(url_for('.login'))
+    
+    return render_template('register.html', form=form)
@@ -0,0 +1,128 @@
+"""调试、性能与指标"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response, abort, current_app
+from flask_login import login_required
+from datetime import datetime
+
+from simple_models import Role
+from auth import permission_required, PERMISSION_MANAGE_ROLES
+from extensions import request_profiler, slow_query_log, portal_metrics
+from views import get_local_time
+
+bp = Blueprint('debug', __name__)
+
+
+@bp.route('/debug/time')
+def debug_time():
+    """调试时间显示"""
+    current_utc = datetime.utcnow()
+    current_local = datetime.now()
+    
+    return jsonify({
+        'utc_time': current_utc.strftime('%Y-%m-%d %H:%M:%S'),
+        'local_time': current_local.strftime('%Y-%m-%d %H:%M:%S'),
+        'server_timezone': '需要检查服务器设置'
+    })
+
+# Prometheus 指标；配置 METRICS_TOKEN 后须携带 Authorization: Bearer <token>
+@bp.route('/metrics')
+def prometheus_metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    if not portal_metrics.available:
+        return Response('未安装 prometheus_client，指标不可用\n', status=503, mimetype='text/plain')
+    body, content_type = portal_metrics.render()
+    return Response(body, content_type=content_type)
+
+# 调试路由
+@bp.route('/debug/routes')
+def debug_routes():
+    import urllib.parse
+    output = []
+    for rule in current_app.url_map.iter_rules():
+        methods = ','.join(sorted(rule.methods - set(['OPTIONS', 'HEAD'])))
+        line = urllib.parse.unquote(f"{rule.endpoint:50} {methods:20} {rule}")
+        output.append(line)
+    
+    return "<pre>" + "\n".join(sorted(output)) + "</pre>"
+
+# 请求性能汇总
+@bp.route('/debug/perf')
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_perf():
+    records = request_profiler.records()
+    # 最近最慢的请求，便于点进去查看慢语句和 cProfile 结果
+    slowest = sorted(records[-500:], key=lambda record: record.wall_ms, reverse=True)[:20]
+    profiled = [record for record in reversed(records) if record.profile][:20]
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('debug_perf.html',
+                         summary=request_profiler.summary(),
+                         total=len(records),
+                         slowest=slowest,
+                         profiled=profiled,
+                         enabled=request_profiler.enabled,
+                         date=current_date)
+
+@bp.route('/debug/perf/request/<int:record_id>')
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_perf_request(record_id):
+    record = request_profiler.get(record_id)
+    if record is None:
+        abort(404)
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('debug_perf_request.html', record=record, date=current_date)
+
+@bp.route('/debug/perf/reset', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_perf_reset():
+    request_profiler.clear()
+    flash('性能记录已清空！', 'success')
+    return redirect(url_for('.debug_perf'))
+
+# 慢查询及其查询计划
+@bp.route('/debug/slow-queries')
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_slow_queries():
+    flagged_only = request.args.get('flagged') == '1'
+    groups = slow_query_log.summary()
+    if flagged_only:
+        groups = [group for group in groups if group['flags']]
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('debug_slow_queries.html',
+                         groups=groups,
+                         recent=slow_query_log.entries()[:50],
+                         threshold_ms=slow_query_log.threshold_ms,
+                         log_path=current_app.config['SLOW_QUERY_LOG'],
+                         flagged_only=flagged_only,
+                         date=current_date)
+
+@bp.route('/debug/slow-queries/reset', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_slow_queries_reset():
+    slow_query_log.clear()
+    flash('慢查询记录已清空！', 'success')
+    return redirect(url_for('.debug_slow_queries'))
+
+# 调试路由 - 检查角色权限
+@bp.route('/debug/role/<role_name>')
+@login_required
+@permission_required(PERMISSION_MANAGE_ROLES)
+def debug_role_permissions(role_name):
+    """调试角色权限"""
+    role = Role.query.filter_by(name=role_name).first()
+    if not role:
+        return jsonify({'error': '角色不存在'})
+    
+    return jsonify({
+        'role_name': role.name,
+        'permissions_in_db': role.permissions,
+        'permissions_list': role.permissions.split(',') if role.permissions else []
+    })
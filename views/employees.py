@@ -0,0 +1,319 @@
+"""人员信息、员工档案文件与档案统计"""
+import mimetypes
+import os
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response, abort, stream_with_context, send_file
+from flask_login import login_required, current_user
+from datetime import datetime
+
+from simple_models import db, Employee, EmployeeFile
+from forms import EmployeeForm, EmployeeSearchForm, EmployeeImportForm, EmployeeFileForm
+from auth import permission_required, PERMISSION_VIEW_EMPLOYEES, PERMISSION_MANAGE_EMPLOYEES, PERMISSION_VIEW_ARCHIVES, PERMISSION_MANAGE_ARCHIVES
+from employee_export import EXPORT_COLUMNS, EXPORT_BATCH_SIZE, EXPORT_FORMATS
+from employee_import import import_employees as run_employee_import
+from archive_stats import get_archive_stats, invalidate_archive_stats
+from file_store import digest_of
+from file_previews import file_text_match, unindex_file
+from extensions import employee_file_store, preview_worker
+from views import get_local_time
+
+bp = Blueprint('employees', __name__)
+
+
+def filter_employees(query, department, keyword, search_files=False):
+    """按部门和关键词筛选员工（列表页与导出共用）
+
+    search_files 为真时关键词同时匹配档案文件的提取文本，
+    只应对有档案查看权限的用户开启。
+    """
+    if department:
+        query = query.filter(Employee.department == department)
+    
+    if keyword:
+        conditions = [
+            Employee.name.contains(keyword),
+            Employee.employee_id.contains(keyword),
+            Employee.position.contains(keyword)
+        ]
+        file_match = file_text_match(keyword) if search_files else None
+        if file_match is not None:
+            conditions.append(Employee.id.in_(file_match))
+        query = query.filter(db.or_(*conditions))
+    
+    return query
+
+@bp.route('/employees')
+@login_required
+@permission_required(PERMISSION_VIEW_EMPLOYEES)
+def employees_list():
+    form = EmployeeSearchForm()
+    department = request.args.get('department', '')
+    keyword = request.args.get('keyword', '')
+    
+    query = filter_employees(Employee.query, department, keyword,
+                             search_files=current_user.has_permission(PERMISSION_VIEW_ARCHIVES))
+    employees = query.order_by(Employee.department, Employee.name).all()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('employees.html', 
+                         employees=employees, 
+                         form=form,
+                         date=current_date)
+
+# 导出员工名录（CSV/XLSX 流式输出）
+@bp.route('/employees/export/<fmt>')
+@login_required
+@permission_required(PERMISSION_VIEW_EMPLOYEES)
+def export_employees(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    
+    department = request.args.get('department', '')
+    keyword = request.args.get('keyword', '')
+    
+    # 只查询导出列，避免构造 ORM 对象；yield_per 让驱动按批次取数
+    columns = [getattr(Employee, name) for _, name in EXPORT_COLUMNS]
+    query = filter_employees(db.session.query(*columns), department, keyword,
+                             search_files=current_user.has_permission(PERMISSION_VIEW_ARCHIVES))
+    rows = query.order_by(Employee.department, Employee.name)\
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    
+    generate, mimetype = EXPORT_FORMATS[fmt]
+    filename = f"employees_{get_local_time().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    
+    response = Response(stream_with_context(generate(rows)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲整个响应
+    return response
+
+@bp.route('/employee/<int:employee_id>')
+@login_required
+@permission_required(PERMISSION_VIEW_EMPLOYEES)
+def employee_detail(employee_id):
+    employee = Employee.query.get_or_404(employee_id)
+    files = EmployeeFile.query.filter_by(employee_id=employee_id)\
+        .order_by(EmployeeFile.upload_time.desc()).all()
+    file_form = EmployeeFileForm()
+    
+    # 只读取后台预先生成的预览，不在请求中生成
+    previews = {f.id: preview_worker.get_preview(digest_of(f.file_path)) for f in files}
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('employee_detail.html', 
+                         employee=employee, 
+                         files=files,
+                         previews=previews,
+                         file_form=file_form,
+                         date=current_date)
+
+# 上传员工档案文件
+@bp.route('/employee/<int:employee_id>/files/upload', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ARCHIVES)
+def upload_employee_file(employee_id):
+    employee = Employee.query.get_or_404(employee_id)
+    form = EmployeeFileForm()
+    
+    if form.validate_on_submit():
+        upload = form.file.data
+        # 分块写入临时文件并计算摘要，不把文件内容读入内存
+        tmp_path, digest, size = employee_file_store.stage(upload.stream)
+        
+        file_name = os.path.basename(upload.filename) or digest
+        extension = os.path.splitext(file_name)[1].lstrip('.').upper()
+        
+        try:
+            # 放置文件与提交记录在存储锁内完成，与删除时的引用检查互斥
+            with employee_file_store.lock():
+                relative_path = employee_file_store.place(tmp_path, digest)
+                employee_file = EmployeeFile(
+                    employee_id=employee.id,
+                    file_name=file_name,
+                    file_type=extension or '文件',
+                    file_path=relative_path,
+                    uploader_id=current_user.id,
+                    upload_time=datetime.now(),
+                    description=form.description.data
+                )
+                db.session.add(employee_file)
+                db.session.commit()
+        finally:
+            employee_file_store.discard(tmp_path)
+        
+        preview_worker.submit(employee_file_store.path_for(relative_path), file_name, digest,
+                              file_id=employee_file.id)
+        
+        flash(f'文件 {file_name} 上传成功！', 'success')
+    else:
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'error')
+    
+    return redirect(url_for('.employee_detail', employee_id=employee.id))
+
+# 下载员工档案文件（支持 Range 断点续传与条件请求）
+@bp.route('/employee/file/<int:file_id>/download')
+@login_required
+@permission_required(PERMISSION_VIEW_ARCHIVES)
+def download_employee_file(file_id):
+    employee_file = EmployeeFile.query.get_or_404(file_id)
+    
+    full_path = employee_file_store.path_for(employee_file.file_path)
+    if not full_path or not os.path.isfile(full_path):
+        abort(404)
+    
+    mimetype = mimetypes.guess_type(employee_file.file_name)[0] or 'application/octet-stream'
+    
+    # send_file 通过 wsgi.file_wrapper 走 sendfile；conditional=True 处理 Range、
+    # If-None-Match 与 If-Modified-Since。内容寻址文件不会变化，摘要即为强 ETag。
+    response = send_file(
+        full_path,
+        mimetype=mimetype,
+        as_attachment=request.args.get('inline') != '1',
+        download_name=employee_file.file_name,
+        conditional=True,
+        etag=digest_of(employee_file.file_path),
+        max_age=3600
+    )
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+# 档案文件缩略图（仅读取后台已生成的结果）
+@bp.route('/employee/file/<int:file_id>/thumbnail')
+@login_required
+@permission_required(PERMISSION_VIEW_ARCHIVES)
+def employee_file_thumbnail(file_id):
+    employee_file = EmployeeFile.query.get_or_404(file_id)
+    preview = preview_worker.get_preview(digest_of(employee_file.file_path))
+    if not preview or not preview['thumbnail_path']:
+        abort(404)
+    
+    return send_file(preview['thumbnail_path'], mimetype='image/png', conditional=True, max_age=86400)
+
+# 删除员工档案文件
+@bp.route('/employee/file/<int:file_id>/delete', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_ARCHIVES)
+def delete_employee_file(file_id):
+    employee_file = EmployeeFile.query.get_or_404(file_id)
+    employee_id = employee_file.employee_id
+    file_path = employee_file.file_path
+    
+    # 引用检查与删除文件在存储锁内完成，期间不会有上传提交引用同一内容的记录
+    with employee_file_store.lock():
+        unindex_file(employee_file.id)
+        db.session.delete(employee_file)
+        db.session.commit()
+        
+        # 内容可能被其他记录共享，没有引用时才删除实际文件及其预览
+        if not EmployeeFile.query.filter_by(file_path=file_path).first():
+            employee_file_store.delete(file_path)
+            preview_worker.delete_preview(digest_of(file_path))
+    
+    flash('档案文件已删除！', 'success')
+    return redirect(url_for('.employee_detail', employee_id=employee_id))
+
+@bp.route('/employee/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_EMPLOYEES)
+def create_employee():
+    form = EmployeeForm()
+    
+    if form.validate_on_submit():
+        # 转换日期字符串为日期对象
+        hire_date = datetime.strptime(form.hire_date.data, '%Y-%m-%d').date()
+        
+        employee = Employee(
+            employee_id=form.employee_id.data,
+            name=form.name.data,
+            department=form.department.data,
+            position=form.position.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            hire_date=hire_date,
+            status=form.status.data
+        )
+        
+        db.session.add(employee)
+        db.session.commit()
+        invalidate_archive_stats()
+        
+        flash(f'员工 {employee.name} 添加成功！', 'success')
+        return redirect(url_for('.employees_list'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_employee.html', form=form, date=current_date)
+
+# 批量导入员工（CSV/XLSX，按工号插入或更新）
+@bp.route('/employees/import', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_EMPLOYEES)
+def import_employees():
+    form = EmployeeImportForm()
+    result = None
+    
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            result = run_employee_import(upload.stream, upload.filename)
+        except ValueError as e:
+            db.session.rollback()
+            flash(f'导入失败：{str(e)}', 'error')
+        else:
+            if result.error_count:
+                flash(f'导入完成：成功 {result.imported} 条，失败 {result.error_count} 条', 'error')
+            else:
+                flash(f'导入完成：新增 {result.inserted} 条，更新 {result.updated} 条', 'success')
+        finally:
+            # 中途失败时之前的批次已提交，统计缓存同样要失效
+            invalidate_archive_stats()
+
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('import_employees.html', form=form, result=result, date=current_date)
+
+@bp.route('/employee/<int:employee_id>/edit', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_EMPLOYEES)
+def edit_employee(employee_id):
+    employee = Employee.query.get_or_404(employee_id)
+    form = EmployeeForm(obj=employee)
+    
+    # 将日期对象转换为字符串用于表单显示
+    form.hire_date.data = employee.hire_date.strftime('%Y-%m-%d')
+    
+    if form.validate_on_submit():
+        hire_date = datetime.strptime(form.hire_date.data, '%Y-%m-%d').date()
+        
+        employee.employee_id = form.employee_id.data
+        employee.name = form.name.data
+        employee.department = form.department.data
+        employee.position = form.position.data
+        employee.email = form.email.data
+        employee.phone = form.phone.data
+        employee.hire_date = hire_date
+        employee.status = form.status.data
+        
+        db.session.commit()
+        invalidate_archive_stats()
+        
+        flash(f'员工 {employee.name} 信息更新成功！', 'success')
+        return redirect(url_for('.employee_detail', employee_id=employee.id))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_employee.html', form=form, date=current_date, employee=employee)
+
+@bp.route('/archives')
+@login_required
+@permission_required(PERMISSION_VIEW_ARCHIVES)
+def archives_list():
+    # 统计数据来自一次分组聚合查询，并在员工变更时失效
+    stats = get_archive_stats()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('archives.html', 
+                         date=current_date,
+                         total_employees=stats['total_employees'],
+                         active_employees=stats['active_employees'],
+                         department_count=stats['department_count'],
+                         department_breakdown=stats['by_department'],
+                         hires_by_month=stats['hires_by_month'])
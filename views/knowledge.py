@@ -0,0 +1,391 @@
+"""知识库"""
+import difflib
+import hashlib
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response, abort, session, current_app
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
+
+from simple_models import db, KnowledgeCategory, KnowledgeArticle
+from forms import KnowledgeCategoryForm, KnowledgeArticleForm
+from auth import permission_required, PERMISSION_VIEW_KNOWLEDGE, PERMISSION_MANAGE_KNOWLEDGE, ROLE_SUPER_ADMIN, ROLE_ADMIN
+from kb_search import search_articles, split_tags
+from article_render import article_version
+from kb_tags import sync_article_tags, remove_article_tags, popular_tags, get_tag, related_tags, tagged_articles_query
+from kb_related import related_articles, remove_related
+from pagination import keyset_paginate
+from kb_revisions import record_revision, list_revisions, get_revision, remove_revisions
+from kb_tree import get_category_tree, rebuild_category_tree, article_changed, subtree_articles_query, is_descendant
+from extensions import view_counter, article_render_cache
+from views import get_local_time
+
+bp = Blueprint('knowledge', __name__)
+
+
+@bp.route('/knowledge')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_base():
+    # 整棵分类树及计数一次查询取出
+    categories, _ = get_category_tree()
+    recent_articles = KnowledgeArticle.query.filter_by(is_published=True)\
+        .options(selectinload(KnowledgeArticle.author))\
+        .order_by(KnowledgeArticle.publish_time.desc())\
+        .limit(10).all()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_base.html', 
+                         categories=categories,
+                         recent_articles=recent_articles,
+                         tag_cloud=popular_tags(),
+                         date=current_date)
+
+# 知识库全文检索
+@bp.route('/knowledge/search')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_search():
+    query = request.args.get('q', '').strip()
+    category_id = request.args.get('category', type=int)
+    tag = request.args.get('tag', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    
+    result = search_articles(query, category_id=category_id, tag=tag or None, page=page, per_page=per_page)
+    
+    # 分面中的分类名称
+    category_ids = [cid for cid, _ in result['category_facets'] if cid]
+    category_names = {}
+    if category_ids:
+        category_names = dict(db.session.query(KnowledgeCategory.id, KnowledgeCategory.name)
+                              .filter(KnowledgeCategory.id.in_(category_ids)).all())
+    
+    total_pages = (result['total'] + per_page - 1) // per_page
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_search.html',
+                         query=query,
+                         category_id=category_id,
+                         tag=tag,
+                         page=page,
+                         total_pages=total_pages,
+                         result=result,
+                         category_names=category_names,
+                         date=current_date)
+
+# 按标签浏览
+@bp.route('/knowledge/tag/<path:tag_name>')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_tag(tag_name):
+    tag = get_tag(tag_name)
+    if tag is None:
+        abort(404)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    
+    articles = tagged_articles_query(tag)\
+        .order_by(KnowledgeArticle.publish_time.desc(), KnowledgeArticle.id.desc())\
+        .offset((page - 1) * per_page).limit(per_page).all()
+    total_pages = (tag.article_count + per_page - 1) // per_page
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_tag.html',
+                         tag=tag,
+                         articles=articles,
+                         related=related_tags(tag),
+                         page=page,
+                         total_pages=total_pages,
+                         date=current_date)
+
+@bp.route('/knowledge/category/<int:category_id>')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_category(category_id):
+    _, nodes = get_category_tree()
+    node = nodes.get(category_id)
+    if node is None:
+        abort(404)
+    category = node.category
+    
+    # include_sub=1 时列出整棵子树下的文章（经闭包表一次查询）
+    include_sub = request.args.get('include_sub', 0, type=int) == 1
+    if include_sub:
+        articles_query = subtree_articles_query(category_id)
+    else:
+        articles_query = KnowledgeArticle.query.filter_by(
+            category_id=category_id, 
+            is_published=True
+        )
+    # 按 (发布时间, id) 游标分页，作者一次批量加载
+    page = keyset_paginate(
+        articles_query.options(selectinload(KnowledgeArticle.author)),
+        [KnowledgeArticle.publish_time, KnowledgeArticle.id],
+        cursor=request.args.get('after'),
+        per_page=20
+    )
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_category.html', 
+                         category=category,
+                         node=node,
+                         include_sub=include_sub,
+                         articles=page.items,
+                         article_tags={a.id: split_tags(a.tags) for a in page.items},
+                         page=page,
+                         is_first_page=not request.args.get('after'),
+                         date=current_date)
+
+@bp.route('/knowledge/article/<int:article_id>')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_article(article_id):
+    article = KnowledgeArticle.query.get_or_404(article_id)
+    
+    # 增加浏览次数（先记入内存缓冲，由后台批量写回，阅读请求不写数据库）
+    view_counter.record(article.id)
+    
+    # ETag 覆盖页面上的全部动态内容：文章版本、作者、分类面包屑、相关文章
+    # 及其浏览量、当前用户（导航、操作按钮）。浏览量取已写回数据库的值，
+    # 缓冲中的增量不计入，否则每次浏览都会使缓存失效；因此 304 时显示的
+    # 浏览量最多落后一个写回周期。
+    related = related_articles(article.id)
+    category = article.category
+    etag_parts = [
+        article_version(article), article.view_count or 0, article.author.username,
+        category.id, category.name, current_user.id,
+    ] + [(item.id, item.title, item.publish_time, item.view_count) for item in related]
+    etag = hashlib.sha1(repr(etag_parts).encode()).hexdigest()
+    last_modified = (article.update_time or article.publish_time).replace(tzinfo=timezone.utc)
+    # 只按 ETag 判断：相关文章等变化不会体现在文章的修改时间上
+    if not session.get('_flashes') and not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+    else:
+        view_count = (article.view_count or 0) + view_counter.pending(article.id)
+        current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+        response = current_app.make_response(render_template('knowledge_article.html', 
+                             article=article,
+                             article_html=article_render_cache.get(article),
+                             tags=split_tags(article.tags),
+                             related=related,
+                             view_count=view_count,
+                             date=current_date))
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # 仅允许浏览器私有缓存，且每次都需重新验证（浏览量照常记录）
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/knowledge/article/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_KNOWLEDGE)
+def create_knowledge_article():
+    form = KnowledgeArticleForm()
+    form.category_id.choices = [(c.id, c.name) for c in KnowledgeCategory.query.all()]
+    
+    if form.validate_on_submit():
+        article = KnowledgeArticle(
+            title=form.title.data,
+            content=form.content.data,
+            category_id=form.category_id.data,
+            author_id=current_user.id,
+            tags=form.tags.data,
+            is_published=form.is_published.data
+        )
+        
+        db.session.add(article)
+        db.session.flush()
+        article_changed(None, False, article.category_id, article.is_published)
+        sync_article_tags(article, old_published=False)
+        record_revision(article, current_user.id)
+        db.session.commit()
+        
+        flash('知识文章发布成功！', 'success')
+        return redirect(url_for('.knowledge_article', article_id=article.id))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_knowledge_article.html', form=form, date=current_date)
+
+@bp.route('/knowledge/category/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_KNOWLEDGE)
+def create_knowledge_category():
+    form = KnowledgeCategoryForm()
+    form.parent_id.choices = [(0, '无')] + [(c.id, c.name) for c in KnowledgeCategory.query.all()]
+    
+    if form.validate_on_submit():
+        category = KnowledgeCategory(
+            name=form.name.data,
+            description=form.description.data,
+            parent_id=form.parent_id.data if form.parent_id.data != 0 else None
+        )
+        
+        db.session.add(category)
+        db.session.flush()
+        rebuild_category_tree()
+        db.session.commit()
+        
+        flash('知识分类创建成功！', 'success')
+        return redirect(url_for('.knowledge_base'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_knowledge_category.html', form=form, date=current_date)
+
+# 编辑知识分类
+@bp.route('/knowledge/category/<int:category_id>/edit', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_KNOWLEDGE)
+def edit_knowledge_category(category_id):
+    category = KnowledgeCategory.query.get_or_404(category_id)
+    form = KnowledgeCategoryForm(obj=category)
+    form.parent_id.choices = [(0, '无')] + [(c.id, c.name) for c in KnowledgeCategory.query.all()]
+
+    if form.validate_on_submit():
+        parent_id = form.parent_id.data if form.parent_id.data != 0 else None
+        # 不能把分类移动到自身或其子分类之下
+        if parent_id is not None and is_descendant(category.id, parent_id):
+            flash('不能将分类移动到自身或其子分类下！', 'error')
+            return render_template('create_knowledge_category.html', form=form, category=category)
+        
+        parent_changed = category.parent_id != parent_id
+        category.name = form.name.data
+        category.description = form.description.data
+        category.parent_id = parent_id
+        if parent_changed:
+            db.session.flush()
+            rebuild_category_tree()
+        
+        db.session.commit()
+        flash('知识分类更新成功！', 'success')
+        return redirect(url_for('.knowledge_base'))
+    
+    return render_template('create_knowledge_category.html', form=form, category=category)
+
+# 删除知识分类
+@bp.route('/knowledge/category/<int:category_id>/delete', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_KNOWLEDGE)
+def delete_knowledge_category(category_id):
+    category = KnowledgeCategory.query.get_or_404(category_id)
+    
+    # 检查是否有子分类或文章
+    if category.subcategories:
+        flash('该分类下存在子分类，无法删除！', 'error')
+        return redirect(url_for('.knowledge_base'))
+    
+    if db.session.query(KnowledgeArticle.query.filter_by(category_id=category.id).exists()).scalar():
+        flash('该分类下存在文章，无法删除！', 'error')
+        return redirect(url_for('.knowledge_base'))
+    
+    db.session.delete(category)
+    db.session.flush()
+    rebuild_category_tree()
+    db.session.commit()
+    flash('知识分类已删除！', 'success')
+    return redirect(url_for('.knowledge_base'))
+
+# 文章修订历史
+@bp.route('/knowledge/article/<int:article_id>/history')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_article_history(article_id):
+    article = KnowledgeArticle.query.get_or_404(article_id)
+    revisions = list_revisions(article_id)
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_article_history.html',
+                         article=article,
+                         revisions=revisions,
+                         date=current_date)
+
+@bp.route('/knowledge/article/<int:article_id>/revision/<int:revision>')
+@login_required
+@permission_required(PERMISSION_VIEW_KNOWLEDGE)
+def knowledge_article_revision(article_id, revision):
+    article = KnowledgeArticle.query.get_or_404(article_id)
+    result = get_revision(article_id, revision)
+    if result is None:
+        abort(404)
+    record, content = result
+    
+    # 与上一版的差异
+    diff_lines = []
+    if revision > 1:
+        previous = get_revision(article_id, revision - 1)
+        if previous is not None:
+            diff_lines = list(difflib.unified_diff(
+                previous[1].splitlines(), content.splitlines(),
+                fromfile=f'第 {revision - 1} 版', tofile=f'第 {revision} 版', lineterm=''
+            ))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('knowledge_article_revision.html',
+                         article=article,
+                         record=record,
+                         tags=split_tags(record.tags),
+                         content=content,
+                         diff_lines=diff_lines,
+                         date=current_date)
+
+# 编辑知识文章
+@bp.route('/knowledge/article/<int:article_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_knowledge_article(article_id):
+    article = KnowledgeArticle.query.get_or_404(article_id)
+    
+    # 权限检查：作者、管理员或超级管理员可以编辑
+    if article.author_id != current_user.id and not (current_user.has_role(ROLE_SUPER_ADMIN) or current_user.has_role(ROLE_ADMIN)):
+        flash('您没有权限编辑此文章', 'error')
+        return redirect(url_for('.knowledge_article', article_id=article_id))
+    
+    form = KnowledgeArticleForm(obj=article)
+    form.category_id.choices = [(c.id, c.name) for c in KnowledgeCategory.query.all()]
+    
+    if form.validate_on_submit():
+        # 锁定文章行后重新读取，同时提交的编辑依次取得修订号；SQLite 忽略行锁，
+        # 但读取最新修订前自动刷新文章的修改时已取得写锁，效果相同
+        db.session.refresh(article, with_for_update=True)
+        old_category_id, old_published = article.category_id, article.is_published
+        previous = (article.title, article.content, article.tags, article.author_id, article.update_time)
+        article.title = form.title.data
+        article.content = form.content.data
+        article.category_id = form.category_id.data
+        article.tags = form.tags.data
+        article.is_published = form.is_published.data
+        article.update_time = datetime.now()
+        article_changed(old_category_id, old_published, article.category_id, article.is_published)
+        sync_article_tags(article, old_published)
+        record_revision(article, current_user.id, previous)
+        
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 另一次编辑先提交了同一修订号：放弃本次保存，保留表单内容让用户核对后重新提交
+            db.session.rollback()
+            flash('文章在您编辑期间已被他人修改，请核对最新内容后重新提交', 'error')
+            return render_template('create_knowledge_article.html', form=form, article=article)
+        flash('文章更新成功！', 'success')
+        return redirect(url_for('.knowledge_article', article_id=article.id))
+    
+    return render_template('create_knowledge_article.html', form=form, article=article)
+
+# 删除知识文章
+@bp.route('/knowledge/article/<int:article_id>/delete', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_KNOWLEDGE)
+def delete_knowledge_article(article_id):
+    article = KnowledgeArticle.query.get_or_404(article_id)
+    
+    article_changed(article.category_id, article.is_published, None, False)
+    remove_article_tags(article)
+    remove_related(article.id)
+    remove_revisions(article.id)
+    db.session.delete(article)
+    db.session.commit()
+    flash('文章已删除！', 'success')
+    return redirect(url_for('.knowledge_base'))
@@ -0,0 +1,112 @@
+"""首页及所有页面共用的模板上下文"""
+from flask import Blueprint, render_template, url_for
+from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+
+from simple_models import User, Notification, Supply, SupplyRequest
+from auth import (
+    PERMISSION_APPROVE_REQUESTS, PERMISSION_MANAGE_USERS, ROLE_SUPER_ADMIN, ROLE_ADMIN,
+    can_view_all_notifications, get_permission_description, get_role_description
+)
+from views import get_local_time, format_local_time, get_unread_messages_count
+
+bp = Blueprint('main', __name__)
+
+# 上下文处理器
+@bp.app_context_processor
+def inject_common_data():
+    def get_quick_links():
+        links = [
+            {"name": "通知公告", "url": url_for('notifications.notifications_list'), "icon": "📢"},
+            {"name": "耗材管理", "url": url_for('supplies.supplies_list'), "icon": "📦"},
+            {"name": "流程审批", "url": url_for('supplies.request_list'), "icon": "✅"},
+            {"name": "知识库", "url": url_for('knowledge.knowledge_base'), "icon": "📚"},
+            {"name": "档案查询", "url": url_for('employees.archives_list'), "icon": "📁"}
+        ]
+        # 只有有用户管理权限的用户才能看到用户管理链接
+        if current_user.is_authenticated and current_user.has_permission(PERMISSION_MANAGE_USERS):
+            links.append({"name": "用户管理", "url": url_for('admin.admin_users'), "icon": "👨‍💼"})
+        
+        # 只有有角色管理权限的用户才能看到权限管理链接
+        # if current_user.is_authenticated and current_user.has_permission(PERMISSION_MANAGE_ROLES):
+            # links.insert(6, {"name": "权限管理", "url": url_for('admin.admin_permissions'), "icon": "🔐"})
+
+        return links
+
+    # 使用本地时间
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    
+    return dict(
+        current_user=current_user,
+        has_permission=lambda p: current_user.is_authenticated and current_user.has_permission(p),
+        get_quick_links=get_quick_links,
+        date=current_date,
+        format_local_time=format_local_time,
+        # 导航栏未读消息数，模板调用时才查询
+        get_unread_messages_count=get_unread_messages_count,
+        # 添加权限相关函数到上下文
+        get_permission_description=get_permission_description,
+        get_role_description=get_role_description
+    )
+
+# 首页
+@bp.route('/')
+@login_required
+def index():
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    
+    # 从数据库获取通知
+    if can_view_all_notifications():
+        # 超级管理员和管理员可以查看所有通知
+        notifications = Notification.query.filter_by(is_active=True).options(
+            selectinload(Notification.publisher)
+        ).order_by(
+            Notification.is_top.desc(), 
+            Notification.publish_time.desc()
+        ).limit(5).all()
+    else:
+        # 普通用户只能查看全公司通知或本部门通知
+        notifications = Notification.query.filter(
+            (Notification.department == '全公司') | 
+            (Notification.department == current_user.department) |
+            (Notification.department.is_(None))
+        ).filter_by(is_active=True).options(
+            selectinload(Notification.publisher)
+        ).order_by(
+            Notification.is_top.desc(), 
+            Notification.publish_time.desc()
+        ).limit(5).all()
+    
+    # 获取待办事项数量
+    pending_requests_count = 0
+    if current_user.has_permission(PERMISSION_APPROVE_REQUESTS):
+        if current_user.has_role(ROLE_SUPER_ADMIN) or current_user.has_role(ROLE_ADMIN):
+            pending_requests_count = SupplyRequest.query.filter_by(status='pending').count()
+        else:
+            pending_requests_count = SupplyRequest.query\
+                .join(User, SupplyRequest.applicant_id == User.id)\
+                .filter(SupplyRequest.status == 'pending')\
+                .filter(User.department == current_user.department)\
+                .count()
+    
+    # 获取未读消息数量
+    unread_messages_count = get_unread_messages_count()
+    
+    # 获取低库存耗材数量
+    low_stock_count = Supply.query.filter(
+        Supply.current_stock <= Supply.min_stock_threshold,
+        Supply.is_available == True
+    ).count()
+    
+    # 获取用户的申请记录
+    my_requests = SupplyRequest.query.filter_by(applicant_id=current_user.id)\
+        .order_by(SupplyRequest.apply_time.desc())\
+        .limit(5).all()
+    
+    return render_template('index.html', 
+                         date=current_date,
+                         notifications=notifications,
+                         pending_requests_count=pending_requests_count,
+                         unread_messages_count=unread_messages_count,
+                         low_stock_count=low_stock_count,
+                         my_requests=my_requests)
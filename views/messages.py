@@ -0,0 +1,144 @@
+"""站内消息"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+
+from simple_models import db, User, Message
+from forms import MessageForm
+from auth import permission_required, PERMISSION_VIEW_MESSAGES, PERMISSION_SEND_MESSAGES
+from db_routing import use_primary
+from views import get_local_time, get_unread_messages_count
+
+bp = Blueprint('messages', __name__)
+
+
+@bp.route('/messages')
+@login_required
+def messages_list():
+    # 获取筛选参数
+    filter_type = request.args.get('filter', 'all')
+    
+    # 基础查询：获取当前用户个人消息，以及其有权限查看的系统通知
+    query = Message.query.filter(
+        # 消息的接收者是当前用户
+        (Message.recipient_id == current_user.id) |
+        # 或者是系统通知，并且符合部门条件
+        (
+            (Message.category == 'notification') &
+            (
+                (Message.target_department.is_(None)) |  # 全公司通知
+                (Message.target_department == '全公司') |  # 全公司通知
+                (Message.target_department == current_user.department)  # 本部门通知
+            )
+        )
+    )
+    
+    # 根据筛选条件进一步过滤
+    if filter_type == 'personal':
+        query = query.filter(Message.category != 'notification')
+    elif filter_type == 'notification':
+        query = query.filter(Message.category == 'notification')
+    elif filter_type == 'unread':
+        query = query.filter(Message.is_read == False)
+    
+    messages = query.options(selectinload(Message.sender))\
+        .order_by(Message.is_read.asc(), Message.created_at.desc()).all()
+    
+    # 获取未读消息数量（只计算个人消息）
+    unread_count = get_unread_messages_count()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('messages_list.html', 
+                         messages=messages,
+                         unread_count=unread_count,
+                         date=current_date)
+
+# 查看消息详情
+@bp.route('/message/<int:message_id>')
+@login_required
+@use_primary(db)
+def message_detail(message_id):
+    message = Message.query.get_or_404(message_id)
+    
+    # 检查权限，只能查看自己的消息
+    if message.recipient_id != current_user.id:
+        flash('您没有权限查看此消息', 'error')
+        return redirect(url_for('.messages_list'))
+    
+    # 标记为已读
+    if not message.is_read:
+        message.is_read = True
+        db.session.commit()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('message_detail.html', 
+                         message=message,
+                         date=current_date)
+
+# 标记消息为已读
+@bp.route('/message/<int:message_id>/read', methods=['POST'])
+@login_required
+def mark_message_read(message_id):
+    message = Message.query.get_or_404(message_id)
+    
+    # 检查权限
+    if message.recipient_id != current_user.id:
+        return jsonify({'success': False, 'error': '无权操作'})
+    
+    message.is_read = True
+    db.session.commit()
+    
+    return jsonify({'success': True})
+
+# 发送消息
+@bp.route('/message/send', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_SEND_MESSAGES)
+def send_message():
+    form = MessageForm()
+    
+    # 动态设置接收人选项
+    form.recipient_id.choices = [(user.id, f"{user.username} ({user.department})") 
+                                for user in User.query.filter_by(is_active=True).all()]
+    
+    if form.validate_on_submit():
+        message = Message(
+            title=form.title.data,
+            content=form.content.data,
+            message_type=form.message_type.data,
+            recipient_id=form.recipient_id.data,
+            sender_id=current_user.id
+        )
+        
+        db.session.add(message)
+        db.session.commit()
+        
+        flash('消息发送成功！', 'success')
+        return redirect(url_for('.messages_list'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('send_message.html', form=form, date=current_date)
+
+# 删除消息
+@bp.route('/message/<int:message_id>/delete', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_VIEW_MESSAGES)
+def delete_message(message_id):
+    message = Message.query.get_or_404(message_id)
+    
+    # 检查权限，只能删除自己的消息
+    if message.recipient_id != current_user.id:
+        flash('您没有权限删除此消息', 'error')
+        return redirect(url_for('.messages_list'))
+    
+    db.session.delete(message)
+    db.session.commit()
+    
+    flash('消息已删除！', 'success')
+    return redirect(url_for('.messages_list'))
+
+@bp.route('/api/unread_messages_count')
+@login_required
+def unread_messages_count():
+    count = Message.query.filter_by(recipient_id=current_user.id, is_read=False).count()
+    return jsonify({'count': count})
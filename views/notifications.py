@@ -0,0 +1,146 @@
+"""通知公告"""
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+
+from simple_models import db, Notification, Message
+from forms import NotificationForm
+from auth import permission_required, PERMISSION_PUBLISH_NOTICES, can_view_all_notifications, can_view_notification, can_edit_notification, can_delete_notification
+from views import get_local_time
+
+bp = Blueprint('notifications', __name__)
+
+
+# 通知列表 - 确保正确排序
+@bp.route('/notifications')
+@login_required
+def notifications_list():
+    # 使用权限检查函数
+    if can_view_all_notifications():
+        notifications = Notification.query.filter_by(is_active=True).options(
+            selectinload(Notification.publisher)  # 发布人一次查询取出，避免逐行加载
+        ).order_by(
+            Notification.is_top.desc(),  # 置顶的排在前面
+            Notification.publish_time.desc()  # 然后按发布时间降序
+        ).all()
+    else:
+        notifications = Notification.query.filter(
+            (Notification.department == '全公司') | 
+            (Notification.department == current_user.department) |
+            (Notification.department.is_(None))
+        ).filter_by(is_active=True).options(
+            selectinload(Notification.publisher)
+        ).order_by(
+            Notification.is_top.desc(),  # 置顶的排在前面
+            Notification.publish_time.desc()  # 然后按发布时间降序
+        ).all()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('notifications.html', 
+                         notifications=notifications, 
+                         date=current_date)
+
+# 通知详情页
+@bp.route('/notification/<int:notification_id>')
+@login_required
+def notification_detail(notification_id):
+    notification = Notification.query.get_or_404(notification_id)
+    
+    # 使用权限检查函数
+    if not can_view_notification(notification):
+        flash('您没有权限查看此通知', 'error')
+        return redirect(url_for('main.index'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('notification_detail.html', 
+                         notification=notification, 
+                         date=current_date)
+
+# 发布通知
+@bp.route('/notification/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_PUBLISH_NOTICES)
+def create_notification():
+    form = NotificationForm()
+    
+    if form.validate_on_submit():
+        # 提前保存 current_user.id 到局部变量
+        current_user_id = current_user.id
+        
+        # 使用本地时间
+        notification = Notification(
+            title=form.title.data,
+            content=form.content.data,
+            publisher_id=current_user_id,
+            department=form.department.data or None,
+            is_top=form.is_top.data,
+            publish_time=datetime.now()
+        )
+        
+        db.session.add(notification)
+        db.session.commit()
+        
+        # +++ 修改：只为当前用户创建一条消息记录 +++
+        message = Message(
+            title=f"通知发布成功: {form.title.data}",
+            content=f"您已成功发布通知：{form.title.data}。该通知将显示给相关用户。",
+            message_type='system',
+            category='personal',  # 个人消息，不是系统通知
+            recipient_id=current_user_id,  # 只发给发布者自己
+            sender_id=current_user_id,
+            related_url=url_for('.notifications_list')
+        )
+        db.session.add(message)
+        db.session.commit()
+        # +++ 修改结束 +++
+        
+        flash('通知发布成功！', 'success')
+        return redirect(url_for('.notifications_list'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_notification.html', form=form, date=current_date)
+
+# 编辑通知
+@bp.route('/notification/<int:notification_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_notification(notification_id):
+    notification = Notification.query.get_or_404(notification_id)
+    
+    # 使用新的权限检查函数
+    if not can_edit_notification(notification):
+        flash('您没有权限编辑此通知', 'error')
+        return redirect(url_for('.notifications_list'))
+    
+    form = NotificationForm(obj=notification)
+    
+    if form.validate_on_submit():
+        notification.title = form.title.data
+        notification.content = form.content.data
+        notification.department = form.department.data or None
+        notification.is_top = form.is_top.data
+        
+        db.session.commit()
+        
+        flash('通知更新成功！', 'success')
+        return redirect(url_for('.notifications_list'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_notification.html', form=form, date=current_date, notification=notification)
+
+# 删除通知
+@bp.route('/notification/<int:notification_id>/delete', methods=['POST'])
+@login_required
+def delete_notification(notification_id):
+    notification = Notification.query.get_or_404(notification_id)
+    
+    # 使用新的权限检查函数
+    if not can_delete_notification(notification):
+        flash('您没有权限删除此通知', 'error')
+        return redirect(url_for('.notifications_list'))
+    
+    db.session.delete(notification)
+    db.session.commit()
+    
+    flash('通知已删除！', 'success')
+    return redirect(url_for('.notifications_list'))
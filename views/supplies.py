@@ -0,0 +1,368 @@
+"""耗材、耗材分类与领用申请"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+
+from simple_models import db, User, Supply, SupplyCategory, SupplyRequest, Message
+from forms import SupplyRequestForm, ApproveRequestForm, SupplyForm, SupplyCategoryForm, SupplyInboundForm
+from auth import permission_required, role_required, PERMISSION_VIEW_SUPPLIES, PERMISSION_REQUEST_SUPPLIES, PERMISSION_APPROVE_REQUESTS, PERMISSION_ISSUE_SUPPLIES, PERMISSION_MANAGE_SUPPLIES, ROLE_ADMIN
+from metrics import supply_requests_submitted, supplies_issued, supply_items_issued, count_messages
+from user_admin import approver_ids
+from views import get_local_time
+
+bp = Blueprint('supplies', __name__)
+
+
+# 耗材列表
+@bp.route('/supplies')
+@login_required
+@permission_required(PERMISSION_VIEW_SUPPLIES)
+def supplies_list():
+    supplies = Supply.query.filter_by(is_available=True).all()
+    categories = SupplyCategory.query.all()
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('supplies.html', 
+                         supplies=supplies, 
+                         categories=categories,
+                         date=current_date)
+
+# 申请列表
+@bp.route('/requests')
+@login_required
+def request_list():
+    # 列表显示耗材名称与申请人，关联对象一次查询取出，避免逐行加载
+    query = SupplyRequest.query.options(
+        selectinload(SupplyRequest.supply),
+        selectinload(SupplyRequest.applicant)
+    )
+    if current_user.has_permission(PERMISSION_APPROVE_REQUESTS):
+        if current_user.has_role(ROLE_ADMIN):
+            requests = query.order_by(SupplyRequest.apply_time.desc()).all()
+        else:
+            requests = query\
+                .join(User, SupplyRequest.applicant_id == User.id)\
+                .filter(User.department == current_user.department)\
+                .order_by(SupplyRequest.apply_time.desc()).all()
+    else:
+        requests = query.filter_by(applicant_id=current_user.id)\
+            .order_by(SupplyRequest.apply_time.desc()).all()
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('request_list.html', 
+                         requests=requests,
+                         date=current_date)
+
+# 耗材申领
+@bp.route('/supply/request', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_REQUEST_SUPPLIES)
+def supply_request():
+    form = SupplyRequestForm()
+    
+    form.supply_id.choices = [(s.id, f"{s.name} (库存: {s.current_stock}{s.unit})") 
+                             for s in Supply.query.filter_by(is_available=True).all()]
+    
+    if form.validate_on_submit():
+        supply = Supply.query.get(form.supply_id.data)
+        
+        if supply.current_stock < form.quantity.data:
+            flash(f'库存不足！当前库存：{supply.current_stock}{supply.unit}', 'error')
+            return render_template('supply_request.html', form=form)
+        
+        request = SupplyRequest(
+            applicant_id=current_user.id,
+            supply_id=form.supply_id.data,
+            quantity=form.quantity.data
+        )
+        
+        db.session.add(request)
+        db.session.commit()  # 先提交以获取request.id
+        
+        # 通知有审批权限的同部门管理员和超级管理员：一条查询取出收件人，
+        # 消息一次 executemany 批量插入
+        recipient_ids = approver_ids(PERMISSION_APPROVE_REQUESTS, current_user.department)
+        if recipient_ids:
+            now = datetime.utcnow()
+            db.session.execute(Message.__table__.insert(), [{
+                'title': '新的耗材申请待审批',
+                'content': f'用户 {current_user.real_name} 提交了耗材申请：{supply.name} x {form.quantity.data}，请及时审批。',
+                'message_type': 'approval',
+                'recipient_id': recipient_id,
+                'sender_id': current_user.id,
+                'related_url': url_for('.request_list'),
+                'created_at': now,
+            } for recipient_id in recipient_ids])
+            count_messages(db.session, 'approval', len(recipient_ids))
+        
+        db.session.commit()
+        supply_requests_submitted.inc()
+        
+        flash('耗材申请提交成功，等待审批！', 'success')
+        return redirect(url_for('.supplies_list'))
+    
+    return render_template('supply_request.html', form=form)
+
+# 审批申请
+@bp.route('/request/<int:request_id>/approve', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_APPROVE_REQUESTS)
+def approve_request(request_id):
+    supply_request = SupplyRequest.query.get_or_404(request_id)
+    
+    if not current_user.has_role(ROLE_ADMIN):
+        if supply_request.applicant.department != current_user.department:
+            flash('您只能审批本部门的申请', 'error')
+            return redirect(url_for('.request_list'))
+    
+    form = ApproveRequestForm()
+    
+    if form.validate_on_submit():
+        if form.action.data == 'approve':
+            supply_request.status = 'approved'
+            supply_request.approver_id = current_user.id
+            supply_request.approve_time = datetime.now()
+            
+            # 创建审批通过消息 - 修复：添加 sender_id
+            message = Message(
+                title='耗材申请已批准',
+                content=f'您的耗材申请（{supply_request.supply.name} x {supply_request.quantity}）已获批准。',
+                message_type='approval',
+                recipient_id=supply_request.applicant_id,
+                sender_id=current_user.id,  # 添加这一行
+                related_url=url_for('.request_list')
+            )
+            db.session.add(message)
+            
+            flash('申请已批准！', 'success')
+        else:
+            supply_request.status = 'rejected'
+            supply_request.approver_id = current_user.id
+            supply_request.approve_time = datetime.now()
+            supply_request.reject_reason = form.reject_reason.data
+            
+            # 创建审批拒绝消息 - 修复：添加 sender_id
+            message = Message(
+                title='耗材申请被拒绝',
+                content=f'您的耗材申请（{supply_request.supply.name} x {supply_request.quantity}）已被拒绝。原因：{form.reject_reason.data}',
+                message_type='approval',
+                recipient_id=supply_request.applicant_id,
+                sender_id=current_user.id,  # 添加这一行
+                related_url=url_for('.request_list')
+            )
+            db.session.add(message)
+            
+            flash('申请已拒绝！', 'success')
+        
+        db.session.commit()
+        return redirect(url_for('.request_list'))
+    
+    return render_template('approve_request.html', form=form, supply_request=supply_request)
+
+# 发放耗材
+@bp.route('/request/<int:request_id>/issue', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_ISSUE_SUPPLIES)
+def issue_request(request_id):
+    supply_request = SupplyRequest.query.get_or_404(request_id)
+    
+    if supply_request.status != 'approved':
+        flash('只能发放已批准的申请', 'error')
+        return redirect(url_for('.request_list'))
+    
+    if supply_request.supply.current_stock < supply_request.quantity:
+        flash('库存不足，无法发放！', 'error')
+        return redirect(url_for('.request_list'))
+    
+    supply_request.supply.current_stock -= supply_request.quantity
+    supply_request.status = 'issued'
+    supply_request.issue_time = datetime.now()
+    supply_request.issuer_id = current_user.id
+    
+    db.session.commit()
+    supplies_issued.inc()
+    supply_items_issued.inc(supply_request.quantity)
+    
+    flash('耗材发放成功！', 'success')
+    return redirect(url_for('.request_list'))
+
+# 管理员功能
+@bp.route('/admin/supplies')
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def admin_supplies():
+    supplies = Supply.query.all()
+    categories = SupplyCategory.query.all()
+    return render_template('admin_supplies.html', supplies=supplies, categories=categories)
+
+# 创建耗材 - 修复权限检查
+@bp.route('/admin/supply/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def create_supply():
+    form = SupplyForm()
+    form.category_id.choices = [(c.id, c.name) for c in SupplyCategory.query.all()]
+    
+    if form.validate_on_submit():
+        supply = Supply(
+            name=form.name.data,
+            category_id=form.category_id.data,
+            total_stock=form.total_stock.data,
+            current_stock=form.current_stock.data,
+            unit=form.unit.data,
+            min_stock_threshold=form.min_stock_threshold.data,
+            description=form.description.data
+        )
+        
+        db.session.add(supply)
+        db.session.commit()
+        
+        flash('耗材添加成功！', 'success')
+        return redirect(url_for('.admin_supplies'))
+    
+    return render_template('create_supply.html', form=form)
+
+# 编辑耗材 - 修复权限检查
+@bp.route('/admin/supply/<int:supply_id>/edit', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def edit_supply(supply_id):
+    supply = Supply.query.get_or_404(supply_id)
+    form = SupplyForm(obj=supply)
+    form.category_id.choices = [(c.id, c.name) for c in SupplyCategory.query.all()]
+    
+    if form.validate_on_submit():
+        supply.name = form.name.data
+        supply.category_id = form.category_id.data
+        supply.total_stock = form.total_stock.data
+        supply.current_stock = form.current_stock.data
+        supply.unit = form.unit.data
+        supply.min_stock_threshold = form.min_stock_threshold.data
+        supply.description = form.description.data
+        
+        db.session.commit()
+        
+        flash('耗材更新成功！', 'success')
+        return redirect(url_for('.admin_supplies'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_supply.html', form=form, date=current_date, supply=supply)
+
+# 停用耗材
+@bp.route('/admin/supply/<int:supply_id>/disable', methods=['POST'])
+@login_required
+@role_required(ROLE_ADMIN)
+def disable_supply(supply_id):
+    supply = Supply.query.get_or_404(supply_id)
+    supply.is_available = False
+    db.session.commit()
+    
+    flash('耗材已停用！', 'success')
+    return redirect(url_for('.admin_supplies'))
+
+# 启用耗材
+@bp.route('/admin/supply/<int:supply_id>/enable', methods=['POST'])
+@login_required
+@role_required(ROLE_ADMIN)
+def enable_supply(supply_id):
+    supply = Supply.query.get_or_404(supply_id)
+    supply.is_available = True
+    db.session.commit()
+    
+    flash('耗材已启用！', 'success')
+    return redirect(url_for('.admin_supplies'))
+
+# 入库耗材
+@bp.route('/supply/inbound', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def supply_inbound():
+    form = SupplyInboundForm()
+    
+    form.supply_id.choices = [(s.id, f"{s.name} (当前库存: {s.current_stock}{s.unit})") 
+                             for s in Supply.query.filter_by(is_available=True).all()]
+    
+    if form.validate_on_submit():
+        supply = Supply.query.get(form.supply_id.data)
+        
+        # 使用新添加的方法增加库存
+        supply.add_stock(form.quantity.data)
+        
+        db.session.commit()
+        
+        flash(f'成功入库 {form.quantity.data}{supply.unit} {supply.name}！', 'success')
+        return redirect(url_for('.supplies_list'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('supply_inbound.html', form=form, date=current_date)
+
+# 耗材分类管理
+@bp.route('/supply/categories')
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def supply_categories():
+    categories = SupplyCategory.query.options(selectinload(SupplyCategory.supplies)).all()
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('supply_categories.html', 
+                         categories=categories,
+                         date=current_date)
+
+# 添加耗材分类
+@bp.route('/supply/category/create', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def create_supply_category():
+    form = SupplyCategoryForm()
+    
+    if form.validate_on_submit():
+        category = SupplyCategory(
+            name=form.name.data,
+            description=form.description.data
+        )
+        
+        db.session.add(category)
+        db.session.commit()
+        
+        flash('耗材分类添加成功！', 'success')
+        return redirect(url_for('.supply_categories'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('create_supply_category.html', form=form, date=current_date)
+
+# 编辑耗材分类
+@bp.route('/supply/category/<int:category_id>/edit', methods=['GET', 'POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def edit_supply_category(category_id):
+    category = SupplyCategory.query.get_or_404(category_id)
+    form = SupplyCategoryForm(obj=category)
+    
+    if form.validate_on_submit():
+        category.name = form.name.data
+        category.description = form.description.data
+        
+        db.session.commit()
+        
+        flash('耗材分类更新成功！', 'success')
+        return redirect(url_for('.supply_categories'))
+    
+    current_date = get_local_time().strftime("%Y年%m月%d日 %H:%M")
+    return render_template('edit_supply_category.html', form=form, date=current_date, category=category)
+
+# 删除耗材分类
+@bp.route('/supply/category/<int:category_id>/delete', methods=['POST'])
+@login_required
+@permission_required(PERMISSION_MANAGE_SUPPLIES)
+def delete_supply_category(category_id):
+    category = SupplyCategory.query.get_or_404(category_id)
+    
+    # 检查是否有耗材使用此分类
+    if category.supplies:
+        flash('该分类下还有耗材，无法删除！', 'error')
+        return redirect(url_for('.supply_categories'))
+    
+    db.session.delete(category)
+    db.session.commit()
+    
+    flash('耗材分类已删除！', 'success')
+    return redirect(url_for('.supply_categories'))
@@ -0,0 +1,7 @@
+"""WSGI 入口：gunicorn -c gunicorn.conf.py，或 flask --app wsgi run
+
+配置档案由环境变量 PORTAL_CONFIG 指定，见 config 模块。
+"""
+from app import create_app
+
+app = create_app()